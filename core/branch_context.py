@@ -0,0 +1,110 @@
+# core/branch_context.py
+"""
+Per-user employee/branch context, cached in-process.
+
+BranchMiddleware attaches the signed-in user's Employee (with its Branch)
+to every request as ``request.employee`` / ``request.branch`` and primes
+``request.user.employee``, so views that read ``request.user.employee.branch``
+or call get_manager() don't query for it again.
+
+The rows are kept in a small LRU of plain field values per user, and each
+request gets fresh model instances built from them, so nothing mutable is
+shared between requests. Saving or deleting an Employee or Branch bumps a
+version kept in the SHARED_CACHE_ALIAS cache (see core/signals.py), which
+every worker reads on each request, so all of them drop their entries at
+once; core.checks refuses a per-process cache there. EMPLOYEE_CONTEXT_TTL
+only bounds how long a worker can miss a bump (an evicted version key,
+two bumps racing on a backend without atomic incr).
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from .models import Branch, Employee
+
+VERSION_CACHE_KEY = 'core:employee_context_version'
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # user id -> (version, loaded_at, employee values, branch values)
+
+
+def _shared_cache():
+    return caches[getattr(settings, 'SHARED_CACHE_ALIAS', 'default')]
+
+
+def _current_version():
+    return _shared_cache().get(VERSION_CACHE_KEY, 0)
+
+
+def _values(instance):
+    if instance is None:
+        return None
+    return tuple(getattr(instance, field.attname) for field in instance._meta.concrete_fields)
+
+
+def _instance(model, values):
+    if values is None:
+        return None
+    return model.from_db('default', [field.attname for field in model._meta.concrete_fields], values)
+
+
+def _load(user_id, version):
+    employee = Employee.objects.select_related('branch').filter(user_id=user_id).first()
+    branch = employee.branch if employee is not None else None
+    return (version, time.monotonic(), _values(employee), _values(branch))
+
+
+def get_employee(user):
+    """The user's Employee (branch preloaded), or None; no query while cached"""
+    if not user.is_authenticated:
+        return None
+
+    ttl = getattr(settings, 'EMPLOYEE_CONTEXT_TTL', 60)
+    version = _current_version()
+    with _lock:
+        entry = _entries.get(user.pk)
+        if entry is not None:
+            _entries.move_to_end(user.pk)
+
+    if entry is None or entry[0] != version or time.monotonic() - entry[1] >= ttl:
+        entry = _load(user.pk, version)
+        with _lock:
+            _entries[user.pk] = entry
+            _entries.move_to_end(user.pk)
+            while len(_entries) > getattr(settings, 'EMPLOYEE_CONTEXT_CACHE_SIZE', 1024):
+                _entries.popitem(last=False)
+
+    employee = _instance(Employee, entry[2])
+    if employee is not None:
+        employee._state.fields_cache['branch'] = _instance(Branch, entry[3])
+        employee._state.fields_cache['user'] = user
+    return employee
+
+
+def attach_employee_context(request):
+    employee = get_employee(request.user)
+    request.employee = employee
+    request.branch = employee.branch if employee is not None else None
+    if request.user.is_authenticated:
+        # Serve request.user.employee (and its absence) from the cache too
+        request.user._state.fields_cache['employee'] = employee
+
+
+def get_manager(request):
+    """The requesting manager's Employee; raises Employee.DoesNotExist for anyone else"""
+    employee = getattr(request, 'employee', None)
+    if employee is None or employee.employee_type != 'manager':
+        raise Employee.DoesNotExist("The current user is not a manager")
+    return employee
+
+
+def invalidate_employee_context():
+    """Drop cached contexts here and tell other workers to drop theirs"""
+    cache = _shared_cache()
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,59 @@
+# core/branch_summary.py
+"""
+Per-branch figures for the head-office pages (admin dashboard, branch
+list, and the quick branch access cards on the order, report and
+reservation pages).
+
+Every figure is a correlated COUNT subquery (or a lookup in today's
+BranchDailyCounter row) annotated onto one branch query, so the page costs
+one query however many branches there are. Subqueries rather than
+Count() over joins, because joining employees, orders and reservations in
+one query multiplies the rows and the counts with them.
+"""
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from inventory.models import Stock
+from orders.models import Order
+from reservations.models import Reservation, Table
+from .models import Branch, BranchDailyCounter, Employee
+
+SUMMARY_FIELDS = (
+    'employee_count', 'order_count', 'reservation_count',
+    'table_count', 'low_stock_count', 'today_revenue',
+)
+
+
+def _count(queryset):
+    counts = queryset.filter(branch=OuterRef('pk')).order_by().values('branch').annotate(
+        total=Count('pk')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def summary_expressions(day=None):
+    day = day or timezone.localdate()
+    revenue = BranchDailyCounter.objects.filter(branch=OuterRef('pk'), day=day).values('revenue')[:1]
+    return {
+        'employee_count': _count(Employee.objects.all()),
+        'order_count': _count(Order.objects.all()),
+        'reservation_count': _count(Reservation.objects.all()),
+        'table_count': _count(Table.objects.all()),
+        'low_stock_count': _count(Stock.objects.filter(quantity__lte=F('alert_level'))),
+        'today_revenue': Coalesce(
+            Subquery(revenue, output_field=DecimalField(max_digits=14, decimal_places=2)),
+            Value(0, output_field=DecimalField(max_digits=14, decimal_places=2)),
+        ),
+    }
+
+
+def annotate_summaries(queryset, fields=SUMMARY_FIELDS, day=None):
+    """``queryset`` of branches with the requested SUMMARY_FIELDS annotated"""
+    expressions = summary_expressions(day)
+    return queryset.annotate(**{name: expressions[name] for name in fields})
+
+
+def branch_summaries(fields=SUMMARY_FIELDS, day=None):
+    """Active branches in id order, each carrying its summary figures (one query)"""
+    branches = Branch.objects.filter(is_active=True).select_related('manager__user').order_by('id')
+    return list(annotate_summaries(branches, fields, day))
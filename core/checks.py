@@ -0,0 +1,50 @@
+# core/checks.py
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Cache backends whose entries only the worker that wrote them can see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    """
+    core.sessions serves sessions from the cache, so the cache has to be
+    shared by every worker: with a per-process one, a logout, flush or
+    cycle_key() in one worker leaves the old session valid in the others.
+    """
+    if settings.SESSION_ENGINE != 'core.sessions':
+        return []
+    alias = settings.SESSION_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f"SESSION_CACHE_ALIAS '{alias}' uses {backend}, which every worker keeps to itself.",
+        hint="Point it at a cache all workers share (FileBasedCache on one machine, "
+             "Redis or Memcached across machines).",
+        obj='core.sessions',
+        id='core.E001',
+    )]
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    core.branch_context and core.registry keep their invalidation versions
+    in SHARED_CACHE_ALIAS; with a per-process cache, the other workers only
+    see an edited branch or deactivated employee once the TTLs run out.
+    """
+    alias = getattr(settings, 'SHARED_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f"SHARED_CACHE_ALIAS '{alias}' uses {backend}, which every worker keeps to itself.",
+        hint="Point it at a cache all workers share (FileBasedCache on one machine, "
+             "Redis or Memcached across machines).",
+        obj='core.branch_context',
+        id='core.E002',
+    )]
@@ -1,11 +1,11 @@
-from .models import Restaurant
+from .registry import get_restaurant
 
 def restaurant_info(request):
     """
     Context processor to make restaurant information available in all templates
     """
     try:
-        restaurant = Restaurant.objects.first()
+        restaurant = get_restaurant()  # cached, see core.registry
     except:
         restaurant = None
     
@@ -0,0 +1,279 @@
+# core/counters.py
+"""
+Per-branch, per-day dashboard counters maintained at write time.
+
+BranchDailyCounter holds today's order count, pending orders, order
+revenue, successful payment total and reservations for each branch, and
+BranchDailyItemCounter the quantity sold per menu item. They are kept up
+to date with F() increments in the same transaction as the write:
+
+  * Order, Payment, Reservation and OrderItem saves and deletes go through
+    core/signals.py, which compares the row's state when it was loaded
+    (``_counted_state``, set in from_db) with its state now and applies
+    the difference
+  * bulk line writes in orders.services call items_changed() directly,
+    since bulk_create/bulk_update send no signals
+  * an order moved to another branch or day takes its lines and
+    successful payments along (_Changes.move_order)
+
+Dashboards then read one or two small rows instead of aggregating the raw
+tables. Writes that bypass both paths (queryset.update(), raw SQL) are not
+seen; rebuild_counters() / the rebuild_dashboard_counters command
+recompute everything from the raw tables.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import BranchDailyCounter, BranchDailyItemCounter
+
+COUNTER_FIELDS = ('orders', 'pending_orders', 'revenue', 'sales', 'reservations')
+
+
+def _day(value):
+    if value is None:
+        return None
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+# State of a row as far as the counters are concerned. None means "counts
+# for nothing" (not saved yet, or deleted).
+
+def order_state(order):
+    return (order.branch_id, _day(order.created_at), order.status, order.total_amount or Decimal('0'))
+
+
+def payment_state(payment):
+    return (payment.order_id, _day(payment.payment_date), payment.amount, payment.is_successful)
+
+
+def reservation_state(reservation):
+    return (reservation.branch_id, reservation.reservation_date)
+
+
+def order_item_state(item):
+    return (item.order_id, item.menu_item_id, item.quantity)
+
+
+STATE_FIELDS = {
+    'orders.Order': ('branch_id', 'created_at', 'status', 'total_amount'),
+    'orders.Payment': ('order_id', 'payment_date', 'amount', 'is_successful'),
+    'reservations.Reservation': ('branch_id', 'reservation_date'),
+    'orders.OrderItem': ('order_id', 'menu_item_id', 'quantity'),
+}
+
+STATE_FUNCTIONS = {
+    'orders.Order': order_state,
+    'orders.Payment': payment_state,
+    'reservations.Reservation': reservation_state,
+    'orders.OrderItem': order_item_state,
+}
+
+
+def counted_state(instance):
+    """State of a just-loaded instance, or None if some fields were deferred"""
+    label = instance._meta.label
+    if any(name not in instance.__dict__ for name in STATE_FIELDS[label]):
+        return None
+    return STATE_FUNCTIONS[label](instance)
+
+
+def stored_state(instance):
+    """The state the counters currently hold for ``instance``"""
+    if instance._state.adding or instance.pk is None:
+        return None
+    state = getattr(instance, '_counted_state', None)
+    if state is None:
+        # Loaded with deferred fields (or never loaded): read the stored row
+        stored = type(instance)._base_manager.filter(pk=instance.pk).first()
+        state = STATE_FUNCTIONS[instance._meta.label](stored) if stored is not None else None
+    return state
+
+
+class _Changes:
+    """Net counter deltas of one write, grouped by row"""
+
+    def __init__(self):
+        self.branch = defaultdict(lambda: defaultdict(int))
+        self.items = defaultdict(int)
+        self._order_keys = {}
+
+    def _order_key(self, order_id):
+        # (branch_id, day) of an order, for payments and order lines
+        if order_id not in self._order_keys:
+            Order = apps.get_model('orders', 'Order')
+            row = Order.objects.filter(pk=order_id).values_list('branch_id', 'created_at').first()
+            self._order_keys[order_id] = (row[0], _day(row[1])) if row else None
+        return self._order_keys[order_id]
+
+    def move_order(self, order_id, old_key, new_key):
+        """Count an order's saved lines and payments under ``new_key`` instead of ``old_key``"""
+        OrderItem = apps.get_model('orders', 'OrderItem')
+        Payment = apps.get_model('orders', 'Payment')
+        lines = OrderItem.objects.filter(order_id=order_id).values_list('menu_item_id', 'quantity')
+        for menu_item_id, quantity in lines:
+            self.items[(*old_key, menu_item_id)] -= quantity
+            self.items[(*new_key, menu_item_id)] += quantity
+        # Sales are counted on the day of the payment, so only the branch moves
+        payments = Payment.objects.filter(order_id=order_id, is_successful=True).values_list('payment_date', 'amount')
+        for paid_at, amount in payments:
+            self.branch[(old_key[0], _day(paid_at))]['sales'] -= amount
+            self.branch[(new_key[0], _day(paid_at))]['sales'] += amount
+        self._order_keys[order_id] = new_key
+
+    def add(self, label, state, sign):
+        if state is None:
+            return
+        if label == 'orders.Order':
+            branch_id, day, status, total = state
+            deltas = self.branch[(branch_id, day)]
+            deltas['orders'] += sign
+            deltas['pending_orders'] += sign * (status == 'pending')
+            deltas['revenue'] += sign * total
+        elif label == 'orders.Payment':
+            order_id, day, amount, is_successful = state
+            key = self._order_key(order_id)
+            if is_successful and key is not None:
+                self.branch[(key[0], day)]['sales'] += sign * amount
+        elif label == 'reservations.Reservation':
+            branch_id, day = state
+            self.branch[(branch_id, day)]['reservations'] += sign
+        elif label == 'orders.OrderItem':
+            order_id, menu_item_id, quantity = state
+            key = self._order_key(order_id)
+            if key is not None:
+                self.items[(key[0], key[1], menu_item_id)] += sign * quantity
+
+    def apply(self):
+        for (branch_id, day), deltas in self.branch.items():
+            deltas = {name: value for name, value in deltas.items() if value}
+            if deltas and day is not None:
+                _bump(BranchDailyCounter, {'branch_id': branch_id, 'day': day}, deltas)
+        for (branch_id, day, menu_item_id), quantity in self.items.items():
+            if quantity and day is not None:
+                _bump(BranchDailyItemCounter,
+                      {'branch_id': branch_id, 'day': day, 'menu_item_id': menu_item_id},
+                      {'quantity': quantity})
+
+
+def _bump(model, key, deltas):
+    """Add ``deltas`` to the counter row ``key``, creating it on first use"""
+    updates = {name: F(name) + value for name, value in deltas.items()}
+    if model.objects.filter(**key).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        # Another writer created the row first
+        model.objects.filter(**key).update(**updates)
+
+
+def record_change(instance, old_state, new_state):
+    label = instance._meta.label
+    if old_state == new_state:
+        return
+    changes = _Changes()
+    changes.add(label, old_state, -1)
+    changes.add(label, new_state, 1)
+    if label == 'orders.Order' and old_state is not None and new_state is not None:
+        old_key, new_key = old_state[:2], new_state[:2]
+        if old_key != new_key:
+            changes.move_order(instance.pk, old_key, new_key)
+    changes.apply()
+
+
+def items_changed(order, added=(), updated=()):
+    """
+    Count lines written in bulk: ``added`` items and ``updated`` (item,
+    old_quantity) pairs. They go under the branch and day the counters hold
+    for ``order``; when the order's own save then moves it, record_change()
+    moves them along with the rest of its lines.
+    """
+    changes = _Changes()
+    state = stored_state(order)
+    changes._order_keys[order.pk] = state[:2] if state is not None else None
+    for item in added:
+        changes.add('orders.OrderItem', (order.pk, item.menu_item_id, item.quantity), 1)
+        item._counted_state = order_item_state(item)
+    for item, old_quantity in updated:
+        changes.add('orders.OrderItem', (order.pk, item.menu_item_id, item.quantity - old_quantity), 1)
+        item._counted_state = order_item_state(item)
+    changes.apply()
+
+
+def day_totals(day=None, branch=None):
+    """Counter totals for ``day`` (default today), for one branch or all of them"""
+    counters = BranchDailyCounter.objects.filter(day=day or timezone.localdate())
+    if branch is not None:
+        counters = counters.filter(branch=branch)
+    totals = counters.aggregate(**{name: Sum(name) for name in COUNTER_FIELDS})
+    return {name: totals[name] or 0 for name in COUNTER_FIELDS}
+
+
+def popular_items(day=None, branch=None, limit=5):
+    """Best sellers of ``day`` as {'menu_item__name', 'total_quantity'} rows"""
+    counters = BranchDailyItemCounter.objects.filter(day=day or timezone.localdate(), quantity__gt=0)
+    if branch is not None:
+        counters = counters.filter(branch=branch)
+    return counters.values('menu_item__name').annotate(
+        total_quantity=Sum('quantity')
+    ).order_by('-total_quantity')[:limit]
+
+
+def rebuild_counters(since=None, app_registry=None):
+    """
+    Recompute the counters from the raw tables (from ``since`` on, or for
+    all time). Returns the number of counter rows written.
+    """
+    registry = app_registry or apps
+    Order = registry.get_model('orders', 'Order')
+    OrderItem = registry.get_model('orders', 'OrderItem')
+    Payment = registry.get_model('orders', 'Payment')
+    Reservation = registry.get_model('reservations', 'Reservation')
+    DayCounter = registry.get_model('core', 'BranchDailyCounter')
+    ItemCounter = registry.get_model('core', 'BranchDailyItemCounter')
+
+    orders, payments = Order.objects.all(), Payment.objects.filter(is_successful=True)
+    reservations, items = Reservation.objects.all(), OrderItem.objects.all()
+    day_counters, item_counters = DayCounter.objects.all(), ItemCounter.objects.all()
+    if since is not None:
+        orders = orders.filter(created_at__date__gte=since)
+        payments = payments.filter(payment_date__date__gte=since)
+        reservations = reservations.filter(reservation_date__gte=since)
+        items = items.filter(order__created_at__date__gte=since)
+        day_counters = day_counters.filter(day__gte=since)
+        item_counters = item_counters.filter(day__gte=since)
+
+    rows = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    for branch_id, created_at, status, total in orders.values_list(
+            'branch_id', 'created_at', 'status', 'total_amount').iterator():
+        row = rows[(branch_id, _day(created_at))]
+        row['orders'] += 1
+        row['pending_orders'] += status == 'pending'
+        row['revenue'] += total or 0
+    for branch_id, paid_at, amount in payments.values_list('order__branch_id', 'payment_date', 'amount').iterator():
+        rows[(branch_id, _day(paid_at))]['sales'] += amount
+    for branch_id, day in reservations.values_list('branch_id', 'reservation_date').iterator():
+        rows[(branch_id, day)]['reservations'] += 1
+
+    sold = defaultdict(int)
+    for branch_id, created_at, menu_item_id, quantity in items.values_list(
+            'order__branch_id', 'order__created_at', 'menu_item_id', 'quantity').iterator():
+        sold[(branch_id, _day(created_at), menu_item_id)] += quantity
+
+    with transaction.atomic():
+        day_counters.delete()
+        item_counters.delete()
+        DayCounter.objects.bulk_create(
+            [DayCounter(branch_id=branch_id, day=day, **values) for (branch_id, day), values in rows.items()],
+            batch_size=500,
+        )
+        ItemCounter.objects.bulk_create(
+            [ItemCounter(branch_id=branch_id, day=day, menu_item_id=menu_item_id, quantity=quantity)
+             for (branch_id, day, menu_item_id), quantity in sold.items()],
+            batch_size=500,
+        )
+    return len(rows) + len(sold)
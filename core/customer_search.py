@@ -0,0 +1,107 @@
+# core/customer_search.py
+"""
+Typeahead search over customers by name and phone.
+
+Each customer is indexed as a handful of CustomerSearchToken rows: every
+word of the name (lowercased, accents removed) and several forms of the
+phone number (as typed, local 07..., international 256... from
+core.phone, and every trailing run of the national digits, so a search
+for the last few digits matches too). A query word matches a customer when it is a prefix of one
+of their tokens, which is a range scan on the token index; all words of
+the query must match.
+"""
+import re
+import unicodedata
+from .models import Customer, CustomerSearchToken
+from .phone import msisdn, national_number
+
+TOKEN_LENGTH = 50
+MIN_QUERY_LENGTH = 2
+MAX_QUERY_WORDS = 4
+MAX_RESULTS = 25
+PHONE_SUFFIX_MIN = 3
+
+
+def normalize_text(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return re.sub(r'[^0-9a-z]+', ' ', value.lower()).strip()
+
+
+def phone_tokens(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    if not digits:
+        return set()
+
+    international = msisdn(phone) or digits
+    national = national_number(phone) or international
+    tokens = {digits, international}
+    if national != international:
+        tokens.add('0' + national)
+    for start in range(len(national) - PHONE_SUFFIX_MIN + 1):
+        tokens.add(national[start:])
+    return tokens
+
+
+def customer_tokens(name, phone):
+    tokens = set(normalize_text(name).split()) | phone_tokens(phone)
+    return {token[:TOKEN_LENGTH] for token in tokens if token}
+
+
+def index_customer(customer):
+    """Rebuild the search tokens of one saved customer"""
+    CustomerSearchToken.objects.filter(customer=customer).delete()
+    CustomerSearchToken.objects.bulk_create([
+        CustomerSearchToken(customer=customer, token=token)
+        for token in customer_tokens(customer.name, customer.phone)
+    ])
+
+
+def query_words(query):
+    words = []
+    for word in (query or '').split():
+        # "+256 (0)772-123" style input: keep only the digits
+        if re.fullmatch(r'[\d+\-().]+', word):
+            word = re.sub(r'\D', '', word)
+        else:
+            word = normalize_text(word).replace(' ', '')
+        if word:
+            words.append(word[:TOKEN_LENGTH])
+    return words[:MAX_QUERY_WORDS]
+
+
+def search_customers(query, limit=10):
+    """Customers matching every word of ``query`` by prefix, at most ``limit``"""
+    words = query_words(query)
+    if sum(len(word) for word in words) < MIN_QUERY_LENGTH:
+        return []
+
+    customers = Customer.objects.all()
+    for word in words:
+        matching = CustomerSearchToken.objects.filter(
+            token__gte=word, token__lt=word + '\uffff'
+        ).values('customer_id')
+        customers = customers.filter(id__in=matching)
+
+    limit = max(1, min(int(limit), MAX_RESULTS))
+    results = list(customers.order_by()[:limit])
+    results.sort(key=lambda customer: customer.name.lower())
+    return results
+
+
+def customer_choices(selected=None, recent=5):
+    """
+    The few customers a form's customer select starts with: the most
+    recent ones plus whichever is already selected. Everyone else is
+    found through the search endpoint.
+    """
+    choices = list(Customer.objects.order_by('-created_at')[:recent])
+    if selected:
+        selected_id = getattr(selected, 'pk', selected)
+        if not any(str(customer.pk) == str(selected_id) for customer in choices):
+            customer = selected
+            if not isinstance(customer, Customer):
+                customer = Customer.objects.filter(pk=selected_id).first() if str(selected_id).isdigit() else None
+            if customer is not None:
+                choices.insert(0, customer)
+    return choices
@@ -0,0 +1,149 @@
+# core/idempotency.py
+"""
+Idempotency keys for POST endpoints that create things.
+
+The client sends a random ``Idempotency-Key`` header (or an
+``idempotency_key`` field) and reuses it when it retries. The first request
+claims the key in a transaction of its own, committed before the view
+runs, so other requests see the claim. The view then runs in the same
+transaction that stores its response, so either both commit or neither
+does. Replays of a completed key return the stored response with a single
+indexed lookup, and a replay that arrives while the first request is still
+running gets 409.
+
+The decorated view opts out of WriteTransactionMiddleware's request-wide
+transaction, which would otherwise hold the claim back until the view had
+finished. Put @idempotent above @admission_control so that replays return
+before they take rate limit tokens or a concurrency slot.
+
+Only successful responses ({"success": true}) are kept. After a failure
+the key is released, so the client can fix the problem and retry with it.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from .middleware import WriteTransactionMiddleware
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+FIELD = 'idempotency_key'
+
+
+def _request_key(request):
+    key = request.headers.get(HEADER) or request.POST.get(FIELD) or ''
+    return key.strip()[:100]
+
+
+def _request_hash(request):
+    payload = request.body if request.content_type != 'multipart/form-data' else \
+        json.dumps(sorted(request.POST.lists())).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _replay(record):
+    response = HttpResponse(record.response_body, content_type='application/json',
+                            status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(scope, key, request_hash):
+    """
+    Insert the in-progress row for ``key``. Returns None when this request
+    owns the key, otherwise the response to send back.
+    """
+    now = timezone.now()
+    ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+    stale_after = getattr(settings, 'IDEMPOTENCY_KEY_LOCK_SECONDS', 60)
+
+    for _ in range(2):
+        record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if record is not None:
+            abandoned = record.in_progress and record.created_at < now - timedelta(seconds=stale_after)
+            if record.expires_at <= now or abandoned:
+                # Expired, or its request died before committing anything
+                IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+            elif record.request_hash != request_hash:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'This idempotency key was already used for a different request'
+                }, status=422)
+            elif record.in_progress:
+                response = JsonResponse({
+                    'success': False,
+                    'error': 'This request is already being processed'
+                }, status=409)
+                response['Retry-After'] = '1'
+                return response
+            else:
+                return _replay(record)
+
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    scope=scope, key=key, request_hash=request_hash,
+                    expires_at=now + timedelta(seconds=ttl),
+                )
+            return None
+        except IntegrityError:
+            continue  # Another request claimed it first; look again
+
+    response = JsonResponse({'success': False, 'error': 'This request is already being processed'}, status=409)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _succeeded(response):
+    if response.status_code >= 400 or response.get('Content-Type', '') != 'application/json':
+        return False
+    try:
+        return bool(json.loads(response.content).get('success'))
+    except (ValueError, AttributeError):
+        return False
+
+
+def idempotent(scope):
+    """
+    Make a POST view idempotent per (scope, Idempotency-Key). Requests
+    without a key behave exactly as before.
+    """
+    def decorator(view_func):
+        @transaction.non_atomic_requests
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = _request_key(request)
+            if request.method != 'POST' or not key:
+                # The transaction WriteTransactionMiddleware would have used
+                if request.method in WriteTransactionMiddleware.SAFE_METHODS or \
+                        not getattr(settings, 'ATOMIC_WRITE_REQUESTS', True):
+                    return view_func(request, *args, **kwargs)
+                with transaction.atomic():
+                    return view_func(request, *args, **kwargs)
+
+            request_hash = _request_hash(request)
+            early = _claim(scope, key, request_hash)
+            if early is not None:
+                return early
+
+            response = None
+            try:
+                with transaction.atomic():
+                    response = view_func(request, *args, **kwargs)
+                    if _succeeded(response):
+                        IdempotencyKey.objects.filter(scope=scope, key=key).update(
+                            in_progress=False,
+                            status_code=response.status_code,
+                            response_body=response.content.decode(),
+                        )
+            finally:
+                # Failed or crashed: release the key so the client can retry
+                if response is None or not _succeeded(response):
+                    IdempotencyKey.objects.filter(scope=scope, key=key, in_progress=True).delete()
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,26 @@
+# core/locking.py
+"""
+Row locks for the write paths that read a row and then change it.
+
+On PostgreSQL, lock_rows() turns a queryset into SELECT ... FOR UPDATE,
+so two workers settling the same row take turns instead of both acting
+on what they read. With ``skip_locked``, rows another transaction already
+holds are left out (SKIP LOCKED) rather than waited for. That suits work
+any one worker may pick up, where waiting would only repeat what the
+lock holder is doing.
+
+SQLite has no row locks. There, with transaction_mode IMMEDIATE (see
+core.sqlite), every write transaction holds the database lock from its
+start, and lock_rows() returns the queryset unchanged. Locks only last
+inside a transaction, so call it within transaction.atomic().
+"""
+from django.db import connections
+
+
+def lock_rows(queryset, skip_locked=False):
+    """``queryset`` selected FOR UPDATE where the database supports it"""
+    features = connections[queryset.db].features
+    if not features.has_select_for_update:
+        return queryset
+    skip_locked = skip_locked and features.has_select_for_update_skip_locked
+    return queryset.select_for_update(skip_locked=skip_locked)
@@ -0,0 +1,63 @@
+# core/management/commands/benchmark_sessions.py
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+ENGINES = ['django.contrib.sessions.backends.db', 'core.sessions']
+
+
+class SessionWriteCounter:
+    """execute_wrapper counting INSERT/UPDATE/DELETE statements on django_session"""
+
+    def __init__(self):
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql and sql.lstrip().split(' ', 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Compare django_session writes per request for the stock database engine and core.sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per engine (default 50)')
+        parser.add_argument('--username', help='User to browse as (default: the first superuser)')
+
+    def handle(self, *args, **options):
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError('No such user; pass --username')
+
+        # A page view and the two things dashboards and order lists poll
+        urls = [
+            reverse('core:dashboard'),
+            reverse('core:dashboard_panel', args=['recent_orders']),
+            reverse('orders:order_list_newer'),
+        ]
+        count = max(1, options['requests'])
+
+        for engine in ENGINES:
+            with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+                client = Client()
+                client.force_login(user)
+                counter = SessionWriteCounter()
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    for number in range(count):
+                        client.get(urls[number % len(urls)])
+                    elapsed = time.perf_counter() - started
+                writes = counter.writes
+                client.logout()
+            self.stdout.write(
+                f"{engine:<40} {count} requests  {writes} session writes  "
+                f"({writes / count:.2f}/request)  {elapsed * 1000 / count:.1f} ms/request"
+            )
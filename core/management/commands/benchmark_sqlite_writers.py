@@ -0,0 +1,128 @@
+# core/management/commands/benchmark_sqlite_writers.py
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from core.models import IdempotencyKey
+from orders.models import OrderNumberSequence
+
+# Stock Django on SQLite: rollback journal, deferred transactions, Python's 5s timeout
+STOCK = {'OPTIONS': {}, 'PRAGMAS': {'journal_mode': 'DELETE'}}
+
+BRANCHES = 4
+
+
+def _database(path, config):
+    """
+    Settings for a scratch database alias: the default database's, pointed
+    at ``path``. ``config`` overrides them; without a PRAGMAS key the
+    connections get SQLITE_PRAGMAS from core.sqlite, like the site's own.
+    """
+    database = dict(connections.settings[DEFAULT_DB_ALIAS])
+    database.update({'NAME': path, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False})
+    database.update(config)
+    return database
+
+
+def _setup(alias):
+    with connections[alias].schema_editor() as editor:
+        editor.create_model(OrderNumberSequence)
+        editor.create_model(IdempotencyKey)
+    OrderNumberSequence.objects.using(alias).bulk_create(
+        OrderNumberSequence(scope=f'branch-{branch}') for branch in range(BRANCHES)
+    )
+
+
+class Command(BaseCommand):
+    help = 'Hammer a scratch SQLite database with concurrent writers and readers, stock vs tuned settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--orders', type=int, default=200, help='Orders each writer places (default 200)')
+
+    def run(self, label, config, writers, readers, orders):
+        directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+        alias = f'benchmark_{label}'
+        connections.settings[alias] = _database(os.path.join(directory, 'bench.sqlite3'), config)
+        _setup(alias)
+        connections[alias].close()
+
+        errors, latencies = [], []
+        lock = threading.Lock()
+        done = threading.Event()
+        expires_at = timezone.now() + timedelta(days=1)
+
+        def writer(number):
+            sequence_row = OrderNumberSequence.objects.using(alias).filter(scope=f'branch-{number % BRANCHES}')
+            for sequence in range(orders):
+                started = time.perf_counter()
+                try:
+                    # Like an order submission: read, then write, in one transaction
+                    with transaction.atomic(using=alias):
+                        sequence_row.values_list('next_value', flat=True).first()
+                        IdempotencyKey.objects.using(alias).create(
+                            scope='benchmark', key=f'{number}-{sequence}', request_hash='',
+                            expires_at=expires_at,
+                        )
+                        sequence_row.update(next_value=F('next_value') + 1)
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                except OperationalError as e:
+                    with lock:
+                        errors.append(str(e))
+            connections[alias].close()
+
+        def reader():
+            # Dashboards and order lists polling meanwhile
+            keys = IdempotencyKey.objects.using(alias)
+            while not done.is_set():
+                try:
+                    list(keys.values('scope').annotate(count=Count('id')))
+                except OperationalError:
+                    pass
+            connections[alias].close()
+
+        reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+        writer_threads = [threading.Thread(target=writer, args=(number,)) for number in range(writers)]
+        started = time.perf_counter()
+        for thread in reader_threads + writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        for thread in reader_threads:
+            thread.join()
+
+        stored = IdempotencyKey.objects.using(alias).count()
+        counted = OrderNumberSequence.objects.using(alias).aggregate(total=Sum('next_value'))['total'] - BRANCHES
+        connections[alias].close()
+        del connections.settings[alias]
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+        locked = sum('locked' in error for error in errors)
+        self.stdout.write(
+            f"{label:<6} committed {len(latencies):>5}/{writers * orders}  "
+            f"'database is locked' {locked:>4}  other errors {len(errors) - locked}  "
+            f"{len(latencies) / elapsed:>7.0f} orders/s  p95 {p95:.1f} ms  "
+            f"(rows {stored}, counters {counted})"
+        )
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError("The default database is not SQLite; there is nothing to benchmark")
+        writers, readers, orders = options['writers'], options['readers'], options['orders']
+        self.stdout.write(f"{writers} writers x {orders} orders, {readers} readers polling")
+        self.run('stock', STOCK, writers, readers, orders)
+        # The configured DATABASES options and SQLITE_PRAGMAS
+        self.run('tuned', {}, writers, readers, orders)
@@ -0,0 +1,20 @@
+# core/management/commands/rebuild_dashboard_counters.py
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-branch daily dashboard counters from orders, payments and reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Only rebuild the last N days (default: everything)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.localdate() - timedelta(days=max(0, options['days'] - 1))
+        rows = rebuild_counters(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} counter row(s)"))
@@ -0,0 +1,52 @@
+# core/management/commands/refresh_reporting_snapshot.py
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from core.reporting import refresh_snapshot, reporting_alias
+
+
+class Command(BaseCommand):
+    help = 'Refresh the database snapshot the reports read from (core.reporting)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'REPORTING_SNAPSHOT_INTERVAL', 300),
+                            help='Seconds between refreshes when left running')
+        parser.add_argument('--once', action='store_true',
+                            help='Take one snapshot and exit (for cron)')
+
+    def handle(self, *args, **options):
+        alias = reporting_alias()
+        if alias is None:
+            raise CommandError("No reporting database configured (settings.REPORTING_DATABASE)")
+
+        if connections[alias].vendor != 'sqlite':
+            # A PostgreSQL replica is kept up to date by replication
+            self.replica_lag(alias)
+            return
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError("A SQLite snapshot can only be taken of a SQLite database")
+
+        try:
+            while True:
+                started = time.monotonic()
+                path = refresh_snapshot()
+                self.stdout.write(self.style.SUCCESS(
+                    f"Snapshot written to {path} in {time.monotonic() - started:.2f}s"
+                ))
+                close_old_connections()
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping...")
+
+    def replica_lag(self, alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT now() - pg_last_xact_replay_timestamp()")
+            lag = cursor.fetchone()[0]
+        if lag is None:
+            self.stdout.write(f"'{alias}' is not replaying from a primary; nothing to refresh")
+        else:
+            self.stdout.write(f"'{alias}' is a replica, {lag} behind the primary")
@@ -1,20 +1,29 @@
+from django.conf import settings
+from django.db import transaction
 from django.utils.deprecation import MiddlewareMixin
-from .models import Employee
+from .branch_context import attach_employee_context
 
 class BranchMiddleware(MiddlewareMixin):
     def process_request(self, request):
-        # Set branch for authenticated users
-        if request.user.is_authenticated:
-            try:
-                employee = Employee.objects.get(user=request.user)
-                request.branch = employee.branch
-                request.employee = employee
-            except Employee.DoesNotExist:
-                request.branch = None
-                request.employee = None
-        else:
-            request.branch = None
-            request.employee = None
+        # Set branch and employee for authenticated users (None otherwise),
+        # served from the per-user cache in core.branch_context
+        attach_employee_context(request)
 
 
+class WriteTransactionMiddleware(MiddlewareMixin):
+    """
+    Run POST/PUT/PATCH/DELETE views in one transaction, like ATOMIC_REQUESTS
+    but leaving reads alone (with transaction_mode IMMEDIATE every atomic
+    block takes the write lock). Views that call out to other services
+    mid-request opt out with @transaction.non_atomic_requests. Must come
+    last in MIDDLEWARE, since it calls the view itself.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
 
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(settings, 'ATOMIC_WRITE_REQUESTS', True) or request.method in self.SAFE_METHODS:
+            return None
+        if 'default' in getattr(view_func, '_non_atomic_requests', ()):
+            return None
+        with transaction.atomic():
+            return view_func(request, *view_args, **view_kwargs)
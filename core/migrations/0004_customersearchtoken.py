@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:48
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# A frozen copy of core.customer_search's tokenizer as it was when this
+# migration was written, so later changes there cannot alter it
+
+def normalize_text(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return re.sub(r'[^0-9a-z]+', ' ', value.lower()).strip()
+
+
+def phone_tokens(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    if not digits:
+        return set()
+
+    national = digits
+    if national.startswith('256') and len(national) > 9:
+        national = national[len('256'):]
+    national = national.lstrip('0') or national
+
+    tokens = {digits, '0' + national, '256' + national}
+    for start in range(len(national) - 3 + 1):
+        tokens.add(national[start:])
+    return tokens
+
+
+def customer_tokens(name, phone):
+    tokens = set(normalize_text(name).split()) | phone_tokens(phone)
+    return {token[:50] for token in tokens if token}
+
+
+def index_existing_customers(apps, schema_editor):
+    Customer = apps.get_model('core', 'Customer')
+    CustomerSearchToken = apps.get_model('core', 'CustomerSearchToken')
+    tokens = [
+        CustomerSearchToken(customer_id=customer_id, token=token)
+        for customer_id, name, phone in Customer.objects.values_list('id', 'name', 'phone').iterator()
+        for token in customer_tokens(name, phone)
+    ]
+    CustomerSearchToken.objects.bulk_create(tokens, batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='core.customer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'customer'], name='core_custtoken_token_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_customers, migrations.RunPython.noop),
+    ]
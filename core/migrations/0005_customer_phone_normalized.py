@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:51
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# A frozen copy of core.phone.normalize_phone as it was when this migration
+# was written, so later changes there cannot alter it
+def normalize_phone(phone):
+    phone = str(phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    code = str(getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', '256'))
+
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith(code) and len(digits) > 9:
+        pass
+    elif digits.startswith('0'):
+        digits = code + digits[1:]
+    elif len(digits) == 9:
+        digits = code + digits
+
+    if not 8 <= len(digits) <= 15:
+        return ''
+    return '+' + digits
+
+
+def merge_customers_by_phone(apps, schema_editor):
+    """
+    Fill phone_normalized and fold customers sharing a number into the
+    oldest one, moving their orders and reservations over.
+    """
+    Customer = apps.get_model('core', 'Customer')
+    Order = apps.get_model('orders', 'Order')
+    Reservation = apps.get_model('reservations', 'Reservation')
+
+    keepers = {}
+    for customer in Customer.objects.order_by('created_at', 'id').iterator():
+        normalized = normalize_phone(customer.phone) or None
+        keeper = keepers.get(normalized) if normalized else None
+        if keeper is None:
+            if normalized:
+                keepers[normalized] = customer
+            customer.phone_normalized = normalized
+            customer.save(update_fields=['phone_normalized'])
+            continue
+
+        Order.objects.filter(customer_id=customer.id).update(customer_id=keeper.id)
+        Reservation.objects.filter(customer_id=customer.id).update(customer_id=keeper.id)
+        changed = []
+        for field in ('email', 'address', 'preferred_branch_id'):
+            if not getattr(keeper, field) and getattr(customer, field):
+                setattr(keeper, field, getattr(customer, field))
+                changed.append(field)
+        if changed:
+            keeper.save(update_fields=changed)
+        customer.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_customersearchtoken'),
+        ('orders', '0007_orderstatusevent'),
+        ('reservations', '0002_alter_reservation_options_alter_table_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True),
+        ),
+        migrations.RunPython(merge_customers_by_phone, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customer',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True, unique=True),
+        ),
+    ]
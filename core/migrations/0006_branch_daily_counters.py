@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:59
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def _day(value):
+    if value is None:
+        return None
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def fill_counters(apps, schema_editor):
+    """
+    A frozen copy of core.counters.rebuild_counters() (for all time) as it
+    was when this migration was written, so later changes there cannot
+    alter it.
+    """
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Payment = apps.get_model('orders', 'Payment')
+    Reservation = apps.get_model('reservations', 'Reservation')
+    DayCounter = apps.get_model('core', 'BranchDailyCounter')
+    ItemCounter = apps.get_model('core', 'BranchDailyItemCounter')
+
+    rows = defaultdict(lambda: dict.fromkeys(('orders', 'pending_orders', 'revenue', 'sales', 'reservations'), 0))
+    for branch_id, created_at, status, total in Order.objects.values_list(
+            'branch_id', 'created_at', 'status', 'total_amount').iterator():
+        row = rows[(branch_id, _day(created_at))]
+        row['orders'] += 1
+        row['pending_orders'] += status == 'pending'
+        row['revenue'] += total or 0
+    payments = Payment.objects.filter(is_successful=True)
+    for branch_id, paid_at, amount in payments.values_list('order__branch_id', 'payment_date', 'amount').iterator():
+        rows[(branch_id, _day(paid_at))]['sales'] += amount
+    for branch_id, day in Reservation.objects.values_list('branch_id', 'reservation_date').iterator():
+        rows[(branch_id, day)]['reservations'] += 1
+
+    sold = defaultdict(int)
+    for branch_id, created_at, menu_item_id, quantity in OrderItem.objects.values_list(
+            'order__branch_id', 'order__created_at', 'menu_item_id', 'quantity').iterator():
+        sold[(branch_id, _day(created_at), menu_item_id)] += quantity
+
+    DayCounter.objects.bulk_create(
+        [DayCounter(branch_id=branch_id, day=day, **values) for (branch_id, day), values in rows.items()],
+        batch_size=500,
+    )
+    ItemCounter.objects.bulk_create(
+        [ItemCounter(branch_id=branch_id, day=day, menu_item_id=menu_item_id, quantity=quantity)
+         for (branch_id, day, menu_item_id), quantity in sold.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_customer_phone_normalized'),
+        ('orders', '0009_order_search_index'),
+        ('reservations', '0002_alter_reservation_options_alter_table_options'),
+        ('inventory', '0009_menuitem_effective_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchDailyCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('pending_orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('reservations', models.IntegerField(default=0)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.branch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'branch'], name='core_branch_day_0906be_idx')],
+                'unique_together': {('branch', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BranchDailyItemCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.branch')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.menuitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'branch', 'quantity'], name='core_branch_day_6304f9_idx')],
+                'unique_together': {('branch', 'day', 'menu_item')},
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -3,7 +3,9 @@ from django.db.models import F  # Add this import
 from django.utils import timezone  # Add this import
 from django.contrib.auth.models import User
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from .phone import normalize_phone
 
 class Restaurant(models.Model):
     name = models.CharField(max_length=200)
@@ -106,6 +108,9 @@ class Employee(models.Model):
 class Customer(models.Model):
     name = models.CharField(max_length=100)
     phone = models.CharField(max_length=20)
+    # E.164 form of phone (core.phone), one customer per number; NULL when
+    # the phone cannot be normalized
+    phone_normalized = models.CharField(max_length=16, unique=True, null=True, blank=True, editable=False)
     email = models.EmailField(blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -114,10 +119,112 @@ class Customer(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def find_by_phone(cls, phone):
+        normalized = normalize_phone(phone)
+        if not normalized:
+            # Not a phone number we can normalize; only an exact match will do
+            return cls.objects.filter(phone=(phone or '').strip(), phone_normalized__isnull=True).first()
+        return cls.objects.filter(phone_normalized=normalized).first()
+    
+    def clean(self):
+        normalized = normalize_phone(self.phone)
+        if normalized and Customer.objects.filter(phone_normalized=normalized).exclude(pk=self.pk).exists():
+            raise ValidationError({'phone': 'A customer with this phone number already exists'})
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._search_source = (instance.__dict__.get('name'), instance.__dict__.get('phone'))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone) or None
+        if kwargs.get('update_fields') is not None and 'phone' in kwargs['update_fields']:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'phone_normalized'}
+        super().save(*args, **kwargs)
+        # Keep the typeahead tokens in step with the name and phone
+        source = (self.name, self.phone)
+        if source != getattr(self, '_search_source', None):
+            from .customer_search import index_customer
+            index_customer(self)
+            self._search_source = source
+    
     def orders_count(self):
         return self.order_set.count()
     
     orders_count.short_description = 'Total Orders'
 
 
+class CustomerSearchToken(models.Model):
+    """
+    One normalized word of a customer's name or one form of their phone
+    number, so typeahead lookups are indexed prefix scans (see
+    core.customer_search).
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=50)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'customer'], name='core_custtoken_token_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.token} -> {self.customer_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response recorded for a client-supplied Idempotency-Key, so a retried
+    or double-submitted request gets the original response instead of
+    running again (see core.idempotency).
+    """
+    scope = models.CharField(max_length=100)
+    key = models.CharField(max_length=100)
+    request_hash = models.CharField(max_length=64)
+    in_progress = models.BooleanField(default=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        unique_together = ['scope', 'key']
+    
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
 
+
+
+class BranchDailyCounter(models.Model):
+    """Dashboard figures of one branch for one day, kept current at write time (see core.counters)"""
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True)
+    day = models.DateField()
+    orders = models.IntegerField(default=0)
+    pending_orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    reservations = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['branch', 'day']
+        indexes = [models.Index(fields=['day', 'branch'])]
+    
+    def __str__(self):
+        return f"{self.branch or 'No branch'} {self.day}"
+
+
+class BranchDailyItemCounter(models.Model):
+    """Quantity of one menu item ordered at one branch on one day (see core.counters)"""
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True)
+    day = models.DateField()
+    menu_item = models.ForeignKey('inventory.MenuItem', on_delete=models.CASCADE, related_name='+')
+    quantity = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['branch', 'day', 'menu_item']
+        indexes = [models.Index(fields=['day', 'branch', 'quantity'])]
+    
+    def __str__(self):
+        return f"{self.menu_item_id} x {self.quantity} ({self.day})"
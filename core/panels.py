@@ -0,0 +1,91 @@
+# core/panels.py
+"""
+Dashboard panels rendered on their own.
+
+The dashboard pages only render the headline figures (write-time
+counters) and leave an empty slot for each panel below. static/js/
+dashboard_panels.js then fetches every slot's fragment from the
+dashboard_panel view in parallel, so the first paint never waits on the
+slower lists.
+
+Each panel's HTML is cached per branch (or for all branches) for its own
+TTL: recent orders go stale fastest, the staff list hardly ever.
+DASHBOARD_PANEL_TTLS overrides the defaults per panel name. Panel
+templates get no request context, so one cached fragment serves every
+user who may see that branch.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone
+from inventory.models import Stock
+from orders.models import Order
+from reservations.models import Reservation
+from .counters import popular_items
+from .models import Employee
+
+CACHE_KEY = 'core:dashboard_panel:{name}:{branch}'
+PANEL_SIZE = 10
+
+
+def recent_orders(branch):
+    orders = Order.objects.select_related('customer').order_by('-created_at', '-id')
+    if branch is not None:
+        orders = orders.filter(branch=branch)
+    return {'recent_orders': list(orders[:PANEL_SIZE])}
+
+
+def upcoming_reservations(branch):
+    today = timezone.localdate()
+    reservations = Reservation.objects.filter(
+        reservation_date__range=[today, today + timedelta(days=3)]
+    ).select_related('customer', 'table').order_by('reservation_date', 'reservation_time')
+    if branch is not None:
+        reservations = reservations.filter(branch=branch)
+    return {'upcoming_reservations': list(reservations[:PANEL_SIZE])}
+
+
+def low_stock(branch):
+    items = Stock.get_low_stock_items().select_related('ingredient', 'branch').order_by('quantity')
+    if branch is not None:
+        items = items.filter(branch=branch)
+    return {'low_stock_items': list(items[:PANEL_SIZE]), 'show_branch': branch is None}
+
+
+def popular_items_today(branch):
+    return {'popular_items_today': list(popular_items(branch=branch))}
+
+
+def employees(branch):
+    staff = Employee.objects.filter(is_active=True).select_related('user', 'branch').order_by('user__first_name', 'id')
+    if branch is not None:
+        staff = staff.filter(branch=branch)
+    return {'employees': list(staff[:PANEL_SIZE]), 'show_branch': branch is None}
+
+
+# name -> (context builder, template, default TTL in seconds)
+PANELS = {
+    'recent_orders': (recent_orders, 'core/panels/recent_orders.html', 15),
+    'upcoming_reservations': (upcoming_reservations, 'core/panels/upcoming_reservations.html', 60),
+    'low_stock': (low_stock, 'core/panels/low_stock.html', 120),
+    'popular_items': (popular_items_today, 'core/panels/popular_items.html', 60),
+    'employees': (employees, 'core/panels/employees.html', 300),
+}
+
+
+def panel_ttl(name):
+    return getattr(settings, 'DASHBOARD_PANEL_TTLS', {}).get(name, PANELS[name][2])
+
+
+def render_panel(name, branch=None):
+    """HTML of panel ``name`` for ``branch`` (None: all branches), cached for the panel's TTL"""
+    key = CACHE_KEY.format(name=name, branch=branch.pk if branch is not None else 'all')
+    html = cache.get(key)
+    if html is None:
+        build, template_name, _ = PANELS[name]
+        context = build(branch)
+        context['branch'] = branch
+        html = render_to_string(template_name, context)
+        cache.set(key, html, panel_ttl(name))
+    return html
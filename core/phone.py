@@ -0,0 +1,53 @@
+# core/phone.py
+"""
+The one place phone numbers are normalized.
+
+Numbers are stored and compared in E.164 form (+256772123456). Local
+numbers (0772 123456, 772123456) get PHONE_DEFAULT_COUNTRY_CODE, numbers
+written with + or 00 keep their own country code. Anything that cannot be
+a phone number normalizes to ''.
+"""
+import re
+from django.conf import settings
+
+MIN_DIGITS = 8
+MAX_DIGITS = 15  # E.164 limit, country code included
+NATIONAL_DIGITS = 9
+
+
+def country_code():
+    return str(getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', '256'))
+
+
+def normalize_phone(phone):
+    """E.164 form of ``phone``, or '' when it cannot be one"""
+    phone = str(phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    code = country_code()
+
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith(code) and len(digits) > NATIONAL_DIGITS:
+        pass
+    elif digits.startswith('0'):
+        digits = code + digits[1:]
+    elif len(digits) == NATIONAL_DIGITS:
+        digits = code + digits
+
+    if not MIN_DIGITS <= len(digits) <= MAX_DIGITS:
+        return ''
+    return '+' + digits
+
+
+def msisdn(phone):
+    """E.164 without the plus (256772123456), as mobile money APIs expect"""
+    return normalize_phone(phone).lstrip('+')
+
+
+def national_number(phone):
+    """Digits after the default country code (772123456), '' for foreign numbers"""
+    digits = msisdn(phone)
+    code = country_code()
+    return digits[len(code):] if digits.startswith(code) else ''
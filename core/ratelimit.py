@@ -0,0 +1,172 @@
+# core/ratelimit.py
+"""
+Admission control for the public (unauthenticated) ordering endpoints.
+
+Two checks run before the view:
+  * token buckets per client IP and, for submissions, per phone number
+  * a global cap on how many public ordering requests run at once
+
+State lives in a small SQLite file of its own (RATELIMIT_STORE_PATH), so
+every worker process on the machine shares the same buckets and slots
+without a cache server, and the checks never wait on the main database's
+write lock. If the store itself fails, requests are let through.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from functools import wraps
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from .phone import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitStore:
+    def __init__(self, path=None):
+        self._path = path
+        self._local = threading.local()
+
+    @property
+    def path(self):
+        return str(self._path or getattr(settings, 'RATELIMIT_STORE_PATH',
+                                         settings.BASE_DIR / 'ratelimit.sqlite3'))
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'path', None) != self.path:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            # Losing this data on a crash only resets some counters
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS slots '
+                         '(id INTEGER PRIMARY KEY, scope TEXT NOT NULL, acquired REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS slots_scope ON slots (scope, acquired)')
+            self._local.conn = conn
+            self._local.path = self.path
+        return conn
+
+    def take(self, key, capacity, period, cost=1):
+        """
+        Take ``cost`` tokens from the bucket ``key`` (``capacity`` tokens,
+        refilled over ``period`` seconds). Returns (allowed, retry_after seconds).
+        """
+        rate = capacity / period
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+    def acquire_slot(self, scope, limit, stale_after=60):
+        """Claim one of ``limit`` concurrent slots; returns a slot id or None when full"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Slots left behind by a killed worker stop counting after a while
+            conn.execute('DELETE FROM slots WHERE scope = ? AND acquired < ?', (scope, now - stale_after))
+            in_use = conn.execute('SELECT COUNT(*) FROM slots WHERE scope = ?', (scope,)).fetchone()[0]
+            slot_id = None
+            if in_use < limit:
+                slot_id = conn.execute('INSERT INTO slots (scope, acquired) VALUES (?, ?)',
+                                       (scope, now)).lastrowid
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return slot_id
+
+    def release_slot(self, slot_id):
+        self._connection().execute('DELETE FROM slots WHERE id = ?', (slot_id,))
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM buckets')
+        conn.execute('DELETE FROM slots')
+
+
+def client_ip(request):
+    if getattr(settings, 'RATELIMIT_TRUST_FORWARDED_FOR', False):
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _too_many(retry_after, as_json):
+    retry_after = max(1, int(retry_after + 0.999))
+    message = f"Too many requests. Please try again in {retry_after} seconds."
+    if as_json:
+        response = JsonResponse({'success': False, 'error': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def admission_control(scope, ip_rate=None, phone_rate=None, phone_field=None,
+                      concurrency=None, as_json=False):
+    """
+    Guard a public view. Rates are names of settings holding
+    (requests, seconds) tuples. ``concurrency`` names the setting holding
+    a cap on requests in flight, shared by every view using that setting.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not getattr(settings, 'RATELIMIT_ENABLED', True):
+                return view_func(request, *args, **kwargs)
+
+            slot_id = None
+            try:
+                checks = []
+                if ip_rate:
+                    checks.append((f'{scope}:ip:{client_ip(request)}', getattr(settings, ip_rate)))
+                if phone_rate and phone_field and request.method == 'POST':
+                    raw_phone = request.POST.get(phone_field, '')
+                    phone = normalize_phone(raw_phone) or ''.join(filter(str.isdigit, raw_phone))
+                    if phone:
+                        checks.append((f'{scope}:phone:{phone}', getattr(settings, phone_rate)))
+
+                for key, (capacity, period) in checks:
+                    allowed, retry_after = ratelimit_store.take(key, capacity, period)
+                    if not allowed:
+                        return _too_many(retry_after, as_json)
+
+                if concurrency:
+                    slot_id = ratelimit_store.acquire_slot(concurrency, getattr(settings, concurrency))
+                    if slot_id is None:
+                        return _too_many(1, as_json)
+            except sqlite3.Error as e:
+                # Never turn customers away because the limiter broke
+                logger.warning(f"Rate limiter unavailable, letting the request through: {e}")
+
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                if slot_id is not None:
+                    try:
+                        ratelimit_store.release_slot(slot_id)
+                    except sqlite3.Error as e:
+                        logger.exception(f"Rate limiter could not release slot {slot_id}: {e}")
+        return wrapper
+    return decorator
+
+
+# Singleton instance
+ratelimit_store = RateLimitStore()
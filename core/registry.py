@@ -0,0 +1,97 @@
+# core/registry.py
+"""
+Site-wide reference data that almost every page needs: the restaurant
+profile (restaurant_info context processor) and the list of active
+branches (branch pickers on the order, reservation, inventory and report
+pages).
+
+Both are loaded once per worker and served from memory until a Restaurant
+or Branch is saved or deleted (see core/signals.py), which bumps a version
+kept in the SHARED_CACHE_ALIAS cache, like the employee context, so every
+worker reloads on its next read. REGISTRY_CACHE_TTL only bounds how long
+a worker can miss a bump.
+
+Callers get fresh model instances built from the cached field values, so
+changing one never leaks into another request.
+"""
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from .models import Branch, Restaurant
+
+VERSION_CACHE_KEY = 'core:registry_version'
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+class RegistrySnapshot:
+    __slots__ = ('version', 'built_at', 'restaurant', 'branches')
+
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        restaurant = Restaurant.objects.order_by('id').first()
+        self.restaurant = _values(restaurant) if restaurant is not None else None
+        self.branches = tuple(_values(branch) for branch in Branch.objects.filter(is_active=True).order_by('id'))
+
+
+def _shared_cache():
+    return caches[getattr(settings, 'SHARED_CACHE_ALIAS', 'default')]
+
+
+def _values(instance):
+    return tuple(getattr(instance, field.attname) for field in instance._meta.concrete_fields)
+
+
+def _instance(model, values):
+    return model.from_db('default', [field.attname for field in model._meta.concrete_fields], values)
+
+
+def _get_snapshot():
+    global _snapshot
+    ttl = getattr(settings, 'REGISTRY_CACHE_TTL', 300)
+    version = _shared_cache().get(VERSION_CACHE_KEY, 0)
+
+    snapshot = _snapshot
+    if (snapshot is not None and snapshot.version == version
+            and time.monotonic() - snapshot.built_at < ttl):
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshot
+        if (snapshot is None or snapshot.version != version
+                or time.monotonic() - snapshot.built_at >= ttl):
+            snapshot = RegistrySnapshot(version)
+            _snapshot = snapshot
+    return snapshot
+
+
+def get_restaurant():
+    """The restaurant profile, or None if it hasn't been set up"""
+    values = _get_snapshot().restaurant
+    return _instance(Restaurant, values) if values is not None else None
+
+
+def active_branches():
+    """Active branches in id order (a list, not a queryset)"""
+    return [_instance(Branch, values) for values in _get_snapshot().branches]
+
+
+def default_branch():
+    """The first active branch, or None"""
+    branches = _get_snapshot().branches
+    return _instance(Branch, branches[0]) if branches else None
+
+
+def invalidate_registry():
+    """Drop the snapshot here and tell other workers to drop theirs"""
+    global _snapshot
+    cache = _shared_cache()
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+    with _lock:
+        _snapshot = None
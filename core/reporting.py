@@ -0,0 +1,110 @@
+# core/reporting.py
+"""
+Reports read from a copy of the database, not from the one the POS writes.
+
+ReportingRouter (DATABASE_ROUTERS) sends reads inside reporting_reads()
+to the REPORTING_DATABASE alias. The reports views are wrapped in it.
+Only models of REPORTING_APPS move: sessions, users and the rest stay on
+the primary. Writes always go to the primary.
+
+On SQLite the alias opens its file read-only (a ``file:...?mode=ro``
+NAME). That file is a copy of the database taken with SQLite's online
+backup API by ``manage.py refresh_reporting_snapshot``: see
+refresh_snapshot(). Run it from cron, or leave it running with
+--interval. Until the first snapshot exists, reports read the primary as
+before.
+
+On PostgreSQL the alias points at a streaming replica (DB_REPLICA_HOST),
+which PostgreSQL keeps up to date itself.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_reporting = ContextVar('reporting_reads', default=False)
+
+DEFAULT_APPS = ('core', 'orders', 'payments', 'reservations', 'inventory')
+
+
+def reporting_alias():
+    """The reporting database alias, or None if it is not configured"""
+    alias = getattr(settings, 'REPORTING_DATABASE', 'reporting')
+    return alias if alias in settings.DATABASES else None
+
+
+def snapshot_path():
+    """File behind the SQLite reporting alias"""
+    name = str(connections[reporting_alias()].settings_dict['NAME'])
+    if name.startswith('file:'):
+        name = name[len('file:'):].split('?')[0]
+    return name
+
+
+def reporting_available():
+    alias = reporting_alias()
+    if alias is None:
+        return False
+    return connections[alias].vendor != 'sqlite' or os.path.exists(snapshot_path())
+
+
+@contextmanager
+def reporting_reads():
+    """Read REPORTING_APPS models from the reporting database (also a decorator)"""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+class ReportingRouter:
+    def db_for_read(self, model, **hints):
+        if not _reporting.get():
+            return None
+        if model._meta.app_label not in getattr(settings, 'REPORTING_APPS', DEFAULT_APPS):
+            return None
+        return reporting_alias() if reporting_available() else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, reporting_alias()}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The snapshot (or replica) gets its schema from the primary
+        if db == reporting_alias():
+            return False
+        return None
+
+
+def refresh_snapshot():
+    """
+    Copy the primary SQLite database over the reporting snapshot and
+    return its path. The backup is taken in one step, which is one read
+    transaction. In WAL mode that never blocks the POS's writers, and the
+    copy is consistent as of its start. It is written next to the
+    snapshot and moved over it, so readers see the old copy or the new
+    one, never a half-written file. Their connections (CONN_MAX_AGE 0)
+    pick up the new file on their next request.
+    """
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    path = snapshot_path()
+    partial = f'{path}.partial'
+    target = sqlite3.connect(partial)
+    try:
+        source.connection.backup(target)
+        # A rollback journal, not WAL: a -wal file left by an old snapshot
+        # must never be replayed into a new one
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+    os.replace(partial, path)
+    return path
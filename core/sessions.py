@@ -0,0 +1,103 @@
+# core/sessions.py
+"""
+Session engine that only writes to the database when it has to.
+
+With SESSION_SAVE_EVERY_REQUEST the stock engines UPDATE django_session
+on every response (page views and AJAX polls alike) just to slide the
+expiry date forward, and on SQLite each of those writes takes the
+database write lock. This engine (SESSION_ENGINE = 'core.sessions')
+keeps each session in the cache (SESSION_CACHE_ALIAS) next to the expiry
+date stored in its row, and on save only writes the row when:
+
+  * the session is new, or its data changed (logins, carts, messages...)
+  * the stored expiry has fallen more than SESSION_REFRESH_THRESHOLD
+    seconds behind the expiry the session would get now
+
+so a session may end up to SESSION_REFRESH_THRESHOLD seconds before
+its cookie does. Cache entries live at most SESSION_CACHE_TTL seconds.
+Reloading a session from the database is a read, which does not block
+other connections. SESSION_CACHE_ALIAS must be a cache every worker
+shares, so that a logout, flush or cycle_key() in one worker ends the
+session in all of them; core.checks refuses a per-process cache.
+"""
+import logging
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+
+KEY_PREFIX = 'core.sessions'
+
+logger = logging.getLogger('django.contrib.sessions')
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._stored_expiry = None  # expire_date of the database row, once known
+
+    def _remember(self, data):
+        """Cache ``data`` with the stored expiry, until that expiry or SESSION_CACHE_TTL"""
+        timeout = min(
+            (self._stored_expiry - timezone.now()).total_seconds(),
+            getattr(settings, 'SESSION_CACHE_TTL', 60),
+        )
+        if timeout <= 0:
+            return
+        try:
+            self._cache.set(self.cache_key, (data, self._stored_expiry), timeout)
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # Invalid keys raise on some backends; reset the session, like cached_db
+            entry = None
+        if entry is not None:
+            data, self._stored_expiry = entry
+            return data
+
+        stored = self._get_session_from_db()
+        if not stored:
+            return {}
+        data = self.decode(stored.session_data)
+        self._stored_expiry = stored.expire_date
+        self._remember(data)
+        return data
+
+    def needs_write(self):
+        """Whether save() has to write the row (see the module docstring)"""
+        if self.modified or self._stored_expiry is None:
+            return True
+        threshold = timedelta(seconds=getattr(settings, 'SESSION_REFRESH_THRESHOLD', 300))
+        return self.get_expiry_date() - self._stored_expiry >= threshold
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if not must_create:
+            self._get_session()  # the stored expiry comes with the data
+            if self.session_key is None:
+                # The stored session expired or was deleted meanwhile
+                return self.create()
+            if not self.needs_write():
+                return
+
+        # Write the row (skipping cached_db.save(), which would cache the bare data)
+        DBStore.save(self, must_create)
+        self._stored_expiry = self.get_expiry_date()
+        self._remember(self._session)
+
+    # The async API (async views, the async test client) goes through the
+    # same code; cached_db's versions would cache the bare session data
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
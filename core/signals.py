@@ -0,0 +1,53 @@
+# core/signals.py
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from orders.models import Order, OrderItem, Payment
+from reservations.models import Reservation
+from .models import Branch, Employee, Restaurant
+from .branch_context import invalidate_employee_context
+from .registry import invalidate_registry
+from .counters import STATE_FUNCTIONS, record_change, stored_state
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+def employee_context_changed(sender, **kwargs):
+    # After commit, so a reload can't pick up the old rows again
+    transaction.on_commit(invalidate_employee_context)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+def registry_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_registry)
+
+
+@receiver(pre_save, sender=Order)
+@receiver(pre_save, sender=OrderItem)
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=Reservation)
+def remember_counted_state(sender, instance, **kwargs):
+    instance._counted_state = stored_state(instance)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Reservation)
+def update_counters_on_save(sender, instance, **kwargs):
+    new_state = STATE_FUNCTIONS[sender._meta.label](instance)
+    record_change(instance, instance._counted_state, new_state)
+    instance._counted_state = new_state
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Reservation)
+def update_counters_on_delete(sender, instance, **kwargs):
+    record_change(instance, STATE_FUNCTIONS[sender._meta.label](instance), None)
@@ -0,0 +1,49 @@
+# core/sqlite.py
+"""
+Connection setup for SQLite.
+
+Every new connection runs the SQLITE_PRAGMAS from settings:
+
+  * journal_mode=WAL: readers no longer block the writer, nor the writer
+    readers (the mode sticks to the database file)
+  * synchronous=NORMAL: with WAL, a commit no longer waits on fsync; a
+    power cut can lose the last commits but never corrupts the file
+  * busy_timeout: how long a writer waits for the lock before
+    "database is locked"
+  * mmap_size / cache_size: keep hot pages in memory
+
+A DATABASES entry may carry a PRAGMAS dict of its own instead (the
+benchmark_sqlite_writers command uses this for its stock run).
+
+The rest of the setup lives in settings.DATABASES: transaction_mode
+IMMEDIATE makes transactions take the write lock when they start. A
+transaction that reads first and writes later otherwise tries to upgrade
+its lock, and SQLite fails that attempt at once, without honouring
+busy_timeout. CONN_MAX_AGE keeps one connection per worker thread open
+across requests, so the pragmas only run when it reconnects.
+core.middleware.WriteTransactionMiddleware runs each write request in a
+single transaction.
+"""
+from django.conf import settings
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 268435456,
+    'cache_size': -65536,
+    'temp_store': 'MEMORY',
+}
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver applying SQLITE_PRAGMAS (or the database's own PRAGMAS)"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS', getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS))
+    if 'mode=ro' in str(connection.settings_dict['NAME']):
+        # Read-only (the reporting snapshot): switching to WAL is a write
+        pragmas = {name: value for name, value in pragmas.items() if name != 'journal_mode'}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
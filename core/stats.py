@@ -0,0 +1,60 @@
+# core/stats.py
+"""
+Counting helpers for the dashboards.
+
+histogram() returns the count for every value of a field, plus the total,
+from a single conditional-aggregate query instead of one COUNT(*) per value.
+day_range() turns calendar days into datetime bounds that an index on the
+timestamp column can serve.
+"""
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+def histogram(queryset, field='status', values=None, branch=None, extra=None):
+    """
+    Count the rows of ``queryset`` per value of ``field`` in one query.
+
+    ``values`` defaults to the field's choices, so every bucket is present
+    (as 0) even when no row has that value. ``branch`` narrows the queryset
+    to one branch when given, and ``extra`` maps additional names to Q
+    objects counted in the same query (e.g. {'active': Q(is_active=True)}).
+
+    Returns a dict of {value: count, ..., 'total': count, **extra counts}.
+    """
+    if branch is not None:
+        queryset = queryset.filter(branch=branch)
+
+    if values is None:
+        choices = queryset.model._meta.get_field(field).flatchoices
+        values = [value for value, _ in choices]
+
+    aggregates = {'total': Count('pk')}
+    keys = {}
+    for i, value in enumerate(values):
+        alias = f'bucket_{i}'
+        keys[alias] = value
+        aggregates[alias] = Count('pk', filter=Q(**{field: value}))
+    for name, condition in (extra or {}).items():
+        keys[f'extra_{name}'] = name
+        aggregates[f'extra_{name}'] = Count('pk', filter=condition)
+
+    # Ordering does not change the counts, so drop it from the query
+    counts = queryset.order_by().aggregate(**aggregates)
+    return {keys.get(alias, alias): count for alias, count in counts.items()}
+
+
+def day_range(first, last=None):
+    """
+    (start, end) datetimes around the local days ``first`` to ``last``
+    (inclusive, default just ``first``), to filter with
+    ``created_at__gte=start, created_at__lt=end``. A ``created_at__date``
+    lookup wraps the column in a function, so it always scans the table.
+    """
+    start = datetime.combine(first, time.min)
+    end = datetime.combine((last or first) + timedelta(days=1), time.min)
+    if settings.USE_TZ:
+        start, end = timezone.make_aware(start), timezone.make_aware(end)
+    return start, end
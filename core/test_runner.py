@@ -0,0 +1,33 @@
+# core/test_runner.py
+import os
+import tempfile
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+FILE_BASED_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+class TestRunner(DiscoverRunner):
+    """
+    The stock runner, with the file-based caches (sessions, shared
+    versions) moved to a temporary directory for the run, so tests leave
+    no cache files in the checkout and never see entries from the
+    development server.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_directory = tempfile.TemporaryDirectory(prefix='test-caches-')
+        caches = {
+            alias: {**config, 'LOCATION': os.path.join(self._cache_directory.name, alias)}
+            if config.get('BACKEND') == FILE_BASED_CACHE else config
+            for alias, config in settings.CACHES.items()
+        }
+        self._cache_settings = override_settings(CACHES=caches)
+        self._cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_settings.disable()
+        self._cache_directory.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -1,7 +1,516 @@
-from django.test import TestCase
+import os
+import re
+import sqlite3
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.http import QueryDict
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from inventory.models import FoodCategory, Ingredient, MenuItem, Stock
+from notifications.models import NotificationChannel, NotificationLog, NotificationTemplate
+from orders.models import Order, OrderItem, Payment
+from orders.services import build_order_items, change_order_status, save_order_items
+from reservations.models import Reservation, Table
+from .branch_context import (
+    VERSION_CACHE_KEY as EMPLOYEE_CONTEXT_VERSION, get_employee, invalidate_employee_context,
+)
+from .checks import check_session_cache, check_shared_cache
+from .counters import day_totals, popular_items, rebuild_counters
+from .customer_search import search_customers
+from .models import Branch, Customer, Employee
+from .panels import PANELS
+from .registry import (
+    VERSION_CACHE_KEY as REGISTRY_VERSION, active_branches, default_branch, invalidate_registry,
+)
+from .reporting import ReportingRouter, refresh_snapshot, reporting_reads
+from .sessions import SessionStore
 
-# Create your tests here.
+# Tables whose hot filters have to be served by an index
+HOT_TABLES = (
+    'orders_order', 'orders_payment', 'reservations_reservation',
+    'inventory_stock', 'notifications_notificationlog',
+)
 
+# (url, table) full scans that no index can avoid, on the all-branch views:
+# the reservation status counts read every row, and low stock compares two
+# columns (quantity <= alert_level), which an index cannot search
+EXPECTED_SCANS = {
+    ('/reservations/', 'reservations_reservation'),
+    ('/dashboard/panels/low_stock/', 'inventory_stock'),
+}
 
 
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite syntax')
+class QueryPlanTests(TestCase):
+    """
+    Render the dashboards, reports and lists, run EXPLAIN QUERY PLAN on
+    every SELECT they make and fail on a full scan of a hot table. A scan
+    of an index (an ORDER BY ... LIMIT walking created_at, a count read
+    from a covering index) is fine; "SCAN orders_order" on its own is not.
+    """
 
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        manager = User.objects.create_user('manager', 'manager@example.com', 'pw')
+        Employee.objects.create(
+            user=manager, employee_id='M1', employee_type='manager', phone='1',
+            address='a', salary=1, branch=cls.branch,
+        )
+        customer = Customer.objects.create(name='Ann', phone='0772123456')
+        category = FoodCategory.objects.create(name='Food')
+        item = MenuItem.objects.create(
+            name='Soda', description='d', category=category, item_type='beverage',
+            price=1000, cost_price=1, preparation_time=5,
+        )
+        cls.orders = {}
+        for status in ('pending', 'served', 'cancelled', 'paid'):
+            order = cls.orders[status] = Order.objects.create(
+                branch=cls.branch, customer=customer, order_type='dine_in',
+                status=status, total_amount=1000,
+            )
+            OrderItem.objects.create(order=order, menu_item=item, quantity=1, unit_price=1000)
+        Payment.objects.create(order=order, amount=1000, payment_method='cash')
+        table = Table.objects.create(table_number='T1', table_type='4_seater', capacity=4, branch=cls.branch)
+        Reservation.objects.create(
+            customer=customer, table=table, branch=cls.branch, number_of_guests=2,
+            reservation_date=now.date() + timedelta(days=1), reservation_time='19:00',
+        )
+        Stock.objects.create(
+            branch=cls.branch, ingredient=Ingredient.objects.create(name='Rice', unit='kg', cost_per_unit=1),
+            quantity=1, alert_level=5,
+        )
+        NotificationLog.objects.create(
+            template=NotificationTemplate.objects.create(
+                name='Ready', notification_type='order_ready', subject_template='s', message_template='m',
+            ),
+            channel=NotificationChannel.objects.create(name='SMS', channel_type='sms'),
+            recipient='0772123456', message='m', status='failed',
+        )
+
+    def full_scans(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            details = [row[-1] for row in cursor.fetchall()]
+        pattern = re.compile(r'SCAN (?:TABLE )?(%s)\b' % '|'.join(HOT_TABLES))
+        return [
+            pattern.match(detail).group(1) for detail in details
+            if pattern.match(detail) and 'INDEX' not in detail
+        ]
+
+    def assertIndexed(self, username, urls):
+        """
+        Every SELECT made while rendering ``urls`` avoids full scans of
+        HOT_TABLES. Returns the responses by url.
+        """
+        self.client.force_login(User.objects.get(username=username))
+        failures = []
+        responses = {}
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = responses[url] = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            for query in queries.captured_queries:
+                sql = query['sql']
+                # The captured SQL has its parameters inlined already
+                if not sql.startswith('SELECT'):
+                    continue
+                for table in self.full_scans(sql, ()):
+                    if (url, table) not in EXPECTED_SCANS:
+                        failures.append(f"{url}: {sql}")
+        self.assertEqual(failures, [], '\n\n'.join(failures))
+        return responses
+
+    def panel_urls(self, branch=None):
+        suffix = f'?branch={branch.pk}' if branch else ''
+        return [reverse('core:dashboard_panel', args=[name]) + suffix for name in PANELS]
+
+    def test_dashboards(self):
+        self.assertIndexed('admin', [
+            reverse('core:dashboard'),
+            reverse('core:branch_list'),
+            reverse('core:admin_branch_dashboard', args=[self.branch.pk]),
+            *self.panel_urls(),
+            *self.panel_urls(self.branch),
+        ])
+        self.assertIndexed('manager', [
+            reverse('core:branch_dashboard', args=[self.branch.pk]),
+            *self.panel_urls(),
+        ])
+
+    def test_reports(self):
+        urls = [
+            reverse('reports:reports_dashboard'),
+            reverse('reports:sales_report'),
+            reverse('reports:inventory_report'),
+        ]
+        self.assertIndexed('admin', urls + [reverse('reports:reports_dashboard') + f'?branch={self.branch.pk}'])
+        self.assertIndexed('manager', urls)
+
+    def test_lists(self):
+        urls = [
+            reverse('orders:order_list'),
+            reverse('orders:order_list') + '?status=pending',
+            reverse('reservations:reservation_dashboard'),
+            reverse('reservations:reservation_list'),
+        ]
+        self.assertIndexed('admin', urls + [
+            reverse('orders:order_list') + f'?branch={self.branch.pk}',
+            reverse('orders:order_management'),
+            reverse('admin:notifications_notificationlog_changelist') + '?status__exact=failed',
+        ])
+        responses = self.assertIndexed('manager', urls)
+
+        # The indexes serve the same rows as before
+        everything = responses[reverse('orders:order_list')].context
+        self.assertEqual(everything['total_orders'], 4)
+        self.assertEqual(everything['pending_orders'], 1)
+        self.assertEqual(everything['cancelled_orders'], 1)
+        pending = responses[reverse('orders:order_list') + '?status=pending'].context['orders']
+        self.assertEqual([order.pk for order in pending], [self.orders['pending'].pk])
+        reservations = responses[reverse('reservations:reservation_list')]
+        self.assertContains(reservations, 'Ann')
+
+
+class CounterTests(TestCase):
+    """
+    The counters kept at write time match what rebuild_counters() computes
+    from the raw tables after each kind of write.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.branches = [
+            Branch.objects.create(
+                name=name, address='a', phone='1', email=f'{name.lower()}@example.com',
+                opening_time='09:00', closing_time='22:00',
+            )
+            for name in ('Main', 'Second')
+        ]
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.customer = Customer.objects.create(name='Ann', phone='0772123456')
+        category = FoodCategory.objects.create(name='Food')
+        cls.soda, cls.chips = (
+            MenuItem.objects.create(
+                name=name, description='d', category=category, item_type=item_type,
+                price=price, cost_price=1, preparation_time=5,
+            )
+            for name, item_type, price in (('Soda', 'beverage', 1000), ('Chips', 'side', 3000))
+        )
+
+    def lines(self, soda=0, chips=0):
+        data = QueryDict(mutable=True)
+        data.update({f'qty_{self.soda.pk}': soda, f'qty_{self.chips.pk}': chips})
+        return data
+
+    def place_order(self, branch, **quantities):
+        order = Order(branch=branch, customer=self.customer, order_type='dine_in')
+        save_order_items(order, build_order_items(self.lines(**quantities)))
+        return order
+
+    def counted(self):
+        return {
+            branch.name: (
+                day_totals(branch=branch),
+                sorted((row['menu_item__name'], row['total_quantity'])
+                       for row in popular_items(branch=branch, limit=None)),
+            )
+            for branch in self.branches
+        }
+
+    def assertMatchesRebuild(self):
+        """Returns the counters, which rebuild_counters() left unchanged"""
+        counted = self.counted()
+        rebuild_counters()
+        self.assertEqual(counted, self.counted())
+        return counted
+
+    def test_new_order(self):
+        self.place_order(self.branches[0], soda=2, chips=1)
+
+        totals, items = self.assertMatchesRebuild()['Main']
+        self.assertEqual((totals['orders'], totals['pending_orders'], totals['revenue']), (1, 1, 5000))
+        self.assertEqual(items, [('Chips', 1), ('Soda', 2)])
+
+    def test_status_change_and_payment(self):
+        order = self.place_order(self.branches[0], soda=1)
+        change_order_status(order, 'preparing')
+        Payment.objects.create(order=order, amount=1000, payment_method='cash')
+
+        totals, _ = self.assertMatchesRebuild()['Main']
+        self.assertEqual((totals['pending_orders'], totals['sales']), (0, 1000))
+
+    def test_edited_lines(self):
+        order = self.place_order(self.branches[0], soda=2, chips=1)
+        self.client.force_login(self.admin)
+
+        self.client.post(reverse('orders:order_edit', args=[order.pk]), {
+            'customer': self.customer.pk, 'order_type': 'dine_in', **self.lines(soda=3).dict(),
+        })
+
+        totals, items = self.assertMatchesRebuild()['Main']
+        self.assertEqual(totals['revenue'], 3000)
+        self.assertEqual(items, [('Soda', 3)])
+
+    def test_order_moved_to_another_branch(self):
+        order = self.place_order(self.branches[0], soda=2, chips=1)
+        Payment.objects.create(order=order, amount=5000, payment_method='cash')
+        self.client.force_login(self.admin)
+
+        self.client.post(reverse('orders:order_edit', args=[order.pk]), {
+            'customer': self.customer.pk, 'order_type': 'dine_in', 'branch': self.branches[1].pk,
+            **self.lines(soda=2, chips=2).dict(),
+        })
+
+        counted = self.assertMatchesRebuild()
+        self.assertEqual(counted['Main'], (dict.fromkeys(day_totals(), 0), []))
+        totals, items = counted['Second']
+        self.assertEqual((totals['orders'], totals['revenue'], totals['sales']), (1, 8000, 5000))
+        self.assertEqual(items, [('Chips', 2), ('Soda', 2)])
+
+    def test_deleted_order(self):
+        order = self.place_order(self.branches[0], soda=2)
+        Payment.objects.create(order=order, amount=2000, payment_method='cash')
+        self.place_order(self.branches[0], chips=1)
+
+        order.delete()
+
+        totals, items = self.assertMatchesRebuild()['Main']
+        self.assertEqual((totals['orders'], totals['revenue'], totals['sales']), (1, 3000, 0))
+        self.assertEqual(items, [('Chips', 1)])
+
+
+class CustomerSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann = Customer.objects.create(name='Ann Okello', phone='0772 123456')
+        cls.jose = Customer.objects.create(name='José Mukasa', phone='+256701987654')
+        cls.anna = Customer.objects.create(name='Annabel Okot', phone='0782555111')
+
+    def names(self, query):
+        return [customer.name for customer in search_customers(query)]
+
+    def test_name_prefixes(self):
+        self.assertEqual(self.names('ann'), ['Ann Okello', 'Annabel Okot'])
+        self.assertEqual(self.names('OKE'), ['Ann Okello'])
+        self.assertEqual(self.names('jose'), ['José Mukasa'])
+
+    def test_every_word_has_to_match(self):
+        self.assertEqual(self.names('ann oko'), ['Annabel Okot'])
+        self.assertEqual(self.names('jose okello'), [])
+
+    def test_phone_in_any_form(self):
+        for query in ('0772123', '256772', '+256 (0)772-123456', '772123456'):
+            with self.subTest(query=query):
+                self.assertEqual(self.names(query), ['Ann Okello'])
+        self.assertEqual(self.names('0701 98'), ['José Mukasa'])
+
+    def test_trailing_phone_digits(self):
+        self.assertEqual(self.names('3456'), ['Ann Okello'])
+        self.assertEqual(self.names('654'), ['José Mukasa'])
+        # Shorter than PHONE_SUFFIX_MIN, the tail of a number is no token
+        self.assertEqual(self.names('56'), [])
+
+    def test_too_short_query_finds_nothing(self):
+        self.assertEqual(self.names('a'), [])
+        self.assertEqual(self.names('  '), [])
+
+    def test_edited_customer_is_reindexed(self):
+        self.ann.name = 'Grace Okello'
+        self.ann.phone = '0750000000'
+        self.ann.save()
+
+        self.assertEqual(self.names('ann'), ['Annabel Okot'])
+        self.assertEqual(self.names('grace'), ['Grace Okello'])
+        self.assertEqual(self.names('3456'), [])
+
+
+class EmployeeContextTests(TestCase):
+    def setUp(self):
+        invalidate_employee_context()
+        self.branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        self.user = User.objects.create_user('manager', 'manager@example.com', 'pw')
+        Employee.objects.create(
+            user=self.user, employee_id='M1', employee_type='manager', phone='1',
+            address='a', salary=1, branch=self.branch,
+        )
+
+    def test_cached_until_an_employee_or_branch_is_saved(self):
+        self.assertEqual(get_employee(self.user).branch.name, 'Main')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_employee(self.user).branch.name, 'Main')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch.name = 'Centre'
+            self.branch.save()
+        self.assertEqual(get_employee(self.user).branch.name, 'Centre')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = Employee.objects.get(user=self.user)
+            employee.is_active = False
+            employee.save()
+        self.assertFalse(get_employee(self.user).is_active)
+
+    def test_bump_from_another_worker_drops_the_entry_here(self):
+        self.assertTrue(get_employee(self.user).is_active)
+        Employee.objects.filter(user=self.user).update(is_active=False)
+        self.assertTrue(get_employee(self.user).is_active)
+
+        # What invalidate_employee_context() does in another worker
+        caches[settings.SHARED_CACHE_ALIAS].incr(EMPLOYEE_CONTEXT_VERSION)
+
+        self.assertFalse(get_employee(self.user).is_active)
+
+
+class RegistryTests(TestCase):
+    def setUp(self):
+        invalidate_registry()
+        self.branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+
+    def test_cached_until_a_branch_is_saved(self):
+        self.assertEqual([branch.name for branch in active_branches()], ['Main'])
+        with self.assertNumQueries(0):
+            self.assertEqual(default_branch().name, 'Main')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch.is_active = False
+            self.branch.save()
+        self.assertEqual(active_branches(), [])
+        self.assertIsNone(default_branch())
+
+    def test_bump_from_another_worker_drops_the_snapshot_here(self):
+        self.assertEqual(default_branch().name, 'Main')
+        Branch.objects.update(name='Centre')
+        self.assertEqual(default_branch().name, 'Main')
+
+        # What invalidate_registry() does in another worker
+        caches[settings.SHARED_CACHE_ALIAS].incr(REGISTRY_VERSION)
+
+        self.assertEqual(default_branch().name, 'Centre')
+
+
+class ReportingRouterTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'reporting.sqlite3')
+        self.enterContext(mock.patch('core.reporting.snapshot_path', return_value=self.path))
+        self.router = ReportingRouter()
+
+    def take_snapshot(self):
+        open(self.path, 'wb').close()
+
+    def test_reads_stay_on_the_primary_until_a_snapshot_exists(self):
+        with reporting_reads():
+            self.assertIsNone(self.router.db_for_read(Order))
+
+        self.take_snapshot()
+
+        with reporting_reads():
+            self.assertEqual(self.router.db_for_read(Order), 'reporting')
+            # Sessions, users and the like always read the primary
+            self.assertIsNone(self.router.db_for_read(User))
+        self.assertIsNone(self.router.db_for_read(Order))
+
+    def test_writes_and_migrations_go_to_the_primary(self):
+        self.take_snapshot()
+        with reporting_reads():
+            self.assertEqual(self.router.db_for_write(Order), 'default')
+        self.assertFalse(self.router.allow_migrate('reporting', 'orders'))
+        self.assertIsNone(self.router.allow_migrate('default', 'orders'))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The snapshot is an SQLite backup')
+class ReportingSnapshotTests(TransactionTestCase):
+    # The backup reads committed rows, outside any test transaction
+
+    def test_snapshot_is_a_copy_of_the_primary(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'reporting.sqlite3')
+        Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+
+        with mock.patch('core.reporting.snapshot_path', return_value=path):
+            self.assertEqual(refresh_snapshot(), path)
+
+        snapshot = sqlite3.connect(path)
+        self.addCleanup(snapshot.close)
+        self.assertEqual(snapshot.execute('SELECT name FROM core_branch').fetchall(), [('Main',)])
+        self.assertFalse(os.path.exists(f'{path}.partial'))
+
+
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.session_key = self.client.session.session_key
+        self.cache = caches[settings.SESSION_CACHE_ALIAS]
+
+    def test_cache_stays_out_of_the_checkout(self):
+        self.assertFalse(Path(self.cache._dir).is_relative_to(settings.BASE_DIR))
+
+    def test_session_survives_cache_eviction(self):
+        self.assertEqual(self.client.get(reverse('core:dashboard')).status_code, 200)
+        self.cache.clear()
+
+        # Reloaded from its django_session row
+        self.assertEqual(self.client.get(reverse('core:dashboard')).status_code, 200)
+        self.assertTrue(SessionStore(self.session_key).exists(self.session_key))
+
+    def test_logout_ends_the_session_for_every_client(self):
+        other_worker = Client()
+        other_worker.cookies[settings.SESSION_COOKIE_NAME] = self.session_key
+        self.assertEqual(other_worker.get(reverse('core:dashboard')).status_code, 200)
+
+        self.client.post(reverse('logout'))
+
+        self.assertIsNone(self.cache.get(SessionStore(self.session_key).cache_key))
+        self.assertFalse(SessionStore(self.session_key).exists(self.session_key))
+        self.assertRedirects(
+            other_worker.get(reverse('core:dashboard')),
+            f"{reverse('login')}?next={reverse('core:dashboard')}",
+            fetch_redirect_response=False,
+        )
+
+
+class SessionCacheCheckTests(SimpleTestCase):
+    def test_configured_session_cache_passes(self):
+        self.assertEqual(check_session_cache(None), [])
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }, SESSION_CACHE_ALIAS='default')
+    def test_per_process_session_cache_is_an_error(self):
+        self.assertEqual([error.id for error in check_session_cache(None)], ['core.E001'])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db', SESSION_CACHE_ALIAS='default')
+    def test_other_session_engines_are_left_alone(self):
+        self.assertEqual(check_session_cache(None), [])
+
+    def test_configured_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(SHARED_CACHE_ALIAS='default')
+    def test_per_process_shared_cache_is_an_error(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['core.E002'])
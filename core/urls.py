@@ -11,6 +11,7 @@ urlpatterns = [
     path('home/', views.home, name='home'),
      # Management dashboard
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/panels/<slug:name>/', views.dashboard_panel, name='dashboard_panel'),
 
     path('branches/', views.branch_list, name='branch_list'),
     path('branches/<int:pk>/', views.branch_detail, name='branch_detail'),
@@ -24,6 +25,7 @@ urlpatterns = [
     path('employees/<int:pk>/edit/', views.employee_edit, name='employee_edit'),
     path('employees/<int:pk>/toggle/', views.employee_toggle, name='employee_toggle'),
     path('employees/<int:pk>/delete/', views.employee_delete, name='employee_delete'),
+    path('customers/search/', views.customer_search, name='customer_search'),
     path('branches/<int:branch_id>/admin-dashboard/', views.admin_branch_dashboard, name='admin_branch_dashboard'),
 ]
 
@@ -4,11 +4,20 @@ from django.contrib.auth.models import User
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
-from orders.models import Order, Payment, OrderItem
+from orders.models import Order, OrderItem
 from reservations.models import Reservation
 from .models import Branch, Employee
+from .stats import histogram
+from .branch_context import get_manager
+from .branch_summary import branch_summaries
+from .counters import day_totals
+from .panels import PANELS, panel_ttl, render_panel
+from .registry import active_branches, default_branch
+from .customer_search import search_customers
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
 from django.contrib import messages
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 
 
 @login_required
@@ -19,70 +28,27 @@ def dashboard(request):
         today = timezone.now().date()
         
         # System-wide statistics for admin
-        total_branches = Branch.objects.filter(is_active=True).count()
+        total_branches = len(active_branches())
         total_employees = Employee.objects.filter(is_active=True).count()
         
-        # Today's statistics - show ALL data for admin
-        today_orders = Order.objects.filter(created_at__date=today)
-        today_sales = Payment.objects.filter(
-            payment_date__date=today, 
-            is_successful=True
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Today's statistics - show ALL data for admin (write-time counters)
+        totals = day_totals(today)
         
-        # Today's revenue from orders
-        today_revenue = today_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # Today's reservations
-        today_reservations = Reservation.objects.filter(reservation_date=today)
-        
-        # Active employees count
-        active_employees = Employee.objects.filter(is_active=True).count()
-        
-        # Recent orders (last 10)
-        recent_orders = Order.objects.select_related('customer').order_by('-created_at')[:10]
-        
-        # Popular items today
-        popular_items_today = OrderItem.objects.filter(
-            order__created_at__date=today
-        ).values(
-            'menu_item__name'
-        ).annotate(
-            total_quantity=Sum('quantity')
-        ).order_by('-total_quantity')[:5]
-        
-        # Upcoming reservations (next 3 days)
-        upcoming_reservations = Reservation.objects.filter(
-            reservation_date__range=[today, today + timedelta(days=3)]
-        ).select_related('customer', 'table').order_by('reservation_date', 'reservation_time')[:5]
-        
-        # Get all active branches
-        all_branches = Branch.objects.filter(is_active=True)
-        
-        # Low stock items (if inventory app is available)
-        try:
-            from inventory.models import Stock
-            low_stock_items = Stock.get_low_stock_items()[:5]
-            low_stock_count = low_stock_items.count()
-        except ImportError:
-            low_stock_items = []
-            low_stock_count = 0
+        # Get all active branches, with their counts in the same query
+        all_branches = branch_summaries()
         
+        # Recent orders, reservations, low stock and popular items are
+        # panels loaded by the page itself (see core/panels.py)
         context = {
             'is_admin': True,
             'total_branches': total_branches,
             'total_employees': total_employees,
-            'today_orders_count': today_orders.count(),
-            'today_sales': today_sales,
-            'today_revenue': today_revenue,
-            'pending_orders': today_orders.filter(status='pending').count(),
-            'today_reservations': today_reservations.count(),
-            'active_employees': active_employees,
-            'recent_orders': recent_orders,
-            'today_reservations_list': today_reservations,
-            'popular_items_today': popular_items_today,
-            'upcoming_reservations': upcoming_reservations,
-            'low_stock_items': low_stock_items,
-            'low_stock_count': low_stock_count,
+            'today_orders_count': totals['orders'],
+            'today_sales': totals['sales'],
+            'today_revenue': totals['revenue'],
+            'pending_orders': totals['pending_orders'],
+            'today_reservations': totals['reservations'],
+            'total_low_stock': sum(branch.low_stock_count for branch in all_branches),
             'branches': all_branches,
         }
         
@@ -103,7 +69,7 @@ def dashboard(request):
     
     # Get the first active branch for display
     try:
-        branch = Branch.objects.filter(is_active=True).first()
+        branch = default_branch()
         if not branch:
             # Create a default branch if none exists
             branch = Branch.objects.create(
@@ -119,73 +85,24 @@ def dashboard(request):
         print(f"Branch error: {e}")
         branch = None
     
-    # Today's statistics - show ALL data for admin
-    today_orders = Order.objects.filter(created_at__date=today)
-    today_sales = Payment.objects.filter(
-        payment_date__date=today, 
-        is_successful=True
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Today's revenue from orders (alternative calculation)
-    today_revenue = today_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-    
-    # Today's reservations
-    today_reservations = Reservation.objects.filter(reservation_date=today)
+    # Today's statistics - show ALL data for admin (write-time counters)
+    totals = day_totals(today)
     
     # Active employees count
     active_employees = Employee.objects.filter(is_active=True).count()
     
-    # Recent orders (last 10)
-    recent_orders = Order.objects.select_related('customer').order_by('-created_at')[:10]
-    
-    # Popular items today
-    popular_items_today = OrderItem.objects.filter(
-        order__created_at__date=today
-    ).values(
-        'menu_item__name'
-    ).annotate(
-        total_quantity=Sum('quantity')
-    ).order_by('-total_quantity')[:5]
-    
-    # Upcoming reservations (next 3 days)
-    upcoming_reservations = Reservation.objects.filter(
-        reservation_date__range=[today, today + timedelta(days=3)]
-    ).select_related('customer', 'table').order_by('reservation_date', 'reservation_time')[:5]
-    
-    # Employee list for the branch
-    if branch:
-        branch_employees = branch.employee_set.filter(is_active=True)[:5]
-    else:
-        branch_employees = Employee.objects.filter(is_active=True)[:5]
-    
-    # Low stock items (if inventory app is available)
-    try:
-        from inventory.models import Stock
-        low_stock_items = Stock.get_low_stock_items()[:5]
-        low_stock_count = low_stock_items.count()
-    except ImportError:
-        low_stock_items = []
-        low_stock_count = 0
-    
     # Get all active branches for selection
-    all_branches = Branch.objects.filter(is_active=True)
+    all_branches = active_branches()
     
     context = {
         'branch': branch,
         'branches': all_branches,
-        'today_orders_count': today_orders.count(),
-        'today_sales': today_sales,
-        'today_revenue': today_revenue,
-        'pending_orders': today_orders.filter(status='pending').count(),
-        'today_reservations': today_reservations.count(),
+        'today_orders_count': totals['orders'],
+        'today_sales': totals['sales'],
+        'today_revenue': totals['revenue'],
+        'pending_orders': totals['pending_orders'],
+        'today_reservations': totals['reservations'],
         'active_employees': active_employees,
-        'recent_orders': recent_orders,
-        'today_reservations_list': today_reservations,
-        'popular_items_today': popular_items_today,
-        'upcoming_reservations': upcoming_reservations,
-        'branch_employees': branch_employees,
-        'low_stock_items': low_stock_items,
-        'low_stock_count': low_stock_count,
         'user_has_branch': user_branch is not None,
         'is_admin': False,  # Regular users are not admin
     }
@@ -202,67 +119,21 @@ def branch_dashboard(request, branch_id):
     
     today = timezone.now().date()
     
-    # Branch-specific statistics
-    today_orders = Order.objects.filter(branch=branch, created_at__date=today)
-    today_sales = Payment.objects.filter(
-        payment_date__date=today, 
-        is_successful=True,
-        order__branch=branch  # Filter payments by branch
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Today's revenue from orders for this branch
-    today_revenue = today_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-    
-    # Today's reservations for this branch
-    today_reservations = Reservation.objects.filter(branch=branch, reservation_date=today)
+    # Branch-specific statistics (write-time counters)
+    totals = day_totals(today, branch=branch)
     
     # Active employees for this branch
-    branch_employees = branch.employee_set.filter(is_active=True)
-    active_employees = branch_employees.count()
-    
-    # Recent orders for this branch (last 10)
-    recent_orders = Order.objects.filter(branch=branch).select_related('customer').order_by('-created_at')[:10]
-    
-    # Popular items today for this branch
-    popular_items_today = OrderItem.objects.filter(
-        order__branch=branch,
-        order__created_at__date=today
-    ).values(
-        'menu_item__name'
-    ).annotate(
-        total_quantity=Sum('quantity')
-    ).order_by('-total_quantity')[:5]
-    
-    # Upcoming reservations for this branch (next 3 days)
-    upcoming_reservations = Reservation.objects.filter(
-        branch=branch,
-        reservation_date__range=[today, today + timedelta(days=3)]
-    ).select_related('customer', 'table').order_by('reservation_date', 'reservation_time')[:5]
-    
-    # Low stock items (if inventory app is available) - you might want to filter by branch too
-    try:
-        from inventory.models import Stock
-        low_stock_items = Stock.get_low_stock_items()[:5]
-        low_stock_count = low_stock_items.count()
-    except ImportError:
-        low_stock_items = []
-        low_stock_count = 0
+    active_employees = branch.employee_set.filter(is_active=True).count()
     
+    # The lists below the figures are panels loaded by the page (core/panels.py)
     context = {
         'branch': branch,
-        'today_orders_count': today_orders.count(),
-        'today_sales': today_sales,
-        'today_revenue': today_revenue,
-        'pending_orders': today_orders.filter(status='pending').count(),
-        'today_reservations': today_reservations.count(),
+        'today_orders_count': totals['orders'],
+        'today_sales': totals['sales'],
+        'today_revenue': totals['revenue'],
+        'pending_orders': totals['pending_orders'],
+        'today_reservations': totals['reservations'],
         'active_employees': active_employees,
-        'recent_orders': recent_orders,
-        'today_reservations_list': today_reservations,
-        'popular_items_today': popular_items_today,
-        'upcoming_reservations': upcoming_reservations,
-        'branch_employees': branch_employees,
-        'low_stock_items': low_stock_items,
-        'low_stock_count': low_stock_count,
         'user_has_branch': True,
     }
     
@@ -276,7 +147,7 @@ def branch_list(request):
         return redirect('core:branch_detail', pk=user_branch.id)
     
     # Admin/superuser sees all branches
-    branches = Branch.objects.filter(is_active=True)
+    branches = branch_summaries(('employee_count', 'order_count', 'reservation_count'))
     
     return render(request, 'core/branch_list.html', {
         'branches': branches,
@@ -306,8 +177,8 @@ def branch_detail(request, pk):
     
     employees = branch.employee_set.filter(is_active=True)
     
-    # Calculate today's revenue
-    today_revenue = today_orders.aggregate(total=Sum('total_amount'))['total'] or 0
+    # Today's revenue (write-time counters)
+    today_revenue = day_totals(today, branch=branch)['revenue']
     
     # Weekly revenue trend
     week_ago = today - timedelta(days=7)
@@ -346,17 +217,20 @@ def branch_add(request):
     
     if request.method == 'POST':
         try:
-            branch = Branch.objects.create(
-                name=request.POST['name'],
-                address=request.POST['address'],
-                phone=request.POST['phone'],
-                email=request.POST['email'],
-                opening_time=request.POST['opening_time'],
-                closing_time=request.POST['closing_time'],
-                is_active=True
-            )
-            messages.success(request, f'Branch "{branch.name}" added successfully!')
-            return redirect('core:branch_list')
+            # In a savepoint of its own: after a failed write the request's
+            # transaction still works, and the error page can be rendered
+            with transaction.atomic():
+                branch = Branch.objects.create(
+                    name=request.POST['name'],
+                    address=request.POST['address'],
+                    phone=request.POST['phone'],
+                    email=request.POST['email'],
+                    opening_time=request.POST['opening_time'],
+                    closing_time=request.POST['closing_time'],
+                    is_active=True
+                )
+                messages.success(request, f'Branch "{branch.name}" added successfully!')
+                return redirect('core:branch_list')
         except Exception as e:
             messages.error(request, f'Error adding branch: {str(e)}')
     
@@ -375,17 +249,18 @@ def branch_edit(request, pk):
     
     if request.method == 'POST':
         try:
-            branch.name = request.POST['name']
-            branch.address = request.POST['address']
-            branch.phone = request.POST['phone']
-            branch.email = request.POST['email']
-            branch.opening_time = request.POST['opening_time']
-            branch.closing_time = request.POST['closing_time']
-            branch.is_active = 'is_active' in request.POST
-            branch.save()
+            with transaction.atomic():
+                branch.name = request.POST['name']
+                branch.address = request.POST['address']
+                branch.phone = request.POST['phone']
+                branch.email = request.POST['email']
+                branch.opening_time = request.POST['opening_time']
+                branch.closing_time = request.POST['closing_time']
+                branch.is_active = 'is_active' in request.POST
+                branch.save()
             
-            messages.success(request, f'Branch "{branch.name}" updated successfully!')
-            return redirect('core:branch_list')
+                messages.success(request, f'Branch "{branch.name}" updated successfully!')
+                return redirect('core:branch_list')
         except Exception as e:
             messages.error(request, f'Error updating branch: {str(e)}')
     
@@ -401,7 +276,7 @@ def employee_list(request):
     else:
         # Regular manager - only show their branch employees
         try:
-            manager_employee = Employee.objects.get(user=request.user, employee_type='manager')
+            manager_employee = get_manager(request)
             manager_branch = manager_employee.branch
             employees = Employee.objects.filter(branch=manager_branch).select_related('user', 'branch')
             is_admin = False
@@ -410,30 +285,24 @@ def employee_list(request):
             return redirect('core:dashboard')
     
     # Statistics - these will work for both admin and manager
-    total_employees = employees.count()
-    active_employees = employees.filter(is_active=True).count()
-    waiters = employees.filter(employee_type='waiter').count()
-    chefs = employees.filter(employee_type='chef').count()
-    cashiers = employees.filter(employee_type='cashier').count()
-    cleaners = employees.filter(employee_type='cleaner').count()
-    managers = employees.filter(employee_type='manager').count()
+    type_counts = histogram(employees, 'employee_type', extra={'active': Q(is_active=True)})
     
     return render(request, 'core/employee_list.html', {
         'employees': employees,
-        'total_employees': total_employees,
-        'active_employees': active_employees,
-        'waiters': waiters,
-        'chefs': chefs,
-        'cashiers': cashiers,
-        'cleaners': cleaners,
-        'managers': managers,
+        'total_employees': type_counts['total'],
+        'active_employees': type_counts['active'],
+        'waiters': type_counts['waiter'],
+        'chefs': type_counts['chef'],
+        'cashiers': type_counts['cashier'],
+        'cleaners': type_counts['cleaner'],
+        'managers': type_counts['manager'],
         'manager_branch': manager_branch,
         'is_admin': is_admin,  # ✅ Pass this to template
     })
 
 @login_required
 def employee_add(request):
-    branches = Branch.objects.filter(is_active=True)
+    branches = active_branches()
     
     # ✅ Check if user is admin/superuser
     if request.user.is_superuser or request.user.is_staff:
@@ -443,7 +312,7 @@ def employee_add(request):
         # Regular manager
         is_admin = False
         try:
-            manager_employee = Employee.objects.get(user=request.user, employee_type='manager')
+            manager_employee = get_manager(request)
             manager_branch = manager_employee.branch
         except Employee.DoesNotExist:
             messages.error(request, "Only managers can add employees.")
@@ -451,50 +320,51 @@ def employee_add(request):
     
     if request.method == 'POST':
         try:
-            # Create user account first
-            username = request.POST['username']
-            if User.objects.filter(username=username).exists():
-                messages.error(request, f'Username "{username}" already exists!')
-                return render(request, 'core/employee_add.html', {
-                    'branches': branches,
-                    'is_admin': is_admin,
-                    'manager_branch': manager_branch
-                })
+            with transaction.atomic():
+                # Create user account first
+                username = request.POST['username']
+                if User.objects.filter(username=username).exists():
+                    messages.error(request, f'Username "{username}" already exists!')
+                    return render(request, 'core/employee_add.html', {
+                        'branches': branches,
+                        'is_admin': is_admin,
+                        'manager_branch': manager_branch
+                    })
             
-            user = User.objects.create_user(
-                username=username,
-                password=request.POST['password'],
-                email=request.POST.get('email', ''),
-                first_name=request.POST['first_name'],
-                last_name=request.POST['last_name']
-            )
+                user = User.objects.create_user(
+                    username=username,
+                    password=request.POST['password'],
+                    email=request.POST.get('email', ''),
+                    first_name=request.POST['first_name'],
+                    last_name=request.POST['last_name']
+                )
             
-            # ✅ Determine which branch to assign
-            if is_admin:
-                # Admin can choose any branch
-                branch_id = request.POST.get('branch')
-                if branch_id:
-                    branch = Branch.objects.get(id=branch_id)
+                # ✅ Determine which branch to assign
+                if is_admin:
+                    # Admin can choose any branch
+                    branch_id = request.POST.get('branch')
+                    if branch_id:
+                        branch = Branch.objects.get(id=branch_id)
+                    else:
+                        branch = None
                 else:
-                    branch = None
-            else:
-                # Regular manager auto-assigns to their branch
-                branch = manager_branch
+                    # Regular manager auto-assigns to their branch
+                    branch = manager_branch
             
-            # Create employee record
-            employee = Employee.objects.create(
-                user=user,
-                employee_id=request.POST['employee_id'],
-                employee_type=request.POST['employee_type'],
-                phone=request.POST['phone'],
-                address=request.POST['address'],
-                salary=request.POST['salary'],
-                branch=branch,
-                is_active=True
-            )
+                # Create employee record
+                employee = Employee.objects.create(
+                    user=user,
+                    employee_id=request.POST['employee_id'],
+                    employee_type=request.POST['employee_type'],
+                    phone=request.POST['phone'],
+                    address=request.POST['address'],
+                    salary=request.POST['salary'],
+                    branch=branch,
+                    is_active=True
+                )
             
-            messages.success(request, f'Employee {user.get_full_name()} added successfully!')
-            return redirect('core:employee_list')
+                messages.success(request, f'Employee {user.get_full_name()} added successfully!')
+                return redirect('core:employee_list')
             
         except Exception as e:
             messages.error(request, f'Error adding employee: {str(e)}')
@@ -507,30 +377,31 @@ def employee_add(request):
 @login_required
 def employee_edit(request, pk):
     employee = get_object_or_404(Employee, pk=pk)
-    branches = Branch.objects.filter(is_active=True)
+    branches = active_branches()
     
     if request.method == 'POST':
         try:
-            # Update user account
-            user = employee.user
-            user.first_name = request.POST['first_name']
-            user.last_name = request.POST['last_name']
-            user.email = request.POST.get('email', '')
-            if request.POST.get('password'):
-                user.set_password(request.POST['password'])
-            user.save()
+            with transaction.atomic():
+                # Update user account
+                user = employee.user
+                user.first_name = request.POST['first_name']
+                user.last_name = request.POST['last_name']
+                user.email = request.POST.get('email', '')
+                if request.POST.get('password'):
+                    user.set_password(request.POST['password'])
+                user.save()
             
-            # Update employee record
-            employee.employee_type = request.POST['employee_type']
-            employee.phone = request.POST['phone']
-            employee.address = request.POST['address']
-            employee.salary = request.POST['salary']
-            employee.branch_id = request.POST['branch']
-            employee.is_active = 'is_active' in request.POST
-            employee.save()
+                # Update employee record
+                employee.employee_type = request.POST['employee_type']
+                employee.phone = request.POST['phone']
+                employee.address = request.POST['address']
+                employee.salary = request.POST['salary']
+                employee.branch_id = request.POST['branch']
+                employee.is_active = 'is_active' in request.POST
+                employee.save()
             
-            messages.success(request, f'Employee {user.get_full_name()} updated successfully!')
-            return redirect('core:employee_list')
+                messages.success(request, f'Employee {user.get_full_name()} updated successfully!')
+                return redirect('core:employee_list')
             
         except Exception as e:
             messages.error(request, f'Error updating employee: {str(e)}')
@@ -560,52 +431,19 @@ def admin_branch_dashboard(request, branch_id):
     branch = get_object_or_404(Branch, id=branch_id)
     today = timezone.now().date()
     
-    # Get branch-specific data (similar to manager dashboard)
-    employees = branch.employee_set.filter(is_active=True)
-    today_orders = Order.objects.filter(branch=branch, created_at__date=today)
-    today_reservations = Reservation.objects.filter(branch=branch, reservation_date=today)
-    
-    # Revenue calculations
-    today_sales = Payment.objects.filter(
-        order__branch=branch,
-        payment_date__date=today, 
-        is_successful=True
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    today_revenue = today_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-    
-    # Recent orders (last 10)
-    recent_orders = Order.objects.filter(branch=branch).select_related('customer').order_by('-created_at')[:10]
-    
-    # Popular items today
-    popular_items_today = OrderItem.objects.filter(
-        order__branch=branch,
-        order__created_at__date=today
-    ).values(
-        'menu_item__name'
-    ).annotate(
-        total_quantity=Sum('quantity')
-    ).order_by('-total_quantity')[:5]
-    
-    # Upcoming reservations (next 3 days)
-    upcoming_reservations = Reservation.objects.filter(
-        branch=branch,
-        reservation_date__range=[today, today + timedelta(days=3)]
-    ).select_related('customer', 'table').order_by('reservation_date', 'reservation_time')[:5]
+    # Counts and revenue (write-time counters)
+    totals = day_totals(today, branch=branch)
     
+    # Recent orders, upcoming reservations and popular items are panels
+    # loaded by the page (core/panels.py)
     context = {
         'branch': branch,
-        'employees': employees,
-        'today_orders_count': today_orders.count(),
-        'today_sales': today_sales,
-        'today_revenue': today_revenue,
-        'pending_orders': today_orders.filter(status='pending').count(),
-        'today_reservations': today_reservations.count(),
-        'active_employees': employees.count(),
-        'recent_orders': recent_orders,
-        'today_reservations_list': today_reservations,
-        'popular_items_today': popular_items_today,
-        'upcoming_reservations': upcoming_reservations,
+        'today_orders_count': totals['orders'],
+        'today_sales': totals['sales'],
+        'today_revenue': totals['revenue'],
+        'pending_orders': totals['pending_orders'],
+        'today_reservations': totals['reservations'],
+        'active_employees': branch.employee_set.filter(is_active=True).count(),
         'is_admin': True,
         'admin_branch_access': True,  # Flag to show this is admin accessing branch
     }
@@ -620,7 +458,7 @@ def employee_delete(request, pk):
     if not (request.user.is_superuser or request.user.is_staff):
         # Regular managers can only delete employees from their branch
         try:
-            manager_employee = Employee.objects.get(user=request.user, employee_type='manager')
+            manager_employee = get_manager(request)
             if employee.branch != manager_employee.branch:
                 messages.error(request, "You can only delete employees from your own branch.")
                 return redirect('core:employee_list')
@@ -669,4 +507,45 @@ def root_redirect(request):
         return redirect('core:home')       # Go to public home page
 
 
+@login_required
+def customer_search(request):
+    """Typeahead for the order and reservation forms' customer field"""
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    
+    customers = search_customers(request.GET.get('q', ''), limit=limit)
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {'id': c.id, 'name': c.name, 'phone': c.phone, 'email': c.email or ''}
+            for c in customers
+        ],
+    })
+
 
+@login_required
+def dashboard_panel(request, name):
+    """One dashboard panel as an HTML fragment, for ``branch`` or all branches"""
+    if name not in PANELS:
+        return JsonResponse({'success': False, 'error': 'Unknown panel'}, status=404)
+    
+    is_admin = request.user.is_superuser or request.user.is_staff
+    employee = getattr(request, 'employee', None)
+    branch_id = request.GET.get('branch')
+    
+    if branch_id:
+        branch = get_object_or_404(Branch, pk=branch_id)
+        # Same rule as branch_dashboard
+        if employee is not None and employee.branch_id != branch.id and not request.user.is_superuser:
+            return JsonResponse({'success': False, 'error': "You don't have access to this branch"}, status=403)
+    elif employee is not None and employee.branch is not None and not is_admin:
+        # Staff of a branch only ever see their own branch
+        branch = employee.branch
+    else:
+        branch = None
+    
+    response = JsonResponse({'success': True, 'panel': name, 'html': render_panel(name, branch)})
+    patch_cache_control(response, private=True, max_age=panel_ttl(name))
+    return response
@@ -5,6 +5,9 @@ class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
 
+    def ready(self):
+        from . import signals
+
 
 
 
@@ -0,0 +1,147 @@
+# inventory/menu_cache.py
+"""
+Shared, read-only snapshot of the orderable menu.
+
+The order pages (order_create, order_edit, online_order) only need a handful
+of plain values per menu item, so the available menu is loaded once into
+compact records grouped by item_type and reused by every request until a
+MenuItem, FoodCategory or BranchMenuItem changes (see inventory/signals.py).
+
+Invalidation bumps a version number kept in Django's cache, so workers that
+share a cache backend drop their snapshot on the next request; with the
+default per-process cache, other workers catch up after MENU_SNAPSHOT_TTL.
+"""
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from .models import MenuItem
+
+VERSION_CACHE_KEY = 'inventory:menu_snapshot_version'
+
+
+class MenuEntry:
+    """Immutable template-facing view of one MenuItem"""
+    __slots__ = (
+        'id', 'name', 'description', 'item_type', 'base_category', 'category_id',
+        'category_name', 'actual_price', 'cost_price', 'display_name', 'image_url',
+        'preparation_time', 'compatible_source_ids', 'branch_prices',
+    )
+
+    def __init__(self, item):
+        setattr_ = object.__setattr__
+        setattr_(self, 'id', item.id)
+        setattr_(self, 'name', item.name)
+        setattr_(self, 'description', item.description)
+        setattr_(self, 'item_type', item.item_type)
+        setattr_(self, 'base_category', item.base_category)
+        setattr_(self, 'category_id', item.category_id)
+        setattr_(self, 'category_name', item.category.name)
+        setattr_(self, 'actual_price', item.actual_price or 0)
+        setattr_(self, 'cost_price', item.cost_price)
+        setattr_(self, 'display_name', item.display_name)
+        setattr_(self, 'image_url', item.image.url if item.image else '')
+        setattr_(self, 'preparation_time', item.preparation_time)
+        setattr_(self, 'compatible_source_ids', tuple(
+            source.id for source in item.compatible_sources.all()
+        ))
+        setattr_(self, 'branch_prices', tuple(
+            (branch_item.branch_id, branch_item.price)
+            for branch_item in item.branchmenuitem_set.all()
+            if branch_item.is_available
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MenuEntry is read-only")
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def is_free_base(self):
+        return self.item_type == 'base' and self.base_category == 'free'
+
+    @property
+    def is_premium_base(self):
+        return self.item_type == 'base' and self.base_category == 'premium'
+
+    def price_for_branch(self, branch_id):
+        """Branch specific price if the branch overrides it, else actual_price"""
+        for entry_branch_id, price in self.branch_prices:
+            if entry_branch_id == branch_id:
+                return price
+        return self.actual_price
+
+
+class MenuSnapshot:
+    """All available menu items at one version, grouped by item_type"""
+    __slots__ = ('version', 'built_at', 'items', '_by_id', '_by_type')
+
+    def __init__(self, version, entries):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.items = tuple(entries)
+        self._by_id = {entry.id: entry for entry in self.items}
+        by_type = {item_type: [] for item_type, _ in MenuItem.ITEM_TYPES}
+        for entry in self.items:
+            by_type.setdefault(entry.item_type, []).append(entry)
+        self._by_type = {item_type: tuple(group) for item_type, group in by_type.items()}
+
+    def of_type(self, item_type):
+        return self._by_type.get(item_type, ())
+
+    def get(self, item_id):
+        return self._by_id.get(item_id)
+
+    def __len__(self):
+        return len(self.items)
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def _current_version():
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+def build_menu_snapshot(version=0):
+    """Load every available menu item (4 queries regardless of menu size)"""
+    items = (
+        MenuItem.objects.filter(is_available=True)
+        .select_related('category', 'base_item', 'protein_source')
+        .prefetch_related('compatible_sources', 'branchmenuitem_set')
+        .order_by('id')
+    )
+    return MenuSnapshot(version, (MenuEntry(item) for item in items))
+
+
+def get_menu_snapshot():
+    """Return the shared snapshot, rebuilding it if it is stale"""
+    global _snapshot
+    ttl = getattr(settings, 'MENU_SNAPSHOT_TTL', 60)
+    version = _current_version()
+
+    snapshot = _snapshot
+    if (snapshot is not None and snapshot.version == version
+            and time.monotonic() - snapshot.built_at < ttl):
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshot
+        if (snapshot is None or snapshot.version != version
+                or time.monotonic() - snapshot.built_at >= ttl):
+            snapshot = build_menu_snapshot(version)
+            _snapshot = snapshot
+    return snapshot
+
+
+def invalidate_menu_snapshot():
+    """Drop the snapshot here and tell other workers to drop theirs"""
+    global _snapshot
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+    with _lock:
+        _snapshot = None
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:34
+
+from django.db import migrations, models
+
+
+def backfill_effective_prices(apps, schema_editor):
+    MenuItem = apps.get_model('inventory', 'MenuItem')
+    items = {item.pk: item for item in MenuItem.objects.all()}
+    prices = {}
+
+    def price_of(item, seen):
+        if item.pk in prices:
+            return prices[item.pk]
+        price = item.price or 0
+        if (item.item_type == 'combo' and item.base_item_id in items
+                and item.protein_source_id in items and item.pk not in seen):
+            seen = seen | {item.pk}
+            price = (price_of(items[item.base_item_id], seen)
+                     + price_of(items[item.protein_source_id], seen))
+        prices[item.pk] = price
+        return price
+
+    for item in items.values():
+        item.effective_price = price_of(item, frozenset())
+        item.profit_margin = item.effective_price - (item.cost_price or 0)
+    MenuItem.objects.bulk_update(items.values(), ['effective_price', 'profit_margin'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_menuitem_base_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='effective_price',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='profit_margin',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(backfill_effective_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_branch_daily_counters'),
+        ('inventory', '0009_menuitem_effective_price'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['branch', 'quantity', 'alert_level'], name='inventory_s_branch__5b4e87_idx'),
+        ),
+    ]
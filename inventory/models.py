@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.core.validators import MinValueValidator
 import os
 import uuid
@@ -108,6 +109,24 @@ class MenuItem(models.Model):
         validators=[MinValueValidator(0)]
     )
     
+    # Denormalized pricing, maintained by save() so listings can sort and
+    # aggregate on price in SQL. Combos are recomputed when their base or
+    # protein source changes (see refresh_dependent_prices).
+    effective_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        db_index=True,
+        editable=False
+    )
+    profit_margin = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        db_index=True,
+        editable=False
+    )
+    
     # Image field
     image = models.ImageField(
         upload_to=menu_item_image_path,
@@ -136,25 +155,51 @@ class MenuItem(models.Model):
                 self.base_category = 'premium'
         else:
             self.base_category = None
+        
+        self._set_effective_price()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'effective_price', 'profit_margin'}
             
         super().save(*args, **kwargs)
+        self.refresh_dependent_prices()
     
-    @property
-    def actual_price(self):
-        """Get the actual price based on pricing type and item type"""
-        if self.item_type == 'combo' and self.base_item and self.protein_source:
+    def compute_effective_price(self):
+        """Work out the price from this item's own fields"""
+        if self.item_type == 'combo' and self.base_item_id and self.protein_source_id:
             # Combo price = base price + source price
-            base_price = self.base_item.actual_price or 0
-            source_price = self.protein_source.actual_price or 0
+            base_price = self.base_item.effective_price or 0
+            source_price = self.protein_source.effective_price or 0
             return base_price + source_price
-        elif self.pricing_type == 'direct':
-            return self.price or 0
-        elif self.item_type == 'base':
-            return self.price or 0
-        elif self.item_type == 'source':
-            return self.price or 0
         return self.price or 0
     
+    def _set_effective_price(self):
+        self.effective_price = self.compute_effective_price()
+        self.profit_margin = self.effective_price - (self.cost_price or 0)
+    
+    def refresh_dependent_prices(self, _seen=None):
+        """Recompute the stored price of combos built on this item (and combos built on those)"""
+        seen = _seen if _seen is not None else {self.pk}
+        dependents = MenuItem.objects.filter(
+            Q(base_item=self) | Q(protein_source=self)
+        ).exclude(pk__in=seen).select_related('base_item', 'protein_source')
+        
+        for combo in dependents:
+            seen.add(combo.pk)
+            combo._set_effective_price()
+            MenuItem.objects.filter(pk=combo.pk).update(
+                effective_price=combo.effective_price,
+                profit_margin=combo.profit_margin
+            )
+            combo.refresh_dependent_prices(seen)
+    
+    @property
+    def actual_price(self):
+        """Get the actual price based on pricing type and item type"""
+        if self.pk is None:
+            return self.compute_effective_price()
+        return self.effective_price
+    
     @property
     def display_name(self):
         """Display name for orders"""
@@ -230,6 +275,10 @@ class Stock(models.Model):
     class Meta:
         unique_together = ['branch', 'ingredient']
         verbose_name_plural = "Stocks"
+        indexes = [
+            # Low stock (quantity <= alert_level) per branch, answered from the index
+            models.Index(fields=['branch', 'quantity', 'alert_level']),
+        ]
     
     @classmethod
     def get_low_stock_items(cls):
@@ -0,0 +1,36 @@
+# inventory/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.db.models import Q
+from django.dispatch import receiver
+from .models import MenuItem, FoodCategory, BranchMenuItem
+from .menu_cache import invalidate_menu_snapshot
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=FoodCategory)
+@receiver(post_delete, sender=FoodCategory)
+@receiver(post_save, sender=BranchMenuItem)
+@receiver(post_delete, sender=BranchMenuItem)
+@receiver(m2m_changed, sender=MenuItem.compatible_sources.through)
+def menu_changed(sender, **kwargs):
+    # Invalidate after commit so a rebuild can't pick up the old rows again
+    transaction.on_commit(invalidate_menu_snapshot)
+
+
+@receiver(pre_delete, sender=MenuItem)
+def remember_dependent_combos(sender, instance, **kwargs):
+    # SET_NULL clears the combos' base/source without calling save(), so
+    # note them now and reprice them once the item is gone
+    instance._dependent_combo_ids = list(
+        MenuItem.objects.filter(
+            Q(base_item=instance) | Q(protein_source=instance)
+        ).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=MenuItem)
+def reprice_dependent_combos(sender, instance, **kwargs):
+    for combo in MenuItem.objects.filter(pk__in=getattr(instance, '_dependent_combo_ids', ())):
+        combo.save(update_fields=['effective_price', 'profit_margin'])
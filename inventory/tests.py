@@ -1,7 +1,84 @@
 from django.test import TestCase
+from core.models import Branch
+from .menu_cache import get_menu_snapshot, invalidate_menu_snapshot
+from .models import BranchMenuItem, FoodCategory, MenuItem
 
-# Create your tests here.
 
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        invalidate_menu_snapshot()
+        self.category = FoodCategory.objects.create(name='Drinks')
+        self.soda = MenuItem.objects.create(
+            name='Soda', description='d', category=self.category, item_type='beverage',
+            price=1000, cost_price=1, preparation_time=5,
+        )
 
+    def save(self, instance):
+        # The snapshot is dropped once the saving transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.save()
 
+    def test_snapshot_is_reused_until_the_menu_changes(self):
+        snapshot = get_menu_snapshot()
+        with self.assertNumQueries(0):
+            self.assertIs(get_menu_snapshot(), snapshot)
+        self.assertEqual([entry.name for entry in snapshot.of_type('beverage')], ['Soda'])
 
+        self.soda.price = 1500
+        self.save(self.soda)
+
+        rebuilt = get_menu_snapshot()
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertEqual(rebuilt.get(self.soda.pk).actual_price, 1500)
+
+    def test_unavailable_items_drop_out(self):
+        get_menu_snapshot()
+        self.soda.is_available = False
+        self.save(self.soda)
+
+        self.assertIsNone(get_menu_snapshot().get(self.soda.pk))
+
+    def test_branch_price_change_is_picked_up(self):
+        branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        self.assertEqual(get_menu_snapshot().get(self.soda.pk).price_for_branch(branch.pk), 1000)
+
+        self.save(BranchMenuItem(branch=branch, menu_item=self.soda, price=1200))
+
+        self.assertEqual(get_menu_snapshot().get(self.soda.pk).price_for_branch(branch.pk), 1200)
+
+
+class ComboPriceTests(TestCase):
+    def setUp(self):
+        category = FoodCategory.objects.create(name='Food')
+        self.rice, self.chicken = (
+            MenuItem.objects.create(
+                name=name, description='d', category=category, item_type=item_type,
+                pricing_type=item_type, price=price, cost_price=1, preparation_time=5,
+            )
+            for name, item_type, price in (('Rice', 'base', 2000), ('Chicken', 'source', 6000))
+        )
+        self.combo = MenuItem.objects.create(
+            name='Rice and chicken', description='d', category=category, item_type='combo',
+            pricing_type='combo', base_item=self.rice, protein_source=self.chicken,
+            cost_price=3000, preparation_time=15,
+        )
+
+    def stored(self, item):
+        return MenuItem.objects.values_list('effective_price', 'profit_margin').get(pk=item.pk)
+
+    def test_combo_is_priced_from_its_components(self):
+        self.assertEqual(self.stored(self.combo), (8000, 5000))
+
+    def test_component_price_change_reprices_the_combo(self):
+        self.chicken.price = 7000
+        self.chicken.save()
+
+        self.assertEqual(self.stored(self.combo), (9000, 6000))
+
+    def test_deleted_component_reprices_the_combo(self):
+        self.chicken.delete()
+
+        self.assertEqual(self.stored(self.combo), (0, -3000))
@@ -5,6 +5,8 @@ from .models import MenuItem, Stock, FoodCategory
 from django.contrib import messages
 from django.db.models import Sum, F
 from core.models import Branch, Employee
+from core.branch_context import get_manager
+from core.registry import active_branches
 from .forms import MenuItemForm
 
 @login_required
@@ -18,7 +20,7 @@ def inventory_dashboard(request):
     
     if is_admin:
         # Admin can view any branch's inventory
-        branches = Branch.objects.filter(is_active=True)
+        branches = active_branches()
         if branch_id:
             selected_branch = get_object_or_404(Branch, id=branch_id)
             # Filter data for selected branch
@@ -31,7 +33,7 @@ def inventory_dashboard(request):
     else:
         # Regular manager - only their branch
         try:
-            manager_employee = Employee.objects.get(user=request.user, employee_type='manager')
+            manager_employee = get_manager(request)
             selected_branch = manager_employee.branch
             branches = Branch.objects.filter(id=selected_branch.id)
             stock_items = Stock.objects.filter(branch=selected_branch)
@@ -114,10 +116,6 @@ def menu_list(request):
     combo_items = MenuItem.objects.filter(item_type='combo').count()
     custom_items = MenuItem.objects.filter(item_type__in=['base', 'source']).count()
     
-    # Add profit margin calculation to each item
-    for item in menu_items:
-        item.profit_margin = item.actual_price - item.cost_price
-    
     context = {
         'menu_items': menu_items,
         'categories': categories,
@@ -0,0 +1,138 @@
+# kitchen/events.py
+"""
+In-process publish/subscribe for the kitchen display.
+
+Order signals (kitchen/signals.py) publish small JSON events per branch and
+every open kitchen stream holds a Subscription with a bounded queue. The
+last KITCHEN_EVENT_BUFFER events are kept so a reconnecting EventSource can
+resume from its Last-Event-ID without missing anything.
+
+The broker lives in the process that saved the order, so the kitchen
+streams must be served by the same process as the order views (a single
+ASGI worker, e.g. ``uvicorn restaurant_system.asgi:application``).
+"""
+import asyncio
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+from django.conf import settings
+
+
+class Subscription:
+    """One open stream: events for ``branch_id`` (or every branch when None)"""
+
+    def __init__(self, broker, branch_id, loop=None):
+        self.broker = broker
+        self.branch_id = branch_id
+        self.loop = loop
+        maxsize = getattr(settings, 'KITCHEN_QUEUE_SIZE', 100)
+        self.queue = asyncio.Queue(maxsize) if loop else queue.Queue(maxsize)
+        # Set when events were dropped because the client fell behind;
+        # the stream then asks the page to reload instead of going stale.
+        self.overflowed = False
+
+    def wants(self, branch_id):
+        return self.branch_id is None or self.branch_id == branch_id
+
+    def push(self, event):
+        if self.loop:
+            try:
+                self.loop.call_soon_threadsafe(self._put, event)
+            except RuntimeError:
+                # The stream's event loop is already closed
+                self.broker.unsubscribe(self)
+        else:
+            self._put(event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except (asyncio.QueueFull, queue.Full):
+            self.overflowed = True
+
+    async def aget(self, timeout):
+        """Next event, or None after ``timeout`` seconds (async streams)"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def get(self, timeout):
+        """Next event, or None after ``timeout`` seconds (sync streams)"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class KitchenBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._ids = itertools.count(1)
+        self._recent = deque(maxlen=getattr(settings, 'KITCHEN_EVENT_BUFFER', 200))
+
+    def publish(self, branch_id, event_type, data):
+        """Send an event to every stream watching ``branch_id``"""
+        with self._lock:
+            event = {
+                'id': next(self._ids),
+                'branch_id': branch_id,
+                'type': event_type,
+                'data': json.dumps(data),
+            }
+            self._recent.append(event)
+            targets = [sub for sub in self._subscriptions if sub.wants(branch_id)]
+
+        for subscription in targets:
+            subscription.push(event)
+        return event
+
+    def subscribe(self, branch_id=None, last_event_id=None, loop=None):
+        """
+        Open a Subscription. Returns (subscription, missed events); missed is
+        None when ``last_event_id`` is older than the buffer, meaning the
+        client has to reload to get back in sync.
+        """
+        subscription = Subscription(self, branch_id, loop)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            missed = []
+            if last_event_id is not None:
+                latest_id = self._recent[-1]['id'] if self._recent else 0
+                oldest_id = self._recent[0]['id'] if self._recent else 1
+                if last_event_id > latest_id or oldest_id > last_event_id + 1:
+                    # Events were dropped from the buffer, or the process
+                    # restarted since the client last connected
+                    missed = None
+                else:
+                    missed = [event for event in self._recent
+                              if event['id'] > last_event_id and subscription.wants(event['branch_id'])]
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def last_event_id(self):
+        with self._lock:
+            return self._recent[-1]['id'] if self._recent else 0
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+
+def format_sse(event):
+    """Encode a broker event in text/event-stream format"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {event['data']}\n\n"
+
+
+# Singleton instance
+kitchen_broker = KitchenBroker()
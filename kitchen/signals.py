@@ -0,0 +1,90 @@
+# kitchen/signals.py
+"""
+Feed the kitchen display from order saves.
+
+Events are published once the saving transaction commits, so a rolled back
+order never reaches a kitchen screen:
+    order.created  a new order (header only, its lines follow as order.items)
+    order.status   an order moved to another status
+    order.items    an order's lines changed (carries the full current lines)
+    order.removed  an order was deleted
+"""
+import logging
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from orders.models import Order, OrderItem
+from orders.signals import order_items_changed, order_status_changed
+from .events import kitchen_broker
+
+logger = logging.getLogger(__name__)
+
+
+def order_payload(order):
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'order_type': order.order_type,
+        'order_type_display': order.get_order_type_display(),
+        'table_number': order.table_number,
+        'notes': order.notes,
+        'created_at': order.created_at.isoformat() if order.created_at else None,
+    }
+
+
+def order_lines(order_id):
+    items = OrderItem.objects.filter(order_id=order_id).select_related('menu_item').order_by('id')
+    return [
+        {'id': item.id, 'name': item.menu_item.name, 'quantity': item.quantity, 'notes': item.notes}
+        for item in items
+    ]
+
+
+def _publish(branch_id, event_type, data):
+    try:
+        kitchen_broker.publish(branch_id, event_type, data)
+    except Exception:
+        logger.exception("Kitchen event publish failed")
+
+
+def _publish_lines(order_id):
+    row = Order.objects.filter(id=order_id).values_list('branch_id').first()
+    if row is None:
+        return  # The order itself was deleted
+    _publish(row[0], 'order.items', {'id': order_id, 'lines': order_lines(order_id)})
+
+
+@receiver(order_status_changed)
+def order_status_moved(sender, order, event, **kwargs):
+    # Already sent after commit by OrderStatusEvent.record()
+    # The order may have moved on again before this ran, so describe the
+    # status from the event rather than the instance
+    data = order_payload(order)
+    data['status'] = event.to_status
+    data['status_display'] = dict(Order.ORDER_STATUS).get(event.to_status, event.to_status)
+    data['previous_status'] = event.from_status or None
+    event_type = 'order.status' if event.from_status else 'order.created'
+    _publish(order.branch_id, event_type, data)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    branch_id, order_id = instance.branch_id, instance.id
+    transaction.on_commit(lambda: _publish(branch_id, 'order.removed', {'id': order_id}))
+
+
+@receiver(order_items_changed)
+def order_lines_changed(sender, order, changes, **kwargs):
+    # Already sent after commit by orders.services
+    _publish(order.branch_id, 'order.items', {'id': order.id, 'lines': order_lines(order.id)})
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_saved(sender, instance, **kwargs):
+    # Single-row saves (admin, legacy code); bulk writes come through
+    # order_items_changed instead
+    order_id = instance.order_id
+    transaction.on_commit(lambda: _publish_lines(order_id))
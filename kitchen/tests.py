@@ -0,0 +1,126 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from core.branch_context import invalidate_employee_context
+from core.models import Branch, Customer, Employee
+from orders.models import Order
+from .events import KitchenBroker, kitchen_broker
+from .signals import _publish
+
+
+class KitchenBrokerTests(SimpleTestCase):
+    def setUp(self):
+        self.broker = KitchenBroker()
+
+    def test_publish_reaches_subscribers_of_the_branch(self):
+        branch_one, _ = self.broker.subscribe(1)
+        branch_two, _ = self.broker.subscribe(2)
+        every_branch, _ = self.broker.subscribe(None)
+
+        event = self.broker.publish(1, 'order.status', {'id': 7})
+
+        self.assertEqual(branch_one.get(0), event)
+        self.assertEqual(every_branch.get(0), event)
+        self.assertIsNone(branch_two.get(0))
+        self.assertEqual(event['data'], '{"id": 7}')
+
+    def test_closed_subscription_gets_nothing(self):
+        subscription, _ = self.broker.subscribe(1)
+        subscription.close()
+        self.broker.publish(1, 'order.status', {'id': 7})
+        self.assertIsNone(subscription.get(0))
+        self.assertEqual(self.broker.subscriber_count, 0)
+
+    def test_resume_replays_missed_events_for_the_branch(self):
+        first = self.broker.publish(1, 'order.created', {'id': 1})
+        self.broker.publish(2, 'order.created', {'id': 2})
+        third = self.broker.publish(1, 'order.status', {'id': 1})
+
+        _, missed = self.broker.subscribe(1, last_event_id=first['id'])
+        self.assertEqual(missed, [third])
+
+    @override_settings(KITCHEN_EVENT_BUFFER=2)
+    def test_resume_from_beyond_the_buffer_asks_for_a_reload(self):
+        broker = KitchenBroker()
+        for order_id in range(4):
+            broker.publish(1, 'order.created', {'id': order_id})
+        _, missed = broker.subscribe(1, last_event_id=1)
+        self.assertIsNone(missed)
+
+    @override_settings(KITCHEN_QUEUE_SIZE=1)
+    def test_slow_subscriber_is_marked_overflowed(self):
+        subscription, _ = KitchenBroker().subscribe(1)
+        subscription.broker.publish(1, 'order.created', {'id': 1})
+        subscription.broker.publish(1, 'order.created', {'id': 2})
+        self.assertTrue(subscription.overflowed)
+
+    def test_publish_failure_is_logged_not_raised(self):
+        with mock.patch.object(kitchen_broker, 'publish', side_effect=RuntimeError('down')):
+            with self.assertLogs('kitchen.signals', 'ERROR') as logs:
+                _publish(1, 'order.created', {'id': 1})
+        self.assertIn('RuntimeError: down', logs.output[0])
+
+
+@override_settings(KITCHEN_HEARTBEAT=0.05, KITCHEN_STREAM_WSGI_SECONDS=0.2)
+class KitchenStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_branch = lambda name: Branch.objects.create(
+            name=name, address='a', phone='1', email=f'{name}@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        cls.branch = make_branch('main')
+        cls.other_branch = make_branch('other')
+        cls.cook = User.objects.create_user('cook', 'cook@example.com', 'pw')
+        Employee.objects.create(
+            user=cls.cook, employee_id='C1', employee_type='chef', phone='1',
+            address='a', salary=1, branch=cls.branch,
+        )
+
+    def setUp(self):
+        # User ids come round again after each test's rollback; drop
+        # employee contexts cached for another test's users
+        invalidate_employee_context()
+
+    def stream(self, user, **params):
+        self.client.force_login(user)
+        response = self.client.get(reverse('kitchen:kitchen_stream'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join(response.streaming_content).decode()
+
+    def test_user_without_a_branch_is_refused(self):
+        self.client.force_login(User.objects.create_user('guest', 'guest@example.com', 'pw'))
+        response = self.client.get(reverse('kitchen:kitchen_stream'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_stream_replays_own_branch_events_since_last_event_id(self):
+        last_event_id = kitchen_broker.last_event_id
+        kitchen_broker.publish(self.other_branch.id, 'order.created', {'id': 1})
+        kitchen_broker.publish(self.branch.id, 'order.created', {'id': 2})
+
+        body = self.stream(self.cook, last_event_id=last_event_id)
+
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn('data: {"id": 2}', body)
+        self.assertNotIn('data: {"id": 1}', body)
+        self.assertIn(': keep-alive', body)
+
+    def test_stream_without_history_asks_for_a_reload(self):
+        kitchen_broker.publish(self.branch.id, 'order.created', {'id': 1})
+        body = self.stream(self.cook, last_event_id=kitchen_broker.last_event_id + 1000)
+        self.assertIn('event: reload', body)
+
+    def test_saved_order_is_published_after_commit(self):
+        subscription, _ = kitchen_broker.subscribe(self.branch.id)
+        self.addCleanup(subscription.close)
+        customer = Customer.objects.create(name='Ann', phone='0772123456')
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(
+                branch=self.branch, customer=customer, order_type='takeaway', total_amount=1000,
+            )
+
+        event = subscription.get(0)
+        self.assertEqual(event['type'], 'order.created')
+        self.assertIn(f'"id": {order.id}', event['data'])
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'kitchen'
+
+urlpatterns = [
+    path('', views.kitchen_display, name='kitchen_display'),
+    path('stream/', views.kitchen_stream, name='kitchen_stream'),
+]
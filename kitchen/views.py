@@ -0,0 +1,139 @@
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.contrib import messages
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseForbidden, StreamingHttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from core.models import Branch
+from core.registry import active_branches
+from orders.models import Order
+from .events import kitchen_broker, format_sse
+
+ACTIVE_STATUSES = ['pending', 'confirmed', 'preparing', 'ready']
+RETRY_MS = 3000  # how soon a disconnected screen reconnects
+
+
+def _kitchen_branch(request):
+    """
+    Return (allowed, branch) for a kitchen screen. Admins may pick any
+    branch with ?branch= (None means every branch), staff only see their
+    own branch, which BranchMiddleware has attached as request.branch.
+    """
+    user = request.user
+    if user.is_superuser or user.is_staff:
+        branch_id = request.GET.get('branch')
+        if branch_id:
+            return True, get_object_or_404(Branch, id=branch_id)
+        return True, None
+
+    branch = getattr(request, 'branch', None)
+    return branch is not None, branch
+
+
+@login_required
+def kitchen_display(request):
+    allowed, branch = _kitchen_branch(request)
+    if not allowed:
+        messages.error(request, "You are not assigned to any branch.")
+        return redirect('core:dashboard')
+
+    orders = Order.objects.filter(status__in=ACTIVE_STATUSES)
+    if branch:
+        orders = orders.filter(branch=branch)
+    orders = orders.prefetch_related('order_items__menu_item').order_by('created_at')
+
+    is_admin = request.user.is_superuser or request.user.is_staff
+    context = {
+        'orders': orders,
+        'selected_branch': branch,
+        'branches': active_branches() if is_admin else [],
+        'is_admin': is_admin,
+        # The stream resumes from here, so nothing saved after this
+        # page was rendered is missed
+        'last_event_id': kitchen_broker.last_event_id,
+    }
+    return render(request, 'kitchen/display.html', context)
+
+
+def _last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _opening(missed):
+    """Events a stream starts with: the retry delay, then replay or reload"""
+    chunks = [f"retry: {RETRY_MS}\n\n"]
+    if missed is None:
+        chunks.append("event: reload\ndata: {}\n\n")
+    else:
+        chunks.extend(format_sse(event) for event in missed)
+    return chunks
+
+
+async def _async_stream(branch_id, last_event_id):
+    heartbeat = getattr(settings, 'KITCHEN_HEARTBEAT', 15)
+    subscription, missed = kitchen_broker.subscribe(
+        branch_id, last_event_id, loop=asyncio.get_running_loop()
+    )
+    try:
+        for chunk in _opening(missed):
+            yield chunk
+        if missed is None:
+            return
+        while True:
+            event = await subscription.aget(heartbeat)
+            if subscription.overflowed:
+                yield "event: reload\ndata: {}\n\n"
+                return
+            yield format_sse(event) if event else ": keep-alive\n\n"
+    finally:
+        subscription.close()
+
+
+def _sync_stream(branch_id, last_event_id):
+    # Under WSGI every open stream holds a worker thread, so streams end
+    # after KITCHEN_STREAM_WSGI_SECONDS and the browser reconnects
+    heartbeat = getattr(settings, 'KITCHEN_HEARTBEAT', 15)
+    deadline = time.monotonic() + getattr(settings, 'KITCHEN_STREAM_WSGI_SECONDS', 30)
+    subscription, missed = kitchen_broker.subscribe(branch_id, last_event_id)
+    try:
+        for chunk in _opening(missed):
+            yield chunk
+        if missed is None:
+            return
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = subscription.get(min(heartbeat, remaining))
+            if subscription.overflowed:
+                yield "event: reload\ndata: {}\n\n"
+                return
+            yield format_sse(event) if event else ": keep-alive\n\n"
+    finally:
+        subscription.close()
+
+
+@login_required
+async def kitchen_stream(request):
+    """Server-sent events for the kitchen display, per branch"""
+    allowed, branch = await sync_to_async(_kitchen_branch)(request)
+    if not allowed:
+        return HttpResponseForbidden("You are not assigned to any branch.")
+
+    branch_id = branch.id if branch else None
+    if isinstance(request, ASGIRequest):
+        stream = _async_stream(branch_id, _last_event_id(request))
+    else:
+        stream = _sync_stream(branch_id, _last_event_id(request))
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
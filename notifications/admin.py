@@ -1,6 +1,6 @@
 # notifications/admin.py
 from django.contrib import admin
-from .models import NotificationChannel, NotificationTemplate, NotificationLog
+from .models import NotificationChannel, NotificationTemplate, NotificationLog, NotificationOutbox
 
 @admin.register(NotificationChannel)
 class NotificationChannelAdmin(admin.ModelAdmin):
@@ -21,5 +21,8 @@ class NotificationLogAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'sent_at']
     search_fields = ['recipient', 'subject']
 
-
-
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['notification_type', 'recipient', 'status', 'attempts', 'next_attempt_at', 'created_at']
+    list_filter = ['status', 'notification_type']
+    readonly_fields = ['created_at', 'sent_at', 'locked_until', 'last_error']
@@ -0,0 +1,54 @@
+# notifications/management/commands/process_notifications.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from notifications.outbox import claim_batch, deliver
+
+
+def _deliver(entry):
+    try:
+        return deliver(entry)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Send queued notifications from the outbox with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=getattr(settings, 'NOTIFICATION_OUTBOX_WORKERS', 4),
+                            help='Number of notifications sent in parallel')
+        parser.add_argument('--batch', type=int, default=20,
+                            help='Rows claimed per round')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain what is due now and exit')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        self.stdout.write(f"Processing notification outbox with {workers} worker(s)...")
+
+        sent = failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    entries = claim_batch(max(options['batch'], workers))
+                    if not entries:
+                        if options['once']:
+                            break
+                        time.sleep(options['interval'])
+                        continue
+
+                    for ok in pool.map(_deliver, entries):
+                        if ok:
+                            sent += 1
+                        else:
+                            failed += 1
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping...")
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} notification(s), {failed} failed or rescheduled"))
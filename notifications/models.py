@@ -65,9 +65,42 @@ class NotificationLog(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.template.name} to {self.recipient}"
 
+class NotificationOutbox(models.Model):
+    """
+    A notification waiting to be sent. Rows are written in the same
+    transaction as the change they announce and delivered later by
+    ``manage.py process_notifications``, one row per channel.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
 
+    notification_type = models.CharField(max_length=50)
+    recipient = models.JSONField(default=dict)  # {'phone': ...} or {'email': ...}
+    context_data = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.notification_type} to {self.recipient} ({self.status})"
@@ -0,0 +1,92 @@
+# notifications/outbox.py
+"""
+Delivery side of the notification outbox (see NotificationOutbox).
+
+Workers claim due rows with a conditional UPDATE, so any number of worker
+threads or processes can drain the table without sending a row twice.
+A claim is a lease: if a worker dies mid-send, the row becomes due again
+once ``locked_until`` passes. Failed sends are retried with exponential
+backoff until NOTIFICATION_OUTBOX_MAX_ATTEMPTS is reached.
+"""
+import logging
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number ``attempts`` (1-based), with jitter"""
+    base = _setting('NOTIFICATION_OUTBOX_BACKOFF', 30)
+    ceiling = _setting('NOTIFICATION_OUTBOX_BACKOFF_MAX', 3600)
+    delay = min(ceiling, base * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def due_entries(now=None):
+    now = now or timezone.now()
+    return NotificationOutbox.objects.filter(
+        Q(status='pending', next_attempt_at__lte=now) |
+        Q(status='processing', locked_until__lt=now)
+    )
+
+
+def claim_batch(limit=20):
+    """Lease up to ``limit`` due rows to this worker and return them"""
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('NOTIFICATION_OUTBOX_LEASE', 300))
+
+    claimed = []
+    candidates = due_entries(now).order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+    for entry_id in list(candidates):
+        # Only one worker's UPDATE can match while the row is still due
+        won = due_entries(now).filter(id=entry_id).update(
+            status='processing', locked_until=now + lease
+        )
+        if won:
+            claimed.append(entry_id)
+    return list(NotificationOutbox.objects.filter(id__in=claimed))
+
+
+def deliver(entry):
+    """Send one claimed row and record the outcome. Returns True when sent."""
+    from .services import notification_service
+
+    try:
+        logs = notification_service.send_notification(
+            entry.notification_type, entry.recipient, entry.context_data
+        )
+        if not logs:
+            error = f"Nothing sent for {entry.notification_type} (missing template or channel)"
+        else:
+            errors = [log.error_message or 'failed' for log in logs if log.status == 'failed']
+            error = '; '.join(errors)
+    except Exception as e:
+        error = str(e)
+
+    entry.attempts += 1
+    entry.locked_until = None
+    if not error:
+        entry.status = 'sent'
+        entry.sent_at = timezone.now()
+        entry.last_error = ''
+    elif entry.attempts >= _setting('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5):
+        entry.status = 'failed'
+        entry.last_error = error
+        logger.error(f"Giving up on outbox entry {entry.id} after {entry.attempts} attempts: {error}")
+    else:
+        entry.status = 'pending'
+        entry.last_error = error
+        entry.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(entry.attempts))
+        logger.warning(f"Outbox entry {entry.id} failed (attempt {entry.attempts}), retrying: {error}")
+
+    entry.save(update_fields=['status', 'attempts', 'locked_until', 'sent_at', 'last_error', 'next_attempt_at'])
+    return entry.status == 'sent'
@@ -4,7 +4,8 @@ from django.conf import settings
 from django.core.mail import send_mail, EmailMultiAlternatives
 from django.template import Template, Context
 from django.template.loader import render_to_string
-from .models import NotificationChannel, NotificationTemplate, NotificationLog
+from core.phone import normalize_phone
+from .models import NotificationChannel, NotificationTemplate, NotificationLog, NotificationOutbox
 import requests
 import json
 from datetime import datetime
@@ -30,6 +31,26 @@ class NotificationService:
         else:
             logger.warning("No active email channel found")
     
+    def queue_notification(self, notification_type, recipient, context_data):
+        """
+        Queue a notification in the outbox instead of sending it now.
+
+        Call this inside the transaction that makes the change being
+        announced: the rows commit (or roll back) with it and
+        ``manage.py process_notifications`` sends them afterwards. Each
+        channel gets its own row so a failed SMS is retried without
+        resending the email.
+        """
+        queued = []
+        for key in ('email', 'phone'):
+            if recipient.get(key):
+                queued.append(NotificationOutbox.objects.create(
+                    notification_type=notification_type,
+                    recipient={key: recipient[key]},
+                    context_data=context_data,
+                ))
+        return queued
+    
     def send_notification(self, notification_type, recipient, context_data):
         """Main method to send notifications"""
         try:
@@ -159,8 +180,10 @@ class NotificationService:
             context = Context(context_data)
             message = sms_template.render(context)
             
-            # Clean phone number
-            phone = self._clean_phone_number(phone)
+            # Africa's Talking wants E.164
+            raw_phone, phone = phone, normalize_phone(phone)
+            if not phone:
+                raise Exception(f"Invalid phone number: {raw_phone}")
             
             # First, try to send via Africa's Talking with HTTPS
             try:
@@ -295,19 +318,6 @@ class NotificationService:
         print("🎉 Development can continue! Real SMS will work when network issue is resolved.")
         
         return log
-    
-    def _clean_phone_number(self, phone):
-        """Clean and format phone number for Africa's Talking"""
-        # Remove any non-digit characters
-        cleaned = ''.join(filter(str.isdigit, str(phone)))
-        
-        # Add country code if missing (uganda)
-        if not cleaned.startswith('+') and len(cleaned) == 9:
-            cleaned = f"+256{cleaned}"
-        elif not cleaned.startswith('+') and len(cleaned) == 10:
-            cleaned = f"+256{cleaned[1:]}"
-        
-        return cleaned
 
 # Singleton instance
 notification_service = NotificationService()
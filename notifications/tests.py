@@ -1,7 +1,95 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from .models import NotificationOutbox
+from .outbox import backoff_delay, claim_batch, deliver
+from .services import notification_service
 
-# Create your tests here.
+SENT = [SimpleNamespace(status='sent', error_message='')]
+FAILED = [SimpleNamespace(status='failed', error_message='gateway down')]
 
 
+def sending(result):
+    return mock.patch.object(notification_service, 'send_notification', return_value=result)
 
 
+@override_settings(NOTIFICATION_OUTBOX_BACKOFF=30, NOTIFICATION_OUTBOX_BACKOFF_MAX=100,
+                   NOTIFICATION_OUTBOX_MAX_ATTEMPTS=3)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.entry = NotificationOutbox.objects.create(
+            notification_type='order_ready', recipient={'phone': '256772123456'}, context_data={},
+        )
+
+    def test_backoff_doubles_up_to_the_ceiling(self):
+        with mock.patch('notifications.outbox.random.uniform', return_value=1):
+            self.assertEqual([backoff_delay(attempt) for attempt in (1, 2, 3, 4)], [30, 60, 100, 100])
+
+    def test_claimed_rows_are_not_claimed_again(self):
+        self.assertEqual(claim_batch(), [self.entry])
+        self.assertEqual(claim_batch(), [])
+        self.assertEqual(NotificationOutbox.objects.get().status, 'processing')
+
+    def test_expired_lease_makes_the_row_due_again(self):
+        claim_batch()
+        NotificationOutbox.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_batch(), [self.entry])
+
+    def test_sent_row_is_done(self):
+        with sending(SENT):
+            self.assertTrue(deliver(claim_batch()[0]))
+
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts, entry.last_error), ('sent', 1, ''))
+        self.assertIsNotNone(entry.sent_at)
+
+    def test_failed_send_is_retried_after_the_backoff(self):
+        before = timezone.now()
+        with sending(FAILED), self.assertLogs('notifications.outbox', 'WARNING'):
+            self.assertFalse(deliver(claim_batch()[0]))
+
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts, entry.last_error), ('pending', 1, 'gateway down'))
+        self.assertIsNone(entry.locked_until)
+        self.assertGreaterEqual(entry.next_attempt_at, before + timedelta(seconds=24))
+        self.assertLessEqual(entry.next_attempt_at, timezone.now() + timedelta(seconds=36))
+        # Not due until then
+        self.assertEqual(claim_batch(), [])
+
+    def test_gives_up_after_the_last_attempt(self):
+        NotificationOutbox.objects.update(attempts=2)
+        with sending([]), self.assertLogs('notifications.outbox', 'ERROR'):
+            self.assertFalse(deliver(claim_batch()[0]))
+
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), ('failed', 3))
+        self.assertIn('missing template or channel', entry.last_error)
+
+
+class ProcessNotificationsCommandTests(TransactionTestCase):
+    # The command sends from worker threads, which need committed rows
+
+    def test_once_drains_the_due_rows(self):
+        for phone in ('256772000001', '256772000002', '256772000003'):
+            NotificationOutbox.objects.create(
+                notification_type='order_ready', recipient={'phone': phone}, context_data={},
+            )
+        NotificationOutbox.objects.create(
+            notification_type='order_ready', recipient={'phone': '256772000004'}, context_data={},
+            next_attempt_at=timezone.now() + timedelta(hours=1),
+        )
+        out = StringIO()
+
+        with sending(SENT) as send:
+            call_command('process_notifications', '--once', '--workers', '2', stdout=out)
+
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(
+            sorted(NotificationOutbox.objects.values_list('status', flat=True)),
+            ['pending', 'sent', 'sent', 'sent'],
+        )
+        self.assertIn('Sent 3 notification(s), 0 failed', out.getvalue())
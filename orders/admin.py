@@ -1,6 +1,6 @@
 # admin.py
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, OrderStatusEvent
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -14,5 +14,11 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'menu_item', 'quantity', 'unit_price', 'subtotal']
     list_filter = ['order__status']
 
-
-
+@admin.register(OrderStatusEvent)
+class OrderStatusEventAdmin(admin.ModelAdmin):
+    list_display = ['order', 'branch', 'from_status', 'to_status', 'changed_by', 'created_at']
+    list_filter = ['to_status', 'branch', 'created_at']
+    search_fields = ['order__order_number']
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,13 @@
+# orders/management/commands/rebuild_order_search.py
+from django.core.management.base import BaseCommand, CommandError
+from orders.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text order search index (orders_order_fts) from the orders table'
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            raise CommandError("Full-text order search needs SQLite; other databases use icontains")
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} order(s)"))
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:51
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# A frozen copy of core.phone.normalize_phone as it was when this migration
+# was written, so later changes there cannot alter it
+def normalize_phone(phone):
+    phone = str(phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    code = str(getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', '256'))
+
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith(code) and len(digits) > 9:
+        pass
+    elif digits.startswith('0'):
+        digits = code + digits[1:]
+    elif len(digits) == 9:
+        digits = code + digits
+
+    if not 8 <= len(digits) <= 15:
+        return ''
+    return '+' + digits
+
+
+def normalize_order_phones(apps, schema_editor):
+    """Store order phones in E.164, taking the customer's where none was kept"""
+    Order = apps.get_model('orders', 'Order')
+    orders = Order.objects.select_related('customer').only('customer_phone', 'customer__phone')
+    for order in orders.iterator():
+        phone = normalize_phone(order.customer_phone or order.customer.phone) or order.customer_phone
+        if phone != order.customer_phone:
+            Order.objects.filter(pk=order.pk).update(customer_phone=phone)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_orderstatusevent'),
+        ('core', '0005_customer_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='customer_phone',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.RunPython(normalize_order_phones, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+# Index row for order ``{o}`` whose customer is ``{c}`` (see orders.search)
+INDEX_ROW = """
+    SELECT {o}.id, {o}.order_number, c.name,
+           {o}.customer_phone || ' ' || c.phone || ' ' || COALESCE(c.phone_normalized, ''),
+           {o}.notes, COALESCE({o}.delivery_address, '')
+    FROM core_customer c WHERE c.id = {o}.customer_id
+"""
+COLUMNS = "rowid, order_number, customer_name, customer_phone, notes, delivery_address"
+
+CREATE = [
+    "CREATE VIRTUAL TABLE orders_order_fts USING fts5("
+    "order_number, customer_name, customer_phone, notes, delivery_address, tokenize='trigram')",
+
+    f"""INSERT INTO orders_order_fts ({COLUMNS})
+    SELECT o.id, o.order_number, c.name,
+           o.customer_phone || ' ' || c.phone || ' ' || COALESCE(c.phone_normalized, ''),
+           o.notes, COALESCE(o.delivery_address, '')
+    FROM orders_order o JOIN core_customer c ON c.id = o.customer_id""",
+
+    f"""CREATE TRIGGER orders_order_fts_insert AFTER INSERT ON orders_order BEGIN
+        INSERT INTO orders_order_fts ({COLUMNS}) {INDEX_ROW.format(o='new')};
+    END""",
+
+    f"""CREATE TRIGGER orders_order_fts_update
+    AFTER UPDATE OF order_number, customer_id, customer_phone, notes, delivery_address ON orders_order BEGIN
+        DELETE FROM orders_order_fts WHERE rowid = old.id;
+        INSERT INTO orders_order_fts ({COLUMNS}) {INDEX_ROW.format(o='new')};
+    END""",
+
+    """CREATE TRIGGER orders_order_fts_delete AFTER DELETE ON orders_order BEGIN
+        DELETE FROM orders_order_fts WHERE rowid = old.id;
+    END""",
+
+    """CREATE TRIGGER orders_order_fts_customer
+    AFTER UPDATE OF name, phone, phone_normalized ON core_customer BEGIN
+        UPDATE orders_order_fts
+        SET customer_name = new.name,
+            customer_phone = (SELECT o.customer_phone FROM orders_order o WHERE o.id = orders_order_fts.rowid)
+                             || ' ' || new.phone || ' ' || COALESCE(new.phone_normalized, '')
+        WHERE rowid IN (SELECT id FROM orders_order WHERE customer_id = new.id);
+    END""",
+]
+
+DROP = [
+    "DROP TRIGGER IF EXISTS orders_order_fts_customer",
+    "DROP TRIGGER IF EXISTS orders_order_fts_delete",
+    "DROP TRIGGER IF EXISTS orders_order_fts_update",
+    "DROP TRIGGER IF EXISTS orders_order_fts_insert",
+    "DROP TABLE IF EXISTS orders_order_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite only; elsewhere orders.search falls back to icontains
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_alter_order_customer_phone'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE), _run(DROP)),
+    ]
@@ -1,6 +1,12 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError, connections
+from django.db.models import F, Max
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from core.models import Customer, Employee, Branch
+from core.phone import normalize_phone
+from core.counters import counted_state
 from inventory.models import MenuItem
 
 class Order(models.Model):
@@ -14,12 +20,32 @@ class Order(models.Model):
         ('paid', 'Paid'),
     ]
     
+    # Allowed status changes (from -> to), enforced by save(). An order can
+    # be paid at any point before it is cancelled, since online and mobile
+    # money orders are paid up front. 'paid' is therefore not terminal: an
+    # order paid before it was served carries on through the kitchen from
+    # the status it was paid in (pending -> paid -> preparing -> ready ->
+    # served), never back to a stage it had passed, and is paid only once.
+    # See allows_transition().
+    STATUS_TRANSITIONS = {
+        'pending': ('confirmed', 'preparing', 'cancelled', 'paid'),
+        'confirmed': ('preparing', 'cancelled', 'paid'),
+        'preparing': ('ready', 'cancelled', 'paid'),
+        'ready': ('served', 'cancelled', 'paid'),
+        'served': ('paid',),
+        'paid': ('preparing', 'ready', 'served'),
+        'cancelled': (),
+    }
+    
     ORDER_TYPES = [
         ('dine_in', 'Dine In'),
         ('takeaway', 'Takeaway'),
         ('delivery', 'Delivery'),
     ]
     
+    # The kitchen's statuses in the order an order goes through them
+    KITCHEN_FLOW = ('pending', 'confirmed', 'preparing', 'ready', 'served')
+    
     order_number = models.CharField(max_length=20, unique=True)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='orders')
     order_type = models.CharField(max_length=20, choices=ORDER_TYPES)
@@ -33,22 +59,227 @@ class Order(models.Model):
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True)
     delivery_address = models.TextField(blank=True, null=True)
     # Add these fields for notifications
-    customer_phone = models.CharField(max_length=20, blank=True)
+    # E.164, copied from the customer when the order is placed
+    customer_phone = models.CharField(max_length=20, blank=True, db_index=True)
     customer_email = models.EmailField(blank=True)
     
+    class Meta:
+        indexes = [
+            # One branch's orders by date (dashboards, reports, order list) or status
+            models.Index(fields=['branch', 'created_at']),
+            models.Index(fields=['branch', 'status']),
+            # The same pages for all branches
+            models.Index(fields=['created_at']),
+        ]
+    
     def __str__(self):
         return f"Order #{self.order_number}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save() can log transitions
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._counted_state = counted_state(instance)
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.order_number:
-            last_order = Order.objects.order_by('-id').first()
-            last_id = last_order.id if last_order else 0
-            self.order_number = f"ORD{last_id + 1:06d}"
-        super().save(*args, **kwargs)
+            from .services import order_number_allocator
+            self.order_number = order_number_allocator.next_number(self)
+        
+        if not self.customer_phone and self._state.adding and self.customer_id:
+            self.customer_phone = self.customer.phone
+        self.customer_phone = normalize_phone(self.customer_phone) or self.customer_phone
+        
+        created = self._state.adding
+        previous_status = getattr(self, '_loaded_status', None)
+        status_changed = created or (previous_status is not None and previous_status != self.status)
+        if status_changed and not created and not self.allows_transition(previous_status, self.status):
+            raise InvalidStatusTransition(self, self.status, previous_status)
+        
+        if not status_changed:
+            super().save(*args, **kwargs)
+            return
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            OrderStatusEvent.record(
+                self, '' if created else previous_status,
+                changed_by=getattr(self, '_status_changed_by', None)
+            )
+        self._loaded_status = self.status
+    
+    def clean(self):
+        super().clean()
+        previous_status = getattr(self, '_loaded_status', None)
+        if previous_status and previous_status != self.status and not self.allows_transition(previous_status, self.status):
+            raise ValidationError({'status': str(InvalidStatusTransition(self, self.status, previous_status))})
+    
+    def allows_transition(self, from_status, to_status):
+        if to_status not in self.STATUS_TRANSITIONS.get(from_status, ()):
+            return False
+        if 'paid' not in (from_status, to_status):
+            return True
+        paid_from = self._paid_from_status()
+        if to_status == 'paid':
+            return paid_from is None
+        # Orders paid before the status log existed only have their placed
+        # event; they were paid once served
+        if paid_from is None:
+            paid_from = 'served'
+        # The placed event of an order created as paid has no from_status
+        paid_from = paid_from or 'pending'
+        flow = self.KITCHEN_FLOW
+        return paid_from in flow and flow.index(to_status) > flow.index(paid_from)
+    
+    def _paid_from_status(self):
+        """The status this order was paid from, or None if it was never paid"""
+        if self.pk is None:
+            return None
+        return (self.status_events.filter(to_status='paid')
+                .order_by('-created_at', '-id')
+                .values_list('from_status', flat=True).first())
+    
+    def can_change_status_to(self, status):
+        return self.allows_transition(self.status, status)
+    
+    @property
+    def next_status_choices(self):
+        """(value, label) pairs this order may move to next"""
+        return [(value, label) for value, label in self.ORDER_STATUS if self.can_change_status_to(value)]
     
     def calculate_total(self):
         return sum(item.subtotal for item in self.order_items.all())
 
+class InvalidStatusTransition(Exception):
+    def __init__(self, order, status, from_status=None):
+        self.order = order
+        self.status = status
+        labels = dict(Order.ORDER_STATUS)
+        from_status = from_status or order.status
+        super().__init__(
+            f"Order #{order.order_number} cannot go from "
+            f"{labels.get(from_status, from_status)} to {labels.get(status, status)}"
+        )
+
+class OrderStatusEvent(models.Model):
+    """
+    Append-only log of order status changes. The first event of every
+    order has an empty from_status and marks when it was placed.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_events')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True)
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['branch', 'created_at']),
+            models.Index(fields=['order', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.order}: {self.from_status or 'new'} -> {self.to_status}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Order status events cannot be changed once recorded")
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def record(cls, order, from_status, changed_by=None):
+        event = cls.objects.create(
+            order=order,
+            branch_id=order.branch_id,
+            from_status=from_status,
+            to_status=order.status,
+            changed_by=changed_by if changed_by and changed_by.is_authenticated else None,
+        )
+        from .signals import order_status_changed
+        transaction.on_commit(
+            lambda: order_status_changed.send(sender=Order, order=order, event=event)
+        )
+        return event
+
+class OrderNumberSequence(models.Model):
+    """Next free order number for a numbering scope (global, per branch and/or per day)"""
+    scope = models.CharField(max_length=50, unique=True)
+    next_value = models.PositiveBigIntegerField(default=1)
+    
+    def __str__(self):
+        return f"{self.scope}: {self.next_value}"
+    
+    @classmethod
+    def reserve(cls, scope, count, initial=None):
+        """
+        Reserve ``count`` consecutive numbers for ``scope`` and return the first.
+        The counter row is bumped with a single UPDATE, so concurrent workers
+        serialize on that row instead of racing on MAX(id). ``initial`` is a
+        callable giving the first number for a scope that has no row yet.
+
+        Inside the caller's transaction the UPDATE's row lock would last
+        until that transaction commits, so on PostgreSQL the reservation
+        commits on a connection of its own (see reserves_detached()).
+        """
+        connection = transaction.get_connection()
+        if cls.reserves_detached(connection):
+            return cls._reserve_detached(connection, scope, count, initial)
+        with transaction.atomic():
+            updated = cls.objects.filter(scope=scope).update(next_value=F('next_value') + count)
+            if not updated:
+                start = initial() if initial else 1
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(scope=scope, next_value=start + count)
+                    return start
+                except IntegrityError:
+                    # Another worker created the row first
+                    cls.objects.filter(scope=scope).update(next_value=F('next_value') + count)
+            return cls.objects.values_list('next_value', flat=True).get(scope=scope) - count
+    
+    @staticmethod
+    def reserves_detached(connection):
+        """
+        Whether reserve() commits on its own connection rather than in the
+        caller's transaction. Not on SQLite: there is one writer at a time,
+        and a second connection would wait on the caller's own write lock.
+        """
+        return connection.vendor == 'postgresql' and connection.in_atomic_block
+    
+    @classmethod
+    def _reserve_detached(cls, connection, scope, count, initial):
+        table = connection.ops.quote_name(cls._meta.db_table)
+        detached = connections.create_connection(connection.alias)
+        try:
+            # Autocommit: the row lock ends with each statement
+            with detached.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET next_value = next_value + %s WHERE scope = %s RETURNING next_value",
+                    [count, scope],
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    start = initial() if initial else 1
+                    cursor.execute(
+                        f"INSERT INTO {table} (scope, next_value) VALUES (%s, %s) "
+                        f"ON CONFLICT (scope) DO UPDATE SET next_value = {table}.next_value + %s "
+                        f"RETURNING next_value",
+                        [scope, start + count, count],
+                    )
+                    row = cursor.fetchone()
+        finally:
+            detached.close()
+        return row[0] - count
+    
+    @staticmethod
+    def legacy_start():
+        """First number after the old ORD<id> scheme, so existing numbers are never reused"""
+        return (Order.objects.aggregate(last_id=Max('id'))['last_id'] or 0) + 1
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order_items')
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -76,6 +307,12 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.menu_item.name} x {self.quantity}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted_state = counted_state(instance)
+        return instance
+    
     @property
     def subtotal(self):
         return self.quantity * self.unit_price
@@ -107,8 +344,20 @@ class Payment(models.Model):
     payment_date = models.DateTimeField(auto_now_add=True)
     is_successful = models.BooleanField(default=True)
     
+    class Meta:
+        indexes = [
+            # Revenue over a date range (reports)
+            models.Index(fields=['payment_date', 'is_successful']),
+        ]
+    
     def __str__(self):
         return f"Payment for {self.order}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted_state = counted_state(instance)
+        return instance
 
 
 
@@ -0,0 +1,86 @@
+# orders/pagination.py
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+A cursor is the (created_at, id) of a row, so a page is simply "rows older
+than the cursor" and costs the same at page 1 or page 1000. Orders placed
+while someone is paging only ever appear above the first page, so they
+never shift or duplicate rows on later pages; they are picked up with
+newer_than() instead.
+"""
+import base64
+from datetime import datetime
+from django.db.models import Q
+
+PAGE_SIZE = 50
+
+
+def encode_position(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def encode_cursor(obj):
+    return encode_position(obj.created_at, obj.pk)
+
+
+def decode_cursor(value):
+    """Return (created_at, pk) for a cursor string, or None if it is not valid"""
+    if not value:
+        return None
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, items, has_next, page_size):
+        self.items = items
+        self.has_next = has_next
+        self.page_size = page_size
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def next_cursor(self):
+        """Cursor for the next (older) page"""
+        return encode_cursor(self.items[-1]) if self.has_next else None
+
+    @property
+    def newest_cursor(self):
+        """Cursor of the top row, used to poll for newer rows"""
+        return encode_cursor(self.items[0]) if self.items else None
+
+
+def paginate_keyset(queryset, after=None, page_size=PAGE_SIZE):
+    """One page of ``queryset`` ordered newest first, starting after the ``after`` cursor"""
+    queryset = queryset.order_by('-created_at', '-id')
+    position = decode_cursor(after)
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    rows = list(queryset[:page_size + 1])
+    return KeysetPage(rows[:page_size], len(rows) > page_size, page_size)
+
+
+def newer_than(queryset, cursor, limit=PAGE_SIZE):
+    """Rows created after ``cursor`` (newest first), at most ``limit`` of them"""
+    position = decode_cursor(cursor)
+    if not position:
+        return []
+    created_at, pk = position
+    rows = list(
+        queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+        .order_by('created_at', 'id')[:limit]
+    )
+    rows.reverse()
+    return rows
@@ -0,0 +1,106 @@
+# orders/search.py
+"""
+Full-text order search.
+
+On SQLite, orders are indexed in the FTS5 table ``orders_order_fts``
+(trigram tokenizer, so any 3+ character fragment of an order number,
+customer name, phone, notes or delivery address matches, like icontains
+did). Database triggers created by migration 0009 keep the table in step
+with orders_order and core_customer, including bulk updates that bypass
+model signals. Results are ranked with FTS5's bm25.
+
+Other databases, and queries whose words are all shorter than three
+characters, fall back to icontains filters.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .pagination import KeysetPage, encode_cursor, PAGE_SIZE
+
+FTS_TABLE = 'orders_order_fts'
+MIN_WORD_LENGTH = 3  # shortest fragment the trigram tokenizer can find
+
+INDEX_COLUMNS = """
+    o.order_number,
+    c.name,
+    o.customer_phone || ' ' || c.phone || ' ' || COALESCE(c.phone_normalized, ''),
+    o.notes,
+    COALESCE(o.delivery_address, '')
+"""
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """FTS5 query matching every 3+ character word of ``query`` (quoted, so no operators)"""
+    words = [word for word in (query or '').split() if len(word) >= MIN_WORD_LENGTH]
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def _fallback_filter(queryset, query):
+    for word in query.split():
+        queryset = queryset.filter(
+            Q(order_number__icontains=word) |
+            Q(customer__name__icontains=word) |
+            Q(customer__phone__icontains=word) |
+            Q(notes__icontains=word) |
+            Q(delivery_address__icontains=word)
+        )
+    return queryset
+
+
+def filter_orders(queryset, query):
+    """Narrow ``queryset`` to orders matching ``query`` (order unchanged)"""
+    expression = match_expression(query) if fts_enabled() else ''
+    if not expression:
+        return _fallback_filter(queryset, query)
+    return queryset.filter(id__in=RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]
+    ))
+
+
+def rank_orders(queryset, query):
+    """
+    Orders of ``queryset`` matching ``query``, best match first and newest
+    first among equals. Each row carries its bm25 score as ``search_rank``
+    (lower is better; None on the fallback path).
+    """
+    expression = match_expression(query) if fts_enabled() else ''
+    if not expression:
+        return _fallback_filter(queryset, query).order_by('-created_at', '-id')
+    return queryset.extra(
+        select={'search_rank': f'{FTS_TABLE}.rank'},
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = orders_order.id', f'{FTS_TABLE} MATCH %s'],
+        params=[expression],
+        order_by=['search_rank', '-created_at', '-id'],
+    )
+
+
+class RankedPage(KeysetPage):
+    """Best matches for a search; one page, polled for newer matches like the plain list"""
+
+    @property
+    def newest_cursor(self):
+        if not self.items:
+            return None
+        return encode_cursor(max(self.items, key=lambda order: (order.created_at, order.pk)))
+
+
+def search_page(queryset, query, page_size=PAGE_SIZE):
+    return RankedPage(list(rank_orders(queryset, query)[:page_size]), False, page_size)
+
+
+def rebuild_index():
+    """Repopulate the index from scratch; returns the number of orders indexed"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, order_number, customer_name, customer_phone, notes, delivery_address) "
+            f"SELECT o.id, {INDEX_COLUMNS} FROM orders_order o JOIN core_customer c ON c.id = o.customer_id"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
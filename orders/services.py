@@ -0,0 +1,476 @@
+# orders/services.py
+import os
+import threading
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from core.counters import items_changed
+from inventory.models import MenuItem
+from .models import Order, OrderItem, OrderNumberSequence, OrderStatusEvent, InvalidStatusTransition
+from .signals import order_items_changed
+
+
+def _to_int(value):
+    """Parse a posted number, returning None for blanks and garbage"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _split_ids(value):
+    """Split a comma separated id list, dropping anything that is not an id"""
+    ids = []
+    for part in (value or '').split(','):
+        item_id = _to_int(part.strip())
+        if item_id is not None:
+            ids.append(item_id)
+    return ids
+
+
+def parse_order_lines(data):
+    """
+    Read the order form fields (qty_* inputs and the custom_*[] lists built
+    by order_create.js / online_order.js) into plain line requests.
+    No database access happens here.
+    """
+    lines = []
+
+    # Regular menu items: qty_<menu_item_id>=<quantity>
+    for key, value in data.items():
+        if not key.startswith('qty_'):
+            continue
+        item_id = _to_int(key[len('qty_'):])
+        quantity = _to_int(value)
+        if item_id is None or not quantity or quantity <= 0:
+            continue
+        lines.append({'kind': 'item', 'quantity': quantity, 'item_id': item_id})
+
+    # Custom combos and individual base/protein items
+    custom_base_items = data.getlist('custom_base_items[]')
+    custom_source_items = data.getlist('custom_source_items[]')
+    custom_quantities = data.getlist('custom_quantities[]')
+    custom_types = data.getlist('custom_types[]')
+
+    for i, raw_quantity in enumerate(custom_quantities):
+        quantity = _to_int(raw_quantity)
+        if not quantity or quantity <= 0:
+            continue
+
+        item_type = custom_types[i] if i < len(custom_types) else 'custom_combo'
+        base_ids = _split_ids(custom_base_items[i]) if i < len(custom_base_items) else []
+        source_id = _to_int(custom_source_items[i]) if i < len(custom_source_items) else None
+
+        if item_type == 'protein_only' and source_id:
+            lines.append({'kind': 'protein_only', 'quantity': quantity, 'source_id': source_id})
+        elif item_type == 'custom_combo' and base_ids and source_id:
+            lines.append({'kind': 'custom_combo', 'quantity': quantity,
+                          'base_ids': base_ids, 'source_id': source_id})
+        elif item_type == 'base_only' and base_ids:
+            lines.append({'kind': 'base_only', 'quantity': quantity, 'base_ids': base_ids})
+
+    return lines
+
+
+def _referenced_ids(lines):
+    ids = set()
+    for line in lines:
+        if 'item_id' in line:
+            ids.add(line['item_id'])
+        if 'source_id' in line:
+            ids.add(line['source_id'])
+        ids.update(line.get('base_ids', ()))
+    return ids
+
+
+def build_order_items(data):
+    """
+    Turn posted order data into unsaved OrderItem instances.
+
+    Every menu item referenced by the form is fetched in a single query
+    and priced from its stored effective price. Lines pointing at unknown
+    items are skipped, as they always have been.
+    """
+    lines = parse_order_lines(data)
+    if not lines:
+        return []
+
+    menu_items = MenuItem.objects.in_bulk(_referenced_ids(lines))
+
+    order_items = []
+    for line in lines:
+        quantity = line['quantity']
+
+        if line['kind'] == 'item':
+            menu_item = menu_items.get(line['item_id'])
+            if menu_item is None:
+                continue
+            order_items.append(OrderItem(
+                menu_item=menu_item,
+                quantity=quantity,
+                unit_price=menu_item.actual_price or 0
+            ))
+
+        elif line['kind'] == 'protein_only':
+            source_item = menu_items.get(line['source_id'])
+            if source_item is None:
+                continue
+            order_items.append(OrderItem(
+                menu_item=source_item,
+                quantity=quantity,
+                unit_price=source_item.actual_price or 0,
+                notes=f"{source_item.name} (Protein Only)",
+                is_custom_combo=False,
+                custom_protein_source=source_item
+            ))
+
+        elif line['kind'] == 'custom_combo':
+            source_item = menu_items.get(line['source_id'])
+            base_items = [menu_items[i] for i in line['base_ids'] if i in menu_items]
+            if source_item is None or not base_items:
+                continue
+
+            base_price = sum(base.actual_price or 0 for base in base_items)
+            total_price = base_price + (source_item.actual_price or 0)
+            base_names = " + ".join(base.name for base in base_items)
+
+            # Use the first base item as reference
+            reference_item = base_items[0]
+            order_items.append(OrderItem(
+                menu_item=reference_item,
+                quantity=quantity,
+                unit_price=total_price,
+                notes=f"Custom: {base_names} with {source_item.name}",
+                is_custom_combo=True,
+                custom_base_item=reference_item,
+                custom_protein_source=source_item
+            ))
+
+        elif line['kind'] == 'base_only':
+            # Only priced base foods become order lines on their own
+            for base_id in line['base_ids']:
+                base_item = menu_items.get(base_id)
+                if base_item is None:
+                    continue
+                base_price = base_item.actual_price or 0
+                if base_price > 0:
+                    order_items.append(OrderItem(
+                        menu_item=base_item,
+                        quantity=quantity,
+                        unit_price=base_price,
+                        notes=f"{base_item.name} (Base Only)",
+                        is_custom_combo=False
+                    ))
+
+    return order_items
+
+
+def order_items_total(order_items):
+    return sum((item.subtotal for item in order_items), Decimal('0'))
+
+
+def save_order_items(order, order_items):
+    """
+    Save ``order`` and insert ``order_items`` for it in one transaction.
+
+    The order total is computed in memory and written together with the
+    order itself, and the lines go in with a single bulk insert, so
+    OrderItem.save() (which re-totals the order per line) is never hit.
+    """
+    with transaction.atomic():
+        order.total_amount = order_items_total(order_items)
+        order.save()
+        for item in order_items:
+            item.order = order
+        OrderItem.objects.bulk_create(order_items)
+        items_changed(order, added=order_items)
+
+        if order_items:
+            changes = OrderItemChanges(order)
+            changes.added = list(order_items)
+            transaction.on_commit(
+                lambda: order_items_changed.send(sender=Order, order=order, changes=changes)
+            )
+    return order_items
+
+
+def _line_key(item):
+    """What makes two order lines "the same line" when diffing an edit"""
+    return (
+        item.menu_item_id,
+        item.is_custom_combo,
+        item.custom_base_item_id,
+        item.custom_protein_source_id,
+        item.notes,
+    )
+
+
+class OrderItemChanges:
+    """The inserts, updates and deletes applied to an order's lines by an edit"""
+
+    def __init__(self, order):
+        self.order = order
+        self.added = []
+        self.updated = []   # (order_item, old_quantity)
+        self.removed = []
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.removed)
+
+    def __repr__(self):
+        return (f"<OrderItemChanges {self.order}: +{len(self.added)} "
+                f"~{len(self.updated)} -{len(self.removed)}>")
+
+
+def diff_order_items(order, order_items, existing_items=None):
+    """
+    Compare freshly built (unsaved) lines with the order's saved lines.
+
+    Lines are matched on menu item, combo parts and notes. A matched line
+    keeps its row and only has quantity/price updated when they differ,
+    unmatched posted lines are inserted and leftover saved lines deleted.
+    """
+    if existing_items is None:
+        existing_items = list(order.order_items.all())
+
+    saved_by_key = {}
+    for item in existing_items:
+        saved_by_key.setdefault(_line_key(item), []).append(item)
+
+    changes = OrderItemChanges(order)
+    for item in order_items:
+        candidates = saved_by_key.get(_line_key(item))
+        if not candidates:
+            item.order = order
+            changes.added.append(item)
+            continue
+
+        saved = candidates.pop(0)
+        if saved.quantity != item.quantity or saved.unit_price != item.unit_price:
+            changes.updated.append((saved, saved.quantity))
+            saved.quantity = item.quantity
+            saved.unit_price = item.unit_price
+
+    for leftovers in saved_by_key.values():
+        changes.removed.extend(leftovers)
+    return changes
+
+
+def sync_order_items(order, order_items):
+    """
+    Save ``order`` and bring its lines in line with ``order_items``,
+    touching only the rows that changed, in one transaction.
+    Returns the OrderItemChanges that were applied.
+    """
+    with transaction.atomic():
+        existing_items = list(order.order_items.select_for_update())
+        changes = diff_order_items(order, order_items, existing_items)
+
+        if changes.removed:
+            OrderItem.objects.filter(id__in=[item.id for item in changes.removed]).delete()
+        if changes.updated:
+            OrderItem.objects.bulk_update(
+                [item for item, _ in changes.updated], ['quantity', 'unit_price']
+            )
+        if changes.added:
+            OrderItem.objects.bulk_create(changes.added)
+        # Deleted lines were counted off by their post_delete signals
+        items_changed(order, added=changes.added, updated=changes.updated)
+
+        removed_ids = {item.id for item in changes.removed}
+        final_items = [item for item in existing_items if item.id not in removed_ids]
+        order.total_amount = order_items_total(final_items + changes.added)
+        order.save()
+
+        if changes:
+            transaction.on_commit(
+                lambda: order_items_changed.send(sender=Order, order=order, changes=changes)
+            )
+    return changes
+
+
+def change_order_status(order, status, user=None):
+    """
+    Move ``order`` to ``status`` if Order.allows_transition() lets it.
+    The change and its OrderStatusEvent are saved together.
+    Raises InvalidStatusTransition otherwise, leaving ``order`` as it was.
+    """
+    if status not in dict(Order.ORDER_STATUS) or not order.can_change_status_to(status):
+        raise InvalidStatusTransition(order, status)
+    order.status = status
+    order._status_changed_by = user
+    order.save()
+    return order
+
+
+# Stages of an order's life, measured between the first time it reached each status
+ORDER_STAGES = [
+    ('pending', 'preparing'),
+    ('preparing', 'ready'),
+    ('ready', 'served'),
+    ('served', 'paid'),
+]
+
+
+def _percentile(sorted_values, percent):
+    """Linear interpolation between the closest ranks"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def stage_latencies(branch=None, since=None, until=None):
+    """
+    Seconds each order spent in every ORDER_STAGES stage, from the status
+    log. Returns {(from, to): [seconds, ...]}; orders that skipped a stage
+    or have not finished it are left out of that stage. Stages run between
+    the first time each status was reached, so an order paid up front
+    (pending -> paid -> preparing -> ...) counts towards the kitchen stages
+    but not served -> paid, which it reached the other way round.
+    """
+    events = OrderStatusEvent.objects.all()
+    if branch is not None:
+        events = events.filter(branch=branch)
+    if since is not None:
+        events = events.filter(created_at__gte=since)
+    if until is not None:
+        events = events.filter(created_at__lt=until)
+
+    reached = {}
+    rows = events.order_by('created_at', 'id').values_list('order_id', 'to_status', 'created_at')
+    for order_id, status, created_at in rows.iterator():
+        reached.setdefault(order_id, {}).setdefault(status, created_at)
+
+    durations = {stage: [] for stage in ORDER_STAGES}
+    for times in reached.values():
+        for start, end in ORDER_STAGES:
+            if start in times and end in times and times[end] >= times[start]:
+                durations[(start, end)].append((times[end] - times[start]).total_seconds())
+    return durations
+
+
+def stage_latency_percentiles(branch=None, since=None, until=None, percentiles=(50, 90, 95)):
+    """
+    Per-stage latency summary for a branch (all branches when None):
+    [{'from': 'pending', 'to': 'preparing', 'count': n, 'mean': s, 'p50': s, ...}]
+    with times in seconds.
+    """
+    summary = []
+    for (start, end), values in stage_latencies(branch, since, until).items():
+        values.sort()
+        row = {
+            'from': start,
+            'to': end,
+            'count': len(values),
+            'mean': sum(values) / len(values) if values else None,
+        }
+        for percent in percentiles:
+            row[f'p{percent}'] = _percentile(values, percent)
+        summary.append(row)
+    return summary
+
+
+class OrderNumberAllocator:
+    """
+    Hands out order numbers from OrderNumberSequence without reading the
+    orders table.
+
+    Each worker process reserves a block of ORDER_NUMBER_BLOCK_SIZE numbers
+    at a time and serves them from memory, so the sequence row is only
+    touched once per block. Numbers stay unique across workers but are not
+    strictly in creation order, and the unused tail of a block is skipped
+    when a worker restarts. The thread lock only guards the blocks in
+    memory: one thread per scope refills from the database while the
+    others wait for its block, and other scopes carry on meanwhile.
+
+    Settings:
+        ORDER_NUMBER_BLOCK_SIZE  numbers reserved per database round trip (default 20)
+        ORDER_NUMBER_PER_BRANCH  separate sequence for every branch (default False)
+        ORDER_NUMBER_PER_DAY     restart numbering every business day (default False)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks = {}
+        self._refills = {}  # scope -> Event set once its running refill is done
+        self._pid = os.getpid()
+
+    def _scope(self, order):
+        """Return (scope key, number prefix, zero padding) for an order"""
+        per_branch = getattr(settings, 'ORDER_NUMBER_PER_BRANCH', False)
+        per_day = getattr(settings, 'ORDER_NUMBER_PER_DAY', False)
+
+        parts = []
+        if per_branch:
+            parts.append(str(order.branch_id or 0))
+        if per_day:
+            parts.append(timezone.localdate().strftime('%y%m%d'))
+
+        if not parts:
+            return 'global', 'ORD', 6
+        return '-'.join(parts), f"ORD{'-'.join(parts)}-", 4
+
+    def next_value(self, scope):
+        block_size = max(1, int(getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 20)))
+        initial = OrderNumberSequence.legacy_start if scope == 'global' else None
+
+        while True:
+            with self._lock:
+                # A forked worker must not serve numbers from its parent's blocks
+                if self._pid != os.getpid():
+                    self._blocks.clear()
+                    self._refills.clear()
+                    self._pid = os.getpid()
+
+                current, end = self._blocks.pop(scope, (0, 0))
+                if current < end:
+                    self._blocks[scope] = (current + 1, end)
+                    return current
+
+                refill = self._refills.get(scope)
+                if refill is None:
+                    # This thread refills the scope, without holding the lock
+                    refill = self._refills[scope] = threading.Event()
+                    break
+            # Another thread is refilling this scope: wait for its block
+            refill.wait()
+
+        try:
+            connection = transaction.get_connection()
+            in_caller_transaction = (
+                connection.in_atomic_block and not OrderNumberSequence.reserves_detached(connection)
+            )
+            current = OrderNumberSequence.reserve(scope, block_size, initial)
+            remaining = (current + 1, current + block_size)
+            if in_caller_transaction:
+                # The reservation rolls back with the caller's transaction, so the
+                # rest of the block may only be reused once it is committed
+                transaction.on_commit(lambda: self._keep(scope, remaining))
+            else:
+                self._keep(scope, remaining)
+        finally:
+            with self._lock:
+                self._refills.pop(scope, None)
+            refill.set()
+        return current
+
+    def _keep(self, scope, block):
+        with self._lock:
+            self._blocks[scope] = block
+
+    def next_number(self, order):
+        scope, prefix, width = self._scope(order)
+        return f"{prefix}{self.next_value(scope):0{width}d}"
+
+    def reset(self):
+        """Forget reserved blocks (used when the sequence table is changed by hand)"""
+        with self._lock:
+            self._blocks.clear()
+
+
+# Singleton instance
+order_number_allocator = OrderNumberAllocator()
@@ -0,0 +1,13 @@
+# orders/signals.py
+from django.dispatch import Signal
+
+# Sent after a transaction that inserted, updated or deleted order lines
+# commits. Bulk writes skip post_save, so listeners that track order lines
+# (stock, kitchen tickets) should use this.
+# Arguments: order, changes (orders.services.OrderItemChanges)
+order_items_changed = Signal()
+
+# Sent after a transaction that changed an order's status commits, including
+# the initial "placed" event of a new order (event.from_status == '').
+# Arguments: order, event (orders.models.OrderStatusEvent)
+order_status_changed = Signal()
@@ -1,7 +1,407 @@
-from django.test import TestCase
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.models import Branch, Customer, IdempotencyKey
+from core.ratelimit import ratelimit_store
+from core.registry import invalidate_registry
+from inventory.models import FoodCategory, MenuItem
+from .models import Order, OrderItem, OrderNumberSequence, OrderStatusEvent, InvalidStatusTransition
+from .pagination import newer_than, paginate_keyset
+from .search import FTS_TABLE, filter_orders, rank_orders
+from .services import (
+    OrderNumberAllocator, change_order_status, save_order_items, stage_latencies, sync_order_items,
+)
+from .signals import order_items_changed
 
-# Create your tests here.
 
+@override_settings(ORDER_NUMBER_BLOCK_SIZE=10)
+class OrderNumberAllocatorTests(SimpleTestCase):
+    def setUp(self):
+        self.allocator = OrderNumberAllocator()
+        self.reserved = []
+        self.next_start = 1
+        self.counter_lock = threading.Lock()
 
+    def fake_reserve(self, scope, count, initial=None):
+        time.sleep(0.05)  # a database round trip
+        with self.counter_lock:
+            start, self.next_start = self.next_start, self.next_start + count
+            self.reserved.append(scope)
+        return start
 
+    def test_concurrent_threads_share_one_refill(self):
+        numbers = []
 
+        def take():
+            for _ in range(2):
+                numbers.append(self.allocator.next_value('global'))
+
+        with mock.patch('orders.services.OrderNumberSequence.reserve', side_effect=self.fake_reserve):
+            threads = [threading.Thread(target=take) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(numbers), list(range(1, 11)))
+        self.assertEqual(self.reserved, ['global'])
+
+    def test_refill_does_not_block_other_scopes(self):
+        self.allocator._keep('b', (100, 110))
+        release = threading.Event()
+
+        def slow_reserve(scope, count, initial=None):
+            release.wait(5)
+            return 1
+
+        with mock.patch('orders.services.OrderNumberSequence.reserve', side_effect=slow_reserve):
+            refill = threading.Thread(target=self.allocator.next_value, args=('a',))
+            refill.start()
+            try:
+                time.sleep(0.05)
+                served = []
+                other = threading.Thread(target=lambda: served.append(self.allocator.next_value('b')))
+                other.start()
+                other.join(1)
+                self.assertEqual(served, [100])
+            finally:
+                release.set()
+                refill.join()
+
+
+class OrderNumberSequenceTests(TestCase):
+    def test_reserve_hands_out_consecutive_blocks(self):
+        self.assertEqual(OrderNumberSequence.reserve('test', 10, initial=lambda: 50), 50)
+        self.assertEqual(OrderNumberSequence.reserve('test', 10), 60)
+        self.assertEqual(OrderNumberSequence.objects.get(scope='test').next_value, 70)
+
+
+class SyncOrderItemsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        category = FoodCategory.objects.create(name='Food')
+        cls.soda, cls.chips, cls.water, cls.burger = (
+            MenuItem.objects.create(
+                name=name, description='d', category=category, item_type='side',
+                price=price, cost_price=1, preparation_time=5,
+            )
+            for name, price in (('Soda', 1000), ('Chips', 3000), ('Water', 500), ('Burger', 8000))
+        )
+
+    def setUp(self):
+        self.order = Order(
+            branch=self.branch, customer=Customer.objects.create(name='Ann', phone='0772123456'),
+            order_type='dine_in',
+        )
+        save_order_items(self.order, self.lines((self.soda, 2), (self.chips, 1), (self.water, 1)))
+        self.ids = dict(self.order.order_items.values_list('menu_item__name', 'id'))
+        self.sent = []
+        order_items_changed.connect(self.record, sender=Order)
+        self.addCleanup(order_items_changed.disconnect, self.record, sender=Order)
+
+    def record(self, sender, order, changes, **kwargs):
+        self.sent.append(changes)
+
+    def lines(self, *quantities):
+        return [OrderItem(menu_item=item, quantity=quantity, unit_price=item.price)
+                for item, quantity in quantities]
+
+    def sync(self, *quantities):
+        with self.captureOnCommitCallbacks(execute=True):
+            return sync_order_items(self.order, self.lines(*quantities))
+
+    def test_only_changed_lines_are_written(self):
+        changes = self.sync((self.soda, 3), (self.chips, 1), (self.burger, 1))
+
+        self.assertEqual([item.menu_item for item in changes.added], [self.burger])
+        self.assertEqual([(item.id, old) for item, old in changes.updated], [(self.ids['Soda'], 2)])
+        self.assertEqual([item.id for item in changes.removed], [self.ids['Water']])
+
+        saved = dict(self.order.order_items.values_list('menu_item__name', 'id'))
+        self.assertEqual(saved['Soda'], self.ids['Soda'])
+        self.assertEqual(saved['Chips'], self.ids['Chips'])
+        self.assertNotIn('Water', saved)
+        self.assertNotIn(saved['Burger'], self.ids.values())
+        self.assertEqual(OrderItem.objects.get(pk=self.ids['Soda']).quantity, 3)
+
+    def test_total_is_recomputed(self):
+        self.sync((self.soda, 3), (self.burger, 1))
+
+        self.assertEqual(self.order.total_amount, 11000)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).total_amount, 11000)
+
+    def test_changes_are_announced_once_after_commit(self):
+        changes = self.sync((self.soda, 3), (self.burger, 1))
+
+        self.assertEqual(self.sent, [changes])
+
+    def test_unchanged_lines_write_and_announce_nothing(self):
+        changes = self.sync((self.chips, 1), (self.water, 1), (self.soda, 2))
+
+        self.assertFalse(changes)
+        self.assertEqual(self.sent, [])
+        self.assertEqual(dict(self.order.order_items.values_list('menu_item__name', 'id')), self.ids)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        customer = Customer.objects.create(name='Ann', phone='0772123456')
+        start = timezone.now() - timedelta(hours=1)
+        cls.orders = []
+        # Seven orders over five distinct times, so pages split ties on created_at
+        for minutes in (0, 1, 1, 2, 3, 3, 4):
+            order = Order.objects.create(branch=branch, customer=customer, order_type='dine_in')
+            Order.objects.filter(pk=order.pk).update(created_at=start + timedelta(minutes=minutes))
+            cls.orders.append(order)
+        cls.newest_first = [order.pk for order in reversed(cls.orders)]
+
+    def pages(self, page_size):
+        pages, after = [], None
+        while True:
+            page = paginate_keyset(Order.objects.all(), after, page_size=page_size)
+            pages.append([order.pk for order in page])
+            if not page.has_next:
+                return pages
+            after = page.next_cursor
+
+    def test_pages_follow_on_without_duplicates(self):
+        pages = self.pages(page_size=2)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), self.newest_first)
+
+    def test_new_orders_do_not_shift_later_pages(self):
+        first = paginate_keyset(Order.objects.all(), page_size=3)
+        newer = Order.objects.create(
+            branch=self.orders[0].branch, customer=self.orders[0].customer, order_type='dine_in',
+        )
+
+        second = paginate_keyset(Order.objects.all(), first.next_cursor, page_size=3)
+        self.assertEqual([order.pk for order in second], self.newest_first[3:6])
+        self.assertEqual(newer_than(Order.objects.all(), first.newest_cursor), [newer])
+
+    def test_invalid_cursor_starts_from_the_top(self):
+        page = paginate_keyset(Order.objects.all(), 'not-a-cursor', page_size=2)
+        self.assertEqual([order.pk for order in page], self.newest_first[:2])
+        self.assertEqual(newer_than(Order.objects.all(), 'not-a-cursor'), [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The FTS5 index is SQLite only')
+class OrderSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        cls.ann = Customer.objects.create(name='Ann Okello', phone='0772123456')
+        cls.bob = Customer.objects.create(name='Bob Mukasa', phone='0701987654')
+        cls.rice = Order.objects.create(
+            branch=cls.branch, customer=cls.ann, order_type='delivery',
+            notes='Extra pilau rice', delivery_address='Ntinda',
+        )
+        cls.fish = Order.objects.create(
+            branch=cls.branch, customer=cls.bob, order_type='dine_in', notes='No pepper on the tilapia',
+        )
+
+    def found(self, query):
+        return sorted(order.pk for order in filter_orders(Order.objects.all(), query))
+
+    def indexed(self, order):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE rowid = %s", [order.pk])
+            return cursor.fetchone()[0]
+
+    def test_fragments_of_every_column_match(self):
+        self.assertEqual(self.found('okel'), [self.rice.pk])
+        self.assertEqual(self.found('tilap'), [self.fish.pk])
+        self.assertEqual(self.found('Ntinda'), [self.rice.pk])
+        self.assertEqual(self.found('987654'), [self.fish.pk])
+        self.assertEqual(self.found(self.fish.order_number), [self.fish.pk])
+        self.assertEqual(self.found('pilau tilapia'), [])
+
+    def test_updated_order_is_reindexed(self):
+        self.rice.notes = 'Matooke instead'
+        self.rice.save()
+        Order.objects.filter(pk=self.fish.pk).update(notes='Whole tilapia, fried')
+
+        self.assertEqual(self.found('pilau'), [])
+        self.assertEqual(self.found('matooke'), [self.rice.pk])
+        self.assertEqual(self.found('fried'), [self.fish.pk])
+
+    def test_renamed_customer_is_reindexed(self):
+        Customer.objects.filter(pk=self.bob.pk).update(name='Robert Mukasa')
+
+        self.assertEqual(self.found('robert'), [self.fish.pk])
+        self.assertEqual(self.found('bob'), [])
+
+    def test_deleted_order_leaves_the_index(self):
+        self.fish.delete()
+
+        self.assertEqual(self.indexed(self.fish), 0)
+        self.assertEqual(self.found('tilapia'), [])
+
+    def test_best_match_first(self):
+        Order.objects.create(
+            branch=self.branch, customer=self.ann, order_type='dine_in', notes='rice',
+        )
+        ranked = list(rank_orders(Order.objects.all(), 'rice'))
+        self.assertEqual(len(ranked), 2)
+        self.assertLessEqual(ranked[0].search_rank, ranked[1].search_rank)
+
+    def test_short_words_fall_back_to_icontains(self):
+        self.assertEqual(self.found('No'), [self.fish.pk])
+        self.assertIsNone(getattr(rank_orders(Order.objects.all(), 'No')[0], 'search_rank', None))
+
+
+class OrderStatusTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        cls.customer = Customer.objects.create(name='Ann', phone='0772123456')
+
+    def order(self, *statuses):
+        order = Order.objects.create(branch=self.branch, customer=self.customer, order_type='dine_in')
+        for status in statuses:
+            change_order_status(order, status)
+        return Order.objects.get(pk=order.pk)
+
+    def test_save_rejects_a_status_the_order_cannot_reach(self):
+        order = self.order()
+        order.status = 'served'
+        with self.assertRaises(InvalidStatusTransition):
+            order.save()
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pending')
+
+    def test_change_order_status_leaves_the_order_alone_when_rejected(self):
+        order = self.order('cancelled')
+        with self.assertRaises(InvalidStatusTransition):
+            change_order_status(order, 'preparing')
+        self.assertEqual(order.status, 'cancelled')
+        self.assertEqual(order.status_events.count(), 2)
+
+    def test_clean_rejects_an_invalid_change(self):
+        order = self.order('preparing', 'ready', 'served')
+        order.status = 'pending'
+        with self.assertRaises(ValidationError) as caught:
+            order.full_clean()
+        self.assertIn('status', caught.exception.message_dict)
+
+    def test_paid_after_serving_is_final(self):
+        order = self.order('preparing', 'ready', 'served', 'paid')
+        self.assertEqual(order.next_status_choices, [])
+        with self.assertRaises(InvalidStatusTransition):
+            change_order_status(order, 'preparing')
+
+    def test_prepaid_order_goes_on_through_the_kitchen(self):
+        order = self.order('paid', 'preparing')
+        self.assertFalse(order.can_change_status_to('paid'))
+        change_order_status(order, 'ready')
+        self.assertEqual([value for value, label in order.next_status_choices], ['served', 'cancelled'])
+
+    def test_order_paid_while_preparing_cannot_go_back(self):
+        order = self.order('preparing', 'paid')
+        self.assertFalse(order.can_change_status_to('preparing'))
+        self.assertTrue(order.can_change_status_to('ready'))
+
+    def test_stage_latencies_leave_prepaid_orders_out_of_served_to_paid(self):
+        order = self.order('paid', 'preparing', 'ready', 'served')
+        start = timezone.now()
+        for minutes, event in enumerate(order.status_events.order_by('id')):
+            OrderStatusEvent.objects.filter(pk=event.pk).update(created_at=start + timedelta(minutes=minutes))
+
+        durations = stage_latencies(self.branch)
+        self.assertEqual(durations[('pending', 'preparing')], [120.0])
+        self.assertEqual(durations[('ready', 'served')], [60.0])
+        self.assertEqual(durations[('served', 'paid')], [])
+
+
+class OnlineOrderSubmitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        cls.soda = MenuItem.objects.create(
+            name='Soda', description='d', category=FoodCategory.objects.create(name='Drinks'),
+            item_type='beverage', price=1000, cost_price=1, preparation_time=5,
+        )
+
+    def setUp(self):
+        # Branch ids come round again after each test's rollback
+        invalidate_registry()
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        self.enterContext(self.settings(RATELIMIT_STORE_PATH=f'{store.name}/ratelimit.sqlite3'))
+        self.addCleanup(ratelimit_store.clear)
+
+    def submit(self, **headers):
+        return self.client.post(reverse('orders:submit_online_order'), {
+            'customer_name': 'Ann', 'customer_phone': '0772123456',
+            'delivery_address': 'Kampala', f'qty_{self.soda.id}': '2',
+        }, **headers)
+
+    def test_submit_places_the_order_on_the_default_branch(self):
+        response = self.submit()
+
+        self.assertTrue(response.json()['success'], response.json())
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual(order.branch, self.branch)
+        self.assertEqual(order.order_type, 'delivery')
+        self.assertEqual(order.total_amount, 2000)
+        self.assertEqual(list(order.order_items.values_list('menu_item', 'quantity')), [(self.soda.id, 2)])
+
+    def test_submit_without_an_active_branch_creates_one(self):
+        Branch.objects.update(is_active=False)
+        invalidate_registry()
+
+        response = self.submit()
+
+        self.assertTrue(response.json()['success'], response.json())
+        self.assertTrue(Order.objects.get(pk=response.json()['order_id']).branch.is_active)
+
+    @override_settings(RATELIMIT_ONLINE_SUBMIT_PER_IP=(1, 60))
+    def test_replay_does_not_take_rate_limit_tokens(self):
+        first = self.submit(HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertTrue(first.json()['success'])
+
+        replay = self.submit(HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), first.json())
+
+        self.assertEqual(self.submit(HTTP_IDEMPOTENCY_KEY='k2').status_code, 429)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_is_claimed_in_its_own_transaction(self):
+        depth_before = len(connection.atomic_blocks)
+        depths = []
+        create = IdempotencyKey.objects.create
+
+        def claim(**fields):
+            depths.append(len(connection.atomic_blocks))
+            return create(**fields)
+
+        with mock.patch.object(IdempotencyKey.objects, 'create', side_effect=claim):
+            self.assertTrue(self.submit(HTTP_IDEMPOTENCY_KEY='k1').json()['success'])
+        # Only the claim's own atomic block, which commits on leaving it
+        self.assertEqual(depths, [depth_before + 1])
@@ -9,6 +9,9 @@ urlpatterns = [
     path('online/submit/', views.submit_online_order, name='submit_online_order'),
     path('online/success/<int:order_id>/', views.online_order_success, name='online_order_success'),
     path('', views.order_list, name='order_list'),
+    path('newer/', views.order_list_newer, name='order_list_newer'),
+    path('search/', views.order_search, name='order_search'),
+    path('stats/stage-latency/', views.order_stage_latency, name='order_stage_latency'),
     
     path('create/', views.order_create, name='order_create'),
     path('create-customer-ajax/', views.create_customer_ajax, name='create_customer_ajax'),
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:51
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# A frozen copy of core.phone.normalize_phone as it was when this migration
+# was written, so later changes there cannot alter it
+def normalize_phone(phone):
+    phone = str(phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    code = str(getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', '256'))
+
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith(code) and len(digits) > 9:
+        pass
+    elif digits.startswith('0'):
+        digits = code + digits[1:]
+    elif len(digits) == 9:
+        digits = code + digits
+
+    if not 8 <= len(digits) <= 15:
+        return ''
+    return '+' + digits
+
+
+def normalize_transaction_phones(apps, schema_editor):
+    PaymentTransaction = apps.get_model('payments', 'PaymentTransaction')
+    for pk, phone in PaymentTransaction.objects.values_list('pk', 'phone_number').iterator():
+        normalized = normalize_phone(phone)
+        if normalized and normalized != phone:
+            PaymentTransaction.objects.filter(pk=pk).update(phone_number=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_paymentproviderconfig_yo_password_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymenttransaction',
+            name='phone_number',
+            field=models.CharField(db_index=True, max_length=15),
+        ),
+        migrations.RunPython(normalize_transaction_phones, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from orders.models import Order
+from core.phone import normalize_phone
 
 class PaymentTransaction(models.Model):
     PAYMENT_PROVIDERS = [
@@ -20,7 +21,7 @@ class PaymentTransaction(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='payment_transactions')
     transaction_id = models.CharField(max_length=100, unique=True)
     provider = models.CharField(max_length=10, choices=PAYMENT_PROVIDERS)
-    phone_number = models.CharField(max_length=15)
+    phone_number = models.CharField(max_length=15, db_index=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='initiated')
     provider_transaction_id = models.CharField(max_length=100, blank=True, null=True)
@@ -39,6 +40,7 @@ class PaymentTransaction(models.Model):
         # Auto-populate phone number from order if not provided
         if not self.phone_number and self.order.customer_phone:
             self.phone_number = self.order.customer_phone
+        self.phone_number = normalize_phone(self.phone_number) or self.phone_number
         super().save(*args, **kwargs)
 
 class PaymentProviderConfig(models.Model):
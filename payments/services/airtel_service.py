@@ -2,6 +2,7 @@ import requests
 import json
 import base64
 from django.conf import settings
+from core.phone import msisdn
 import logging
 
 logger = logging.getLogger(__name__)
@@ -67,7 +68,7 @@ class AirtelMoneyService:
             "subscriber": {
                 "country": "UG",
                 "currency": "UGX",
-                "msisdn": self._format_phone_number(phone_number)
+                "msisdn": msisdn(phone_number)
             },
             "transaction": {
                 "amount": amount,
@@ -121,15 +122,4 @@ class AirtelMoneyService:
                 return None
         except requests.exceptions.RequestException as e:
             logger.error(f"Airtel Status Check Error: {str(e)}")
-            return None
-    
-    def _format_phone_number(self, phone_number):
-        """Format phone number to Airtel format (256XXXXXXXXX)"""
-        cleaned = ''.join(filter(str.isdigit, phone_number))
-        
-        if cleaned.startswith('0'):
-            cleaned = '256' + cleaned[1:]
-        elif cleaned.startswith('7'):
-            cleaned = '256' + cleaned
-        
-        return cleaned
\ No newline at end of file
+            return None
\ No newline at end of file
@@ -2,6 +2,7 @@ import requests
 import json
 import base64
 from django.conf import settings
+from core.phone import msisdn
 import logging
 
 logger = logging.getLogger(__name__)
@@ -65,7 +66,7 @@ class MTNMobileMoneyService:
             "externalId": transaction_id,
             "payer": {
                 "partyIdType": "MSISDN",
-                "partyId": self._format_phone_number(phone_number)
+                "partyId": msisdn(phone_number)
             },
             "payerMessage": description,
             "payeeNote": f"Order {transaction_id}"
@@ -84,14 +85,3 @@ class MTNMobileMoneyService:
         except requests.exceptions.RequestException as e:
             logger.error(f"MTN Payment Request Error: {str(e)}")
             return False, f"Network error: {str(e)}"
-    
-    def _format_phone_number(self, phone_number):
-        """Format phone number to MTN format (256XXXXXXXXX)"""
-        cleaned = ''.join(filter(str.isdigit, phone_number))
-        
-        if cleaned.startswith('0'):
-            cleaned = '256' + cleaned[1:]
-        elif cleaned.startswith('7'):
-            cleaned = '256' + cleaned
-        
-        return cleaned
\ No newline at end of file
@@ -1,5 +1,8 @@
 from .mtn_service import MTNMobileMoneyService
 from .yo_service import YoPaymentsService
+from django.db import transaction as db_transaction
+from core.locking import lock_rows
+from orders.services import change_order_status, InvalidStatusTransition
 from payments.models import PaymentTransaction
 import logging
 
@@ -87,16 +90,15 @@ class PaymentManager:
                 
                 new_status = status_map.get(provider_status, 'pending')
                 
-                # Only update if status changed
-                if transaction.status != new_status:
-                    transaction.status = new_status
-                    transaction.yo_transaction_status = provider_status
-                    transaction.save()
-                    
-                    # Update order status if payment successful
-                    if new_status == 'successful':
-                        transaction.order.status = 'paid'
-                        transaction.order.save()
+                # Another request (usually the provider's callback) may be
+                # settling this transaction right now; leave it to that one
+                settled = self.settle_transaction(
+                    transaction_id, new_status, skip_locked=True,
+                    yo_transaction_status=provider_status,
+                )
+                if settled is not None:
+                    return settled.status
+                transaction.refresh_from_db(fields=['status'])
             
             return transaction.status
             
@@ -106,6 +108,39 @@ class PaymentManager:
             logger.error(f"Status Check Error: {str(e)}")
             return None
     
+    def settle_transaction(self, transaction_id, new_status, skip_locked=False, **fields):
+        """
+        Record a provider's verdict on a transaction and mark its order paid
+        when it succeeded. The transaction row is locked first (core.locking),
+        so a callback and a status check arriving together apply it once.
+        ``fields`` are provider references saved along with a status change.
+        Returns the transaction, or None when it does not exist (or, with
+        ``skip_locked``, is being settled by another request).
+        """
+        with db_transaction.atomic():
+            transaction = lock_rows(
+                PaymentTransaction.objects.select_related('order'), skip_locked
+            ).filter(transaction_id=transaction_id).first()
+            if transaction is None or transaction.status == new_status:
+                return transaction
+            
+            transaction.status = new_status
+            for name, value in fields.items():
+                setattr(transaction, name, value)
+            transaction.save()
+            
+            order = transaction.order
+            if new_status == 'successful' and order.status != 'paid':
+                try:
+                    change_order_status(order, 'paid')
+                except InvalidStatusTransition as e:
+                    # The money is in but the order can no longer be paid
+                    # (e.g. it was cancelled): keep the payment for a refund
+                    logger.warning(f"Payment {transaction_id} succeeded but was not applied: {e}")
+                else:
+                    logger.info(f"Order {order.order_number} marked as paid via {transaction.get_provider_display()}")
+            return transaction
+    
     def _generate_transaction_id(self):
         """Generate unique transaction ID"""
         import uuid
@@ -2,6 +2,7 @@ import requests
 import json
 import logging
 from django.conf import settings
+from core.phone import msisdn
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -32,7 +33,7 @@ class YoPaymentsService:
         url = "https://paymentsapi.yo.co.ug/yopayments-main/task.php"
         
         # Format phone number for Yo! (256XXXXXXXXX)
-        formatted_phone = self._format_phone_number(phone_number)
+        formatted_phone = msisdn(phone_number)
         
         payload = {
             'method': 'acdepositfunds',
@@ -105,17 +106,6 @@ class YoPaymentsService:
             logger.error(f"Yo! Status Check Error: {str(e)}")
             return None
     
-    def _format_phone_number(self, phone_number):
-        """Format phone number to Yo! format (256XXXXXXXXX)"""
-        cleaned = ''.join(filter(str.isdigit, phone_number))
-        
-        if cleaned.startswith('0'):
-            cleaned = '256' + cleaned[1:]
-        elif cleaned.startswith('7'):
-            cleaned = '256' + cleaned
-        
-        return cleaned
-    
     def _parse_yo_error(self, response_text):
         """Parse Yo! Payments error messages"""
         response_upper = response_text.upper()
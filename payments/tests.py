@@ -1,3 +1,45 @@
 from django.test import TestCase
+from core.models import Branch, Customer
+from orders.models import Order
+from .models import PaymentTransaction
+from .services.payment_manager import PaymentManager
 
-# Create your tests here.
+
+class SettleTransactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch = Branch.objects.create(
+            name='Main', address='a', phone='1', email='main@example.com',
+            opening_time='09:00', closing_time='22:00',
+        )
+        cls.customer = Customer.objects.create(name='Ann', phone='0772123456')
+
+    def payment(self, order_status='pending'):
+        order = Order.objects.create(
+            branch=self.branch, customer=self.customer, order_type='takeaway', total_amount=1000,
+        )
+        if order_status != 'pending':
+            order.status = order_status
+            order.save()
+        return PaymentTransaction.objects.create(
+            order=order, transaction_id=f'T{order.pk}', provider='yo',
+            phone_number='256772123456', amount=1000, status='pending',
+        )
+
+    def test_successful_payment_marks_the_order_paid_and_logs_it(self):
+        payment = self.payment()
+        PaymentManager().settle_transaction(payment.transaction_id, 'successful')
+
+        order = Order.objects.get(pk=payment.order_id)
+        self.assertEqual(order.status, 'paid')
+        self.assertEqual(list(order.status_events.values_list('from_status', 'to_status')),
+                         [('', 'pending'), ('pending', 'paid')])
+
+    def test_payment_for_a_cancelled_order_leaves_it_cancelled(self):
+        payment = self.payment('cancelled')
+        with self.assertLogs('payments.services.payment_manager', 'WARNING'):
+            PaymentManager().settle_transaction(payment.transaction_id, 'successful')
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'successful')
+        self.assertEqual(Order.objects.get(pk=payment.order_id).status, 'cancelled')
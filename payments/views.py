@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.db import transaction
 import json
 import logging
 from .models import PaymentTransaction
@@ -11,6 +12,7 @@ from .services.payment_manager import PaymentManager
 logger = logging.getLogger(__name__)
 
 @login_required
+@transaction.non_atomic_requests  # waits on the provider's API; don't hold the write lock
 def initiate_payment(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     
@@ -104,35 +106,24 @@ def _handle_yo_webhook(data):
     if not transaction_id:
         return JsonResponse({'status': 'error', 'message': 'Missing transaction reference'})
     
-    try:
-        transaction = PaymentTransaction.objects.get(transaction_id=transaction_id)
-        
-        status_map = {
-            'SUCCEEDED': 'successful',
-            'SUCCESSFUL': 'successful',
-            'FAILED': 'failed',
-            'PENDING': 'pending',
-        }
-        
-        new_status = status_map.get(status, 'pending')
-        
-        if transaction.status != new_status:
-            transaction.status = new_status
-            transaction.provider_transaction_id = yo_transaction_id
-            transaction.yo_transaction_status = status
-            transaction.save()
-            
-            # Update order status if payment successful
-            if new_status == 'successful':
-                transaction.order.status = 'paid'
-                transaction.order.save()
-                logger.info(f"Order {transaction.order.order_number} marked as paid via Yo! Payments")
-        
-        return JsonResponse({'status': 'success'})
-        
-    except PaymentTransaction.DoesNotExist:
+    status_map = {
+        'SUCCEEDED': 'successful',
+        'SUCCESSFUL': 'successful',
+        'FAILED': 'failed',
+        'PENDING': 'pending',
+    }
+    
+    # Updates the order too if the payment succeeded
+    transaction = PaymentManager().settle_transaction(
+        transaction_id, status_map.get(status, 'pending'),
+        provider_transaction_id=yo_transaction_id,
+        yo_transaction_status=status,
+    )
+    if transaction is None:
         logger.error(f"Yo! Webhook: Transaction not found - {transaction_id}")
         return JsonResponse({'status': 'error', 'message': 'Transaction not found'})
+    
+    return JsonResponse({'status': 'success'})
 
 def _handle_mtn_webhook(data):
     """Handle MTN Mobile Money webhook"""
@@ -142,32 +133,21 @@ def _handle_mtn_webhook(data):
     if not transaction_id:
         return JsonResponse({'status': 'error', 'message': 'Missing transaction ID'})
     
-    try:
-        transaction = PaymentTransaction.objects.get(transaction_id=transaction_id)
-        
-        status_map = {
-            'SUCCESSFUL': 'successful',
-            'FAILED': 'failed',
-            'PENDING': 'pending',
-        }
-        
-        new_status = status_map.get(status, 'pending')
-        
-        if transaction.status != new_status:
-            transaction.status = new_status
-            transaction.provider_transaction_id = data.get('financialTransactionId')
-            transaction.save()
-            
-            if new_status == 'successful':
-                transaction.order.status = 'paid'
-                transaction.order.save()
-                logger.info(f"Order {transaction.order.order_number} marked as paid via MTN")
-        
-        return JsonResponse({'status': 'success'})
-        
-    except PaymentTransaction.DoesNotExist:
+    status_map = {
+        'SUCCESSFUL': 'successful',
+        'FAILED': 'failed',
+        'PENDING': 'pending',
+    }
+    
+    transaction = PaymentManager().settle_transaction(
+        transaction_id, status_map.get(status, 'pending'),
+        provider_transaction_id=data.get('financialTransactionId'),
+    )
+    if transaction is None:
         logger.error(f"MTN Webhook: Transaction not found - {transaction_id}")
         return JsonResponse({'status': 'error', 'message': 'Transaction not found'})
+    
+    return JsonResponse({'status': 'success'})
 
 def _handle_airtel_webhook(data):
     """Handle Airtel Money webhook"""
@@ -177,35 +157,24 @@ def _handle_airtel_webhook(data):
     if not transaction_id:
         return JsonResponse({'status': 'error', 'message': 'Missing transaction ID'})
     
-    try:
-        transaction = PaymentTransaction.objects.get(transaction_id=transaction_id)
-        
-        status_map = {
-            'TS': 'successful',  # Transaction Success
-            'TF': 'failed',      # Transaction Failed
-            'TP': 'pending',     # Transaction Pending
-            'SUCCESSFUL': 'successful',
-            'FAILED': 'failed',
-            'PENDING': 'pending',
-        }
-        
-        new_status = status_map.get(status, 'pending')
-        
-        if transaction.status != new_status:
-            transaction.status = new_status
-            transaction.provider_transaction_id = data.get('id') or data.get('transaction_id')
-            transaction.save()
-            
-            if new_status == 'successful':
-                transaction.order.status = 'paid'
-                transaction.order.save()
-                logger.info(f"Order {transaction.order.order_number} marked as paid via Airtel")
-        
-        return JsonResponse({'status': 'success'})
-        
-    except PaymentTransaction.DoesNotExist:
+    status_map = {
+        'TS': 'successful',  # Transaction Success
+        'TF': 'failed',      # Transaction Failed
+        'TP': 'pending',     # Transaction Pending
+        'SUCCESSFUL': 'successful',
+        'FAILED': 'failed',
+        'PENDING': 'pending',
+    }
+    
+    transaction = PaymentManager().settle_transaction(
+        transaction_id, status_map.get(status, 'pending'),
+        provider_transaction_id=data.get('id') or data.get('transaction_id'),
+    )
+    if transaction is None:
         logger.error(f"Airtel Webhook: Transaction not found - {transaction_id}")
         return JsonResponse({'status': 'error', 'message': 'Transaction not found'})
+    
+    return JsonResponse({'status': 'success'})
 
 @login_required
 def payment_test(request):
@@ -15,6 +15,10 @@ from datetime import datetime
 
 # Import from core models (only models that actually exist in core)
 from core.models import Branch, Employee
+from core.branch_context import get_manager
+from core.branch_summary import branch_summaries
+from core.stats import day_range
+from core.reporting import reporting_reads
 
 # Import from orders app
 from orders.models import Order, Payment, OrderItem
@@ -24,6 +28,7 @@ from inventory.models import MenuItem, Stock, FoodCategory
 
 
 @login_required
+@reporting_reads()
 def reports_dashboard(request):
     # Get selected branch from query parameters
     branch_id = request.GET.get('branch')
@@ -35,7 +40,7 @@ def reports_dashboard(request):
     # Base querysets
     if is_admin:
         # Admin can view any branch's reports
-        branches = Branch.objects.filter(is_active=True)
+        branches = branch_summaries(('employee_count', 'order_count'))
         if branch_id and branch_id != 'all':
             selected_branch = get_object_or_404(Branch, id=branch_id)
             # Filter data for selected branch
@@ -49,7 +54,7 @@ def reports_dashboard(request):
     else:
         # Regular manager - only their branch
         try:
-            manager_employee = Employee.objects.get(user=request.user, employee_type='manager')
+            manager_employee = get_manager(request)
             selected_branch = manager_employee.branch
             branches = Branch.objects.filter(id=selected_branch.id)
             orders = Order.objects.filter(branch=selected_branch)
@@ -61,37 +66,41 @@ def reports_dashboard(request):
     try:
         # Calculate weekly sales with branch filtering
         week_ago = timezone.now().date() - timedelta(days=7)
+        week_start = day_range(week_ago)[0]
         weekly_sales = payments.filter(
-            payment_date__date__gte=week_ago,
+            payment_date__gte=week_start,
             is_successful=True
         ).aggregate(total=Sum('amount'))['total'] or 0
         
-        total_orders = orders.filter(created_at__date__gte=week_ago).count()
+        total_orders = orders.filter(created_at__gte=week_start).count()
         
         # Use the safe method for low stock count
         low_stock_count = Stock.get_low_stock_items().count()
         
         # Count active customers (customers with orders in last 30 days)
         month_ago = timezone.now().date() - timedelta(days=30)
+        month_start = day_range(month_ago)[0]
         active_customers = orders.filter(
-            created_at__date__gte=month_ago
+            created_at__gte=month_start
         ).values('customer').distinct().count()
         
         # Additional statistics for admin
         if is_admin:
             # Total branches count
-            total_branches = branches.count()
+            total_branches = len(branches)
             
             # Today's revenue
             today = timezone.now().date()
+            day_start, day_end = day_range(today)
             today_revenue = payments.filter(
-                payment_date__date=today,
+                payment_date__gte=day_start,
+                payment_date__lt=day_end,
                 is_successful=True
             ).aggregate(total=Sum('amount'))['total'] or 0
             
             # Monthly revenue
             monthly_revenue = payments.filter(
-                payment_date__date__gte=month_ago,
+                payment_date__gte=month_start,
                 is_successful=True
             ).aggregate(total=Sum('amount'))['total'] or 0
             
@@ -138,6 +147,7 @@ def reports_dashboard(request):
     return render(request, 'reports/dashboard.html', context)
 
 @login_required
+@reporting_reads()
 def sales_report(request):
     # Get filter parameters
     start_date = request.GET.get('start_date')
@@ -156,8 +166,10 @@ def sales_report(request):
         start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
     
     # Base queryset filtered by date range
+    range_start, range_end = day_range(start_date, end_date)
     orders = Order.objects.filter(
-        created_at__date__range=[start_date, end_date],
+        created_at__gte=range_start,
+        created_at__lt=range_end,
         status__in=['completed', 'paid', 'served']  # Only completed orders
     )
     
@@ -224,8 +236,10 @@ def sales_report(request):
     period_sales = []
     
     # Today's sales
+    today_start, today_end = day_range(today)
     today_orders = Order.objects.filter(
-        created_at__date=today,
+        created_at__gte=today_start,
+        created_at__lt=today_end,
         status__in=['completed', 'paid', 'served']
     )
     today_revenue = today_orders.aggregate(total=Sum('total_amount'))['total'] or 0
@@ -244,8 +258,10 @@ def sales_report(request):
     })
     
     # Yesterday's sales
+    yesterday_start, yesterday_end = day_range(yesterday)
     yesterday_orders = Order.objects.filter(
-        created_at__date=yesterday,
+        created_at__gte=yesterday_start,
+        created_at__lt=yesterday_end,
         status__in=['completed', 'paid', 'served']
     )
     yesterday_revenue = yesterday_orders.aggregate(total=Sum('total_amount'))['total'] or 0
@@ -264,8 +280,10 @@ def sales_report(request):
     })
     
     # This week's sales
+    week_start, week_end = day_range(start_of_week, end_of_week)
     week_orders = Order.objects.filter(
-        created_at__date__range=[start_of_week, end_of_week],
+        created_at__gte=week_start,
+        created_at__lt=week_end,
         status__in=['completed', 'paid', 'served']
     )
     week_revenue = week_orders.aggregate(total=Sum('total_amount'))['total'] or 0
@@ -284,8 +302,10 @@ def sales_report(request):
     })
     
     # This month's sales
+    month_start, month_end = day_range(start_of_month, end_of_month)
     month_orders = Order.objects.filter(
-        created_at__date__range=[start_of_month, end_of_month],
+        created_at__gte=month_start,
+        created_at__lt=month_end,
         status__in=['completed', 'paid', 'served']
     )
     month_revenue = month_orders.aggregate(total=Sum('total_amount'))['total'] or 0
@@ -323,6 +343,7 @@ def sales_report(request):
     return render(request, 'reports/sales_report.html', context)
 
 @login_required
+@reporting_reads()
 def inventory_report(request):
     # Inventory report data - using efficient database query
     try:
@@ -348,6 +369,7 @@ def inventory_report(request):
     })
 
 @login_required
+@reporting_reads()
 def financial_report(request):
     # Financial report data
     return render(request, 'reports/financial_report.html')
@@ -355,6 +377,7 @@ def financial_report(request):
 
 
 @login_required
+@reporting_reads()
 def branch_detailed_report(request, branch_id):
     """Detailed reports for a specific branch (admin only)"""
     if not (request.user.is_superuser or request.user.is_staff):
@@ -373,12 +396,14 @@ def branch_detailed_report(request, branch_id):
     
     # Apply date filters if provided
     if start_date:
-        orders = orders.filter(created_at__date__gte=start_date)
-        payments = payments.filter(payment_date__date__gte=start_date)
+        range_start = day_range(datetime.strptime(start_date, '%Y-%m-%d').date())[0]
+        orders = orders.filter(created_at__gte=range_start)
+        payments = payments.filter(payment_date__gte=range_start)
     
     if end_date:
-        orders = orders.filter(created_at__date__lte=end_date)
-        payments = payments.filter(payment_date__date__lte=end_date)
+        range_end = day_range(datetime.strptime(end_date, '%Y-%m-%d').date())[1]
+        orders = orders.filter(created_at__lt=range_end)
+        payments = payments.filter(payment_date__lt=range_end)
     
     # Calculate detailed statistics
     total_revenue = payments.aggregate(total=Sum('amount'))['total'] or 0
@@ -427,6 +452,7 @@ def branch_detailed_report(request, branch_id):
     return render(request, 'reports/branch_detailed_report.html', context)
 
 @login_required
+@reporting_reads()
 def customer_report(request):
     # Get basic customer statistics
     customer_stats = {
@@ -466,6 +492,7 @@ def customer_report(request):
 
 @require_POST
 @csrf_exempt
+@reporting_reads()
 def generate_report(request):
     """Generate and download reports in various formats"""
     try:
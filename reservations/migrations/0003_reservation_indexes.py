@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_branch_daily_counters'),
+        ('reservations', '0002_alter_reservation_options_alter_table_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['branch', 'reservation_date'], name='reservation_branch__a63132_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['reservation_date', 'reservation_time'], name='reservation_reserva_1008d5_idx'),
+        ),
+    ]
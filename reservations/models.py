@@ -1,5 +1,6 @@
 from django.db import models
 from core.models import Customer, Branch
+from core.counters import counted_state
 
 class Table(models.Model):
     TABLE_TYPES = [
@@ -44,8 +45,18 @@ class Reservation(models.Model):
     def __str__(self):
         return f"Reservation for {self.customer.name} on {self.reservation_date}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted_state = counted_state(instance)
+        return instance
+    
     class Meta:
         ordering = ['-reservation_date', '-reservation_time']
+        indexes = [
+            models.Index(fields=['branch', 'reservation_date']),
+            models.Index(fields=['reservation_date', 'reservation_time']),
+        ]
     
     @property
     def end_time(self):
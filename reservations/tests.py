@@ -1,7 +1,38 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.shortcuts import render
 from django.test import TestCase
+from django.urls import reverse
+from .models import Table
 
-# Create your tests here.
 
+class FailedWriteTests(TestCase):
+    """A view that catches a failed write still renders inside a usable request transaction"""
 
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.usable = []
 
+    def render(self, *args, **kwargs):
+        self.usable.append(not transaction.get_connection().needs_rollback)
+        return render(*args, **kwargs)
 
+    def test_table_add(self):
+        with mock.patch('reservations.views.render', side_effect=self.render):
+            response = self.client.post(reverse('reservations:table_add'), {
+                'table_number': 'T1', 'table_type': '4_seater', 'capacity': 'four',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.usable, [True])
+        self.assertFalse(Table.objects.exists())
+
+    def test_table_edit(self):
+        table = Table.objects.create(table_number='T1', table_type='4_seater', capacity=4)
+        with mock.patch('reservations.views.render', side_effect=self.render):
+            self.client.post(reverse('reservations:table_edit', args=[table.pk]), {
+                'table_number': 'T1', 'table_type': '4_seater', 'capacity': 'four',
+            })
+        self.assertEqual(self.usable, [True])
+        table.refresh_from_db()
+        self.assertEqual(table.capacity, 4)
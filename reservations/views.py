@@ -4,11 +4,17 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.db import transaction
 import json
 from datetime import datetime, date
 from .models import Reservation, Table
 from core.models import Customer
 from core.models import Branch, Employee 
+from core.stats import histogram
+from core.customer_search import customer_choices
+from core.idempotency import idempotent
+from core.branch_context import get_manager
+from core.branch_summary import branch_summaries
 from notifications.services import notification_service
 
 @login_required
@@ -24,7 +30,7 @@ def reservation_dashboard(request):
     
     if is_admin:
         # Admin can view any branch's reservations
-        branches = Branch.objects.filter(is_active=True)
+        branches = branch_summaries(('reservation_count', 'table_count'))
         if branch_id:
             selected_branch = get_object_or_404(Branch, id=branch_id)
             # Filter data for selected branch
@@ -37,7 +43,7 @@ def reservation_dashboard(request):
     else:
         # Regular manager - only their branch
         try:
-            manager_employee = Employee.objects.get(user=request.user, employee_type='manager')
+            manager_employee = get_manager(request)
             selected_branch = manager_employee.branch
             branches = Branch.objects.filter(id=selected_branch.id)
             reservations = Reservation.objects.filter(branch=selected_branch)
@@ -57,13 +63,8 @@ def reservation_dashboard(request):
     # Available tables
     available_tables = tables.filter(is_available=True).count()
     
-    # Total reservations count
-    total_reservations = reservations.count()
-    
-    # Reservations by status
-    confirmed_reservations = reservations.filter(status='confirmed').count()
-    pending_reservations = reservations.filter(status='pending').count()
-    cancelled_reservations = reservations.filter(status='cancelled').count()
+    # Total and per-status reservation counts in one query
+    status_counts = histogram(reservations, 'status', values=['confirmed', 'pending', 'cancelled'])
     
     context = {
         'today_reservations': today_reservations,
@@ -72,10 +73,10 @@ def reservation_dashboard(request):
         'is_admin': is_admin,
         'branches': branches if is_admin else [],
         'selected_branch': selected_branch,
-        'total_reservations': total_reservations,
-        'confirmed_reservations': confirmed_reservations,
-        'pending_reservations': pending_reservations,
-        'cancelled_reservations': cancelled_reservations,
+        'total_reservations': status_counts['total'],
+        'confirmed_reservations': status_counts['confirmed'],
+        'pending_reservations': status_counts['pending'],
+        'cancelled_reservations': status_counts['cancelled'],
     }
     
     return render(request, 'reservations/dashboard.html', context)
@@ -98,7 +99,8 @@ def reservation_list(request):
 
 @login_required
 def reservation_create(request):
-    customers = Customer.objects.all()
+    # Only a few customers go in the page; the rest come from the typeahead
+    customers = customer_choices(selected=request.POST.get('customer'))
     tables = Table.objects.filter(is_available=True)
     
     # Get recent customers (last 5)
@@ -148,34 +150,30 @@ def reservation_create(request):
                     'recent_customers': recent_customers,
                 })
             
-            # Create reservation
-            reservation = Reservation.objects.create(
-                customer_id=customer_id,
-                table=table,
-                reservation_date=reservation_date,
-                reservation_time=reservation_time,
-                number_of_guests=number_of_guests,
-                special_requests=special_requests,
-                status='confirmed'
-            )
+            # Format the date and time for the confirmation SMS
+            date_obj = datetime.strptime(reservation_date, "%Y-%m-%d")
+            time_obj = datetime.strptime(reservation_time, "%H:%M")
             
-            # SMS NOTIFICATION INTEGRATION - FIXED VERSION
-            try:
-                from notifications.services import notification_service
-                
-                # Get customer details for SMS
-                customer = Customer.objects.get(id=customer_id)
-                
-                # FIX: Convert string dates to proper format for display
-                # Parse the date string to datetime object for formatting
-                date_obj = datetime.strptime(reservation_date, "%Y-%m-%d")
-                time_obj = datetime.strptime(reservation_time, "%H:%M")
-                
-                formatted_date = date_obj.strftime('%B %d, %Y')
-                formatted_time = time_obj.strftime('%I:%M %p')
+            formatted_date = date_obj.strftime('%B %d, %Y')
+            formatted_time = time_obj.strftime('%I:%M %p')
+            
+            with transaction.atomic():
+                # Create reservation
+                reservation = Reservation.objects.create(
+                    customer_id=customer_id,
+                    table=table,
+                    reservation_date=reservation_date,
+                    reservation_time=reservation_time,
+                    number_of_guests=number_of_guests,
+                    special_requests=special_requests,
+                    status='confirmed'
+                )
                 
-                # Send reservation confirmation SMS
-                notification_service.send_notification(
+                # SMS NOTIFICATION INTEGRATION
+                # Queued with the reservation and sent by the
+                # process_notifications worker, not inside this request
+                customer = reservation.customer
+                notification_service.queue_notification(
                     notification_type='reservation_confirm',
                     recipient={'phone': customer.phone},
                     context_data={
@@ -187,14 +185,9 @@ def reservation_create(request):
                         'number_of_guests': number_of_guests
                     }
                 )
-                
-                # Add SMS sent message
-                messages.info(request, f'SMS confirmation sent to {customer.name}')
-                
-            except Exception as sms_error:
-                # Log SMS error but don't break the reservation process
-                print(f"SMS notification failed: {sms_error}")
-                messages.warning(request, 'Reservation created but SMS notification failed')
+            
+            if customer.phone:
+                messages.info(request, f'SMS confirmation queued for {customer.name}')
             
             messages.success(request, f'Reservation #{reservation.id} created successfully!')
             return redirect('reservations:reservation_list')
@@ -210,26 +203,36 @@ def reservation_create(request):
 
 @login_required
 @csrf_exempt
+@idempotent('reservations:create_customer')
 def create_customer_ajax(request):
     """AJAX view to create new customers"""
     if request.method == 'POST':
         try:
-            data = json.loads(request.body)
-            customer = Customer.objects.create(
-                name=data['name'],
-                phone=data['phone'],
-                email=data.get('email', ''),
-                address=data.get('address', '')
-            )
+            # In a savepoint of its own: after a failed write the request's
+            # transaction still works, and the error page can be rendered
+            with transaction.atomic():
+                data = json.loads(request.body)
+                if Customer.find_by_phone(data['phone']) is not None:
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'A customer with this phone number already exists'
+                    })
             
-            return JsonResponse({
-                'success': True,
-                'customer': {
-                    'id': customer.id,
-                    'name': customer.name,
-                    'phone': customer.phone
-                }
-            })
+                customer = Customer.objects.create(
+                    name=data['name'],
+                    phone=data['phone'],
+                    email=data.get('email', ''),
+                    address=data.get('address', '')
+                )
+            
+                return JsonResponse({
+                    'success': True,
+                    'customer': {
+                        'id': customer.id,
+                        'name': customer.name,
+                        'phone': customer.phone
+                    }
+                })
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -301,21 +304,22 @@ def table_list(request):
 def table_add(request):
     if request.method == 'POST':
         try:
-            # Check if table number already exists
-            table_number = request.POST['table_number']
-            if Table.objects.filter(table_number=table_number).exists():
-                messages.error(request, f'Table {table_number} already exists!')
-                return render(request, 'reservations/table_add.html')
+            with transaction.atomic():
+                # Check if table number already exists
+                table_number = request.POST['table_number']
+                if Table.objects.filter(table_number=table_number).exists():
+                    messages.error(request, f'Table {table_number} already exists!')
+                    return render(request, 'reservations/table_add.html')
             
-            table = Table.objects.create(
-                table_number=table_number,
-                table_type=request.POST['table_type'],
-                capacity=request.POST['capacity'],
-                location_description=request.POST.get('location_description', ''),
-                is_available=True
-            )
-            messages.success(request, f'Table {table.table_number} added successfully!')
-            return redirect('reservations:table_list')
+                table = Table.objects.create(
+                    table_number=table_number,
+                    table_type=request.POST['table_type'],
+                    capacity=request.POST['capacity'],
+                    location_description=request.POST.get('location_description', ''),
+                    is_available=True
+                )
+                messages.success(request, f'Table {table.table_number} added successfully!')
+                return redirect('reservations:table_list')
         except Exception as e:
             messages.error(request, f'Error adding table: {str(e)}')
     
@@ -327,15 +331,16 @@ def table_edit(request, pk):
     
     if request.method == 'POST':
         try:
-            table.table_number = request.POST['table_number']
-            table.table_type = request.POST['table_type']
-            table.capacity = request.POST['capacity']
-            table.location_description = request.POST.get('location_description', '')
-            table.is_available = 'is_available' in request.POST
-            table.save()
+            with transaction.atomic():
+                table.table_number = request.POST['table_number']
+                table.table_type = request.POST['table_type']
+                table.capacity = request.POST['capacity']
+                table.location_description = request.POST.get('location_description', '')
+                table.is_available = 'is_available' in request.POST
+                table.save()
             
-            messages.success(request, f'Table {table.table_number} updated successfully!')
-            return redirect('reservations:table_list')
+                messages.success(request, f'Table {table.table_number} updated successfully!')
+                return redirect('reservations:table_list')
         except Exception as e:
             messages.error(request, f'Error updating table: {str(e)}')
     
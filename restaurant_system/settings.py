@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'reports',
     'notifications',
     'payments', 
+    'kitchen',
 ]
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
@@ -56,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'core.middleware.BranchMiddleware',
+    'core.middleware.WriteTransactionMiddleware',  # keep last
 ]
 
 ROOT_URLCONF = 'restaurant_system.urls'
@@ -82,11 +84,78 @@ WSGI_APPLICATION = 'restaurant_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite (the default) suits a single-branch install. Set DB_ENGINE=postgresql
+# (plus DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT) to run on PostgreSQL
+# with a psycopg connection pool (pip install "psycopg[binary,pool]").
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'restaurant_system'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'OPTIONS': {
+                # Connections are borrowed from the pool per request, so
+                # CONN_MAX_AGE must stay 0
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                },
+            },
+            'CONN_MAX_AGE': 0,
+        }
+    }
+    if os.environ.get('DB_REPLICA_HOST'):
+        # Streaming replica the reports read from (core.reporting)
+        DATABASES['reporting'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['DB_REPLICA_HOST'],
+            'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Take the write lock when a transaction starts, so writers wait
+                # for each other (busy_timeout) instead of failing on lock upgrade
+                'transaction_mode': 'IMMEDIATE',
+            },
+            'CONN_MAX_AGE': 600,  # one connection per worker thread, reused across requests
+            'CONN_HEALTH_CHECKS': True,
+        },
+        # Read-only snapshot the reports read from, refreshed by
+        # `manage.py refresh_reporting_snapshot` (core.reporting)
+        'reporting': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': f"file:{BASE_DIR / 'reporting.sqlite3'}?mode=ro",
+            'CONN_MAX_AGE': 0,  # reopen each request, so a new snapshot is picked up
+            'TEST': {'MIRROR': 'default'},
+        },
     }
+
+# Reporting database (core.reporting): reports read these apps' models from
+# the REPORTING_DATABASE alias when it is configured
+DATABASE_ROUTERS = ['core.reporting.ReportingRouter']
+REPORTING_DATABASE = 'reporting'
+REPORTING_APPS = ['core', 'orders', 'payments', 'reservations', 'inventory']
+REPORTING_SNAPSHOT_INTERVAL = 300  # seconds between refreshes with --interval
+
+# Pragmas run on every new SQLite connection (core.sqlite)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,    # ms a writer waits for the lock
+    'mmap_size': 268435456,   # 256 MB
+    'cache_size': -65536,     # 64 MB (negative: KiB)
+    'temp_store': 'MEMORY',
 }
 
 
@@ -144,6 +213,97 @@ LOGIN_URL = 'login'
 SESSION_COOKIE_AGE = 1209600  # 2 weeks in seconds
 SESSION_SAVE_EVERY_REQUEST = True
 
+# Sessions live in the cache and only reach django_session when their data
+# changes or their expiry has slid SESSION_REFRESH_THRESHOLD seconds (core.sessions)
+SESSION_ENGINE = 'core.sessions'
+SESSION_REFRESH_THRESHOLD = 300  # seconds a session may end before its cookie
+SESSION_CACHE_TTL = 60           # seconds a cached copy is trusted
+SESSION_CACHE_ALIAS = 'sessions'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Every worker must see the same sessions, or a logout in one leaves
+    # the session valid in the others (core.checks). Files are shared by
+    # the workers of one machine; use Redis or Memcached across machines
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'session_cache',
+    },
+    # Version numbers that tell every worker to drop its in-process copies
+    # (core.branch_context, core.registry), so it has to be shared in the same way
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'shared_cache',
+    },
+}
+SHARED_CACHE_ALIAS = 'shared'
+
+# Runs the tests with the file-based caches in a temporary directory
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Run POST/PUT/PATCH/DELETE views in a single transaction (core.middleware)
+ATOMIC_WRITE_REQUESTS = True
+
+# Order numbering (see orders.services.OrderNumberAllocator)
+ORDER_NUMBER_BLOCK_SIZE = 20  # numbers each worker reserves per database round trip
+ORDER_NUMBER_PER_BRANCH = False
+ORDER_NUMBER_PER_DAY = False
+
+# Seconds a worker may serve its in-process menu snapshot (inventory.menu_cache)
+# before re-checking the database, in case another worker changed the menu
+MENU_SNAPSHOT_TTL = 60
+
+# Kitchen display event stream (kitchen.events). The broker is in-process:
+# a screen only hears about orders saved by the worker that serves its
+# stream, so run the site as a single ASGI worker while the kitchen
+# display is in use (uvicorn restaurant_system.asgi:application)
+KITCHEN_EVENT_BUFFER = 200       # recent events kept for reconnecting screens
+KITCHEN_QUEUE_SIZE = 100         # events a slow screen may lag behind before it reloads
+KITCHEN_HEARTBEAT = 15           # seconds between keep-alive comments
+KITCHEN_STREAM_WSGI_SECONDS = 30 # stream length under WSGI, where each stream holds a thread
+
+# Notification outbox (notifications.outbox, manage.py process_notifications)
+NOTIFICATION_OUTBOX_WORKERS = 4        # sends in parallel per worker process
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 5
+NOTIFICATION_OUTBOX_BACKOFF = 30       # seconds before the first retry, doubled each time
+NOTIFICATION_OUTBOX_BACKOFF_MAX = 3600
+NOTIFICATION_OUTBOX_LEASE = 300        # seconds before a row claimed by a dead worker is retried
+
+# Idempotency keys for order/customer creation (core.idempotency)
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60    # seconds a completed response is replayed
+IDEMPOTENCY_KEY_LOCK_SECONDS = 60     # an unfinished key older than this is treated as abandoned
+
+# Admission control for the public ordering pages (core.ratelimit)
+RATELIMIT_ENABLED = True
+RATELIMIT_STORE_PATH = BASE_DIR / 'ratelimit.sqlite3'  # shared by all workers on this machine
+RATELIMIT_TRUST_FORWARDED_FOR = False                  # set True behind a reverse proxy
+RATELIMIT_ONLINE_PAGE_PER_IP = (60, 60)                # (requests, seconds)
+RATELIMIT_ONLINE_SUBMIT_PER_IP = (10, 60)
+RATELIMIT_ONLINE_SUBMIT_PER_PHONE = (5, 600)
+ONLINE_ORDER_MAX_CONCURRENT = 4                        # public ordering requests in flight at once
+
+# Country code given to local phone numbers (core.phone)
+PHONE_DEFAULT_COUNTRY_CODE = '256'
+
+# Per-user employee/branch context cached by BranchMiddleware (core.branch_context)
+EMPLOYEE_CONTEXT_TTL = 60           # seconds before re-checking, should a version bump be missed
+EMPLOYEE_CONTEXT_CACHE_SIZE = 1024  # users kept per process
+
+# Seconds a worker serves its cached restaurant profile and active branch
+# list (core.registry) before re-checking, should a version bump be missed
+REGISTRY_CACHE_TTL = 300
+
+# Seconds each dashboard panel fragment is cached (core.panels)
+DASHBOARD_PANEL_TTLS = {
+    'recent_orders': 15,
+    'upcoming_reservations': 60,
+    'popular_items': 60,
+    'low_stock': 120,
+    'employees': 300,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -13,6 +13,7 @@ urlpatterns = [
     path('reports/', include('reports.urls')),
     path('accounts/', include('accounts.urls')),
     path('payments/', include('payments.urls')),
+    path('kitchen/', include('kitchen.urls')),
     
     # Additional features (comment out for now if not created yet)
     # path('suppliers/', include('suppliers.urls')),
@@ -21,7 +22,6 @@ urlpatterns = [
     # path('feedback/', include('feedback.urls')),
     # path('loyalty/', include('loyalty.urls')),
     # path('expenses/', include('expenses.urls')),
-    # path('kitchen/', include('kitchen.urls')),
     # path('api/', include('api.urls')),
     # path('delivery/', include('delivery.urls')),
     
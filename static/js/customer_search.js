@@ -0,0 +1,84 @@
+// Customer typeahead for the order and reservation forms.
+// The customer <select> starts with a few recent customers; typing in the
+// search box above it swaps in the matching customers from the server.
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('[data-customer-search]').forEach(function(input) {
+        const select = document.getElementById(input.dataset.target || 'customer');
+        const hint = document.getElementById(input.dataset.hint || '');
+        if (!select) return;
+
+        const initialOptions = Array.from(select.options).map(option => option.cloneNode(true));
+        let timer = null;
+        let controller = null;
+
+        function keepSelected(options) {
+            // Never drop the customer that is already chosen
+            const selected = select.options[select.selectedIndex];
+            if (selected && selected.value && !options.some(o => o.value === selected.value)) {
+                options.splice(1, 0, selected.cloneNode(true));
+            }
+            const value = select.value;
+            select.innerHTML = '';
+            options.forEach(option => select.appendChild(option));
+            select.value = value;
+        }
+
+        function showHint(text) {
+            if (hint) hint.textContent = text;
+        }
+
+        function search(query) {
+            if (controller) controller.abort();
+            controller = new AbortController();
+
+            fetch(`${input.dataset.url}?q=${encodeURIComponent(query)}&limit=10`, {
+                signal: controller.signal,
+                headers: {'X-Requested-With': 'XMLHttpRequest'}
+            })
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) return;
+                    const options = [initialOptions[0].cloneNode(true)];
+                    data.results.forEach(customer => {
+                        const option = document.createElement('option');
+                        option.value = customer.id;
+                        option.textContent = `${customer.name} - ${customer.phone}`;
+                        options.push(option);
+                    });
+                    // The recent customers stay, for the quick-select buttons
+                    initialOptions.slice(1).forEach(option => {
+                        if (!options.some(o => o.value === option.value)) options.push(option.cloneNode(true));
+                    });
+                    keepSelected(options);
+                    showHint(data.results.length ? `${data.results.length} match(es)` : 'No customers found');
+                    if (data.results.length === 1 && !select.value) {
+                        select.value = data.results[0].id;
+                        select.dispatchEvent(new Event('change'));
+                    }
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') console.error('Customer search failed:', error);
+                });
+        }
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = input.value.trim();
+            if (query.length < 2) {
+                if (controller) controller.abort();
+                keepSelected(initialOptions.map(option => option.cloneNode(true)));
+                showHint('');
+                return;
+            }
+            timer = setTimeout(() => search(query), 150);
+        });
+
+        input.addEventListener('keydown', function(e) {
+            // Enter picks from the list instead of submitting the form
+            if (e.key === 'Enter') {
+                e.preventDefault();
+                select.focus();
+            }
+        });
+    });
+});
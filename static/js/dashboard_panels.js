@@ -0,0 +1,36 @@
+// Fill the dashboard panel slots once the page is up.
+// Every [data-dashboard-panel] element is fetched at the same time; each
+// one is swapped in as soon as its own fragment arrives.
+document.addEventListener('DOMContentLoaded', function() {
+    const slots = document.querySelectorAll('[data-dashboard-panel]');
+
+    function showError(slot) {
+        slot.innerHTML = '<p class="text-muted text-center">Could not load this panel. ' +
+            '<a href="#" data-panel-retry>Retry</a></p>';
+        slot.querySelector('[data-panel-retry]').addEventListener('click', function(event) {
+            event.preventDefault();
+            load(slot);
+        });
+    }
+
+    function load(slot) {
+        fetch(slot.dataset.url, {
+            credentials: 'same-origin',
+            headers: {'X-Requested-With': 'XMLHttpRequest'}
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    showError(slot);
+                    return;
+                }
+                slot.innerHTML = data.html;
+            })
+            .catch(() => showError(slot));
+    }
+
+    // Let the browser paint the page before the requests go out
+    requestAnimationFrame(function() {
+        slots.forEach(load);
+    });
+});
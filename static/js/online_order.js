@@ -445,6 +445,9 @@ document.addEventListener('DOMContentLoaded', function() {
         const form = document.getElementById('onlineOrderForm');
         if (!form) return;
 
+        // One key per order attempt, kept until the order goes through
+        let idempotencyKey = null;
+
         form.addEventListener('submit', function(e) {
             e.preventDefault();
             
@@ -548,14 +551,22 @@ document.addEventListener('DOMContentLoaded', function() {
             });
 
             // Submit order
+            idempotencyKey = idempotencyKey || newIdempotencyKey();
             fetch('/orders/online/submit/', {
                 method: 'POST',
                 body: formData,
                 headers: {
-                    'X-CSRFToken': getCookie('csrftoken')
+                    'X-CSRFToken': getCookie('csrftoken'),
+                    'Idempotency-Key': idempotencyKey
                 }
             })
             .then(response => {
+                if (response.status === 429) {
+                    // Busy or rate limited: the server says when to try again
+                    return response.json().then(data => {
+                        throw new Error(data.error || 'Too many requests, please try again shortly');
+                    });
+                }
                 if (!response.ok) {
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
@@ -563,6 +574,7 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(data => {
                 if (data.success) {
+                    idempotencyKey = null;
                     // Success - show message and redirect
                     showAlert(data.message || 'Order placed successfully!', 'success');
                     
@@ -651,6 +663,15 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Random key sent with create requests so a retried or double-tapped
+    // submission is answered with the original response, not a duplicate
+    function newIdempotencyKey() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+    }
+
     // Helper function to get CSRF token
     function getCookie(name) {
         let cookieValue = null;
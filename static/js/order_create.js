@@ -485,6 +485,9 @@ document.addEventListener('DOMContentLoaded', function() {
         saveCustomerBtn.addEventListener('click', createNewCustomer);
     }
 
+    // One key per customer being created, kept until it is saved
+    let customerIdempotencyKey = null;
+
     function createNewCustomer() {
         const name = document.getElementById('new_customer_name').value.trim();
         const phone = document.getElementById('new_customer_phone').value.trim();
@@ -527,12 +530,14 @@ document.addEventListener('DOMContentLoaded', function() {
         saveCustomerBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i> Saving...';
 
         // AJAX request to create customer
+        customerIdempotencyKey = customerIdempotencyKey || newIdempotencyKey();
         fetch('/orders/create-customer-ajax/', {
             method: 'POST',
             body: formData,
             headers: {
                 'X-Requested-With': 'XMLHttpRequest',
-                'X-CSRFToken': getCookie('csrftoken')
+                'X-CSRFToken': getCookie('csrftoken'),
+                'Idempotency-Key': customerIdempotencyKey
             }
         })
         .then(response => {
@@ -543,6 +548,7 @@ document.addEventListener('DOMContentLoaded', function() {
         })
         .then(data => {
             if (data.success) {
+                customerIdempotencyKey = null;
                 // Add new customer to dropdown
                 addCustomerToDropdown(data.customer);
                 
@@ -619,6 +625,15 @@ document.addEventListener('DOMContentLoaded', function() {
         return emailRegex.test(email);
     }
 
+    // Random key sent with create requests so a retried or double-tapped
+    // submission is answered with the original response, not a duplicate
+    function newIdempotencyKey() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+    }
+
     // Helper function to get CSRF token from cookies
     function getCookie(name) {
         let cookieValue = null;